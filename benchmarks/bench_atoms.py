@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Times parsing of the per-atom data of a snapshot with Snapshot.atoms against np.loadtxt of the
+text of the snapshot. The cache of parsed arrays (see atoms.AtomsCache) is cleared before each
+call, so every call parses
+
+Usage: python benchmarks/bench_atoms.py [directory] [n_atoms]
+    (defaults: a temporary directory, and 100000 atoms)
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from dumps import write_dump
+from lammps_utility.dump_reader import Snapshots
+
+REPEAT = 15
+
+def best_time(function, snapshot):
+    best = float("inf")
+    
+    for _ in range(REPEAT):
+        snapshot.source.atoms_cache.clear()
+        
+        t = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - t)
+    
+    return best
+
+def main(directory, n_atoms):
+    path = Path(directory) / f"atoms_{n_atoms}.dump"
+    write_dump(path, 1, n_atoms)
+    
+    snapshot = Snapshots.from_dump(path)[0]
+    
+    text = snapshot.read_dump()
+    skiprows = text[:text.index("ITEM: ATOMS")].count("\n") + 1
+    size = len(text) - len("\n".join(text.splitlines()[:skiprows]))
+    
+    assert np.array_equal(np.loadtxt(io.StringIO(text), skiprows = skiprows)[:, 2],
+                          snapshot.atoms()["x"])
+    
+    print(f"{n_atoms} atoms x 5 columns ({size / 1e6:.1f} MB block), best of {REPEAT}, "
+          f"{os.cpu_count()} CPU:")
+    
+    for name, function in [("np.loadtxt(StringIO(read_dump()))",
+                             lambda: np.loadtxt(io.StringIO(snapshot.read_dump()), skiprows = skiprows)),
+                            ("snapshot.atoms()", lambda: snapshot.atoms()),
+                            ("snapshot.atoms(float32 = True)", lambda: snapshot.atoms(float32 = True))]:
+        elapsed = best_time(function, snapshot)
+        
+        print(f"    {name:36s} {elapsed * 1e3:6.1f} ms {size / elapsed / 1e6:6.1f} MB/s")
+    
+    path.unlink()
+
+if __name__ == "__main__":
+    n_atoms = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    
+    if len(sys.argv) > 1:
+        main(sys.argv[1], n_atoms)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            main(directory, n_atoms)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Times and measures the memory of indexing a dump of many small snapshots, which is dominated by
+the global data of the snapshots: indexing with DumpFileSource, Snapshots.from_dump, and saving
+and loading the index of the dump (see index_cache). Each is measured in a new process, and
+memory is the growth of resident memory, which includes the pages of the mapped dump file
+
+Usage: python benchmarks/bench_from_dump.py [directory] [n_snapshots]
+    (defaults: a temporary directory, and 1000000 snapshots of 1 atom)
+"""
+
+import gc
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from dumps import write_dump
+from lammps_utility.dump_reader import Snapshots
+from lammps_utility.dump_reader.sources import DumpFileSource
+
+STAGES = {
+    "DumpFileSource": lambda path, index_path: DumpFileSource(open(path, "rb")),
+    "Snapshots.from_dump": lambda path, index_path: Snapshots.from_dump(path),
+    "index and save": lambda path, index_path: DumpFileSource(open(path, "rb"), index_path = index_path),
+    "load from index": lambda path, index_path: DumpFileSource(open(path, "rb"), index_path = index_path)
+}
+
+def resident_mib():
+    return int(Path("/proc/self/statm").read_text().split()[1]) * resource.getpagesize() / 2**20
+
+def measure(stage, path, index_path):
+    """Run stage and print its time and memory"""
+    
+    gc.collect()
+    start_mib = resident_mib()
+    
+    t = time.perf_counter()
+    result = STAGES[stage](path, index_path)
+    elapsed = time.perf_counter() - t
+    
+    gc.collect()
+    
+    print(f"    {stage:20s} {elapsed:6.1f} s  +{resident_mib() - start_mib:5.0f} MiB  "
+          f"(peak {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:5.0f} MiB)", flush = True)
+    
+    return result
+
+def main(directory, n_snapshots):
+    path = Path(directory) / f"from_dump_{n_snapshots}.dump"
+    index_path = Path(directory) / f"from_dump_{n_snapshots}.dump.index"
+    
+    write_dump(path, n_snapshots, 1)
+    index_path.unlink(missing_ok = True)
+    
+    print(f"{n_snapshots} snapshots of 1 atom ({os.path.getsize(path) / 1e6:.0f} MB), {os.cpu_count()} CPU:",
+          flush = True)
+    
+    for stage in STAGES:
+        subprocess.run([sys.executable, __file__, "--stage", stage, str(path), str(index_path)],
+                       check = True)
+    
+    print(f"    index file {os.path.getsize(index_path) / 2**20:.0f} MiB")
+    
+    path.unlink()
+    index_path.unlink()
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--stage"]:
+        measure(*sys.argv[2:5])
+    else:
+        n_snapshots = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+        
+        if len(sys.argv) > 1:
+            main(sys.argv[1], n_snapshots)
+        else:
+            with tempfile.TemporaryDirectory() as directory:
+                main(directory, n_snapshots)
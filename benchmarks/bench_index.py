@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Times indexing of dump files with the memory-mapped byte scanner (see indexing) against reading
+every line with readline, which is how dumps were indexed before. Dumps of few large snapshots
+measure the scan over per-atom data, and dumps of many small snapshots the cost per snapshot
+
+Usage: python benchmarks/bench_index.py [directory]
+    (default: a temporary directory)
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from dumps import write_dump
+from lammps_utility.dump_reader import indexing
+from lammps_utility.dump_reader.sources import DumpFileSource
+
+DUMPS = [(40, 100000), (20000, 5)] # (snapshots, atoms)
+REPEAT = 3
+
+def index_readline(path):
+    """
+    Index by reading every line: the header items are parsed into the same values as
+    indexing.scan_dump finds, and the per-atom lines are skipped one at a time. Custom items must
+    be a single line
+    
+    Returns: list of (offset, timestep, n_atoms, atom_data, box_data, custom) of each snapshot
+    """
+    
+    snapshots = []
+    
+    with open(path) as file:
+        readline = file.readline
+        
+        while True:
+            offset = file.tell()
+            line = readline()
+            
+            if not line:
+                return snapshots
+            
+            timestep, n_atoms, box_data, custom = None, None, None, {}
+            
+            while not line.startswith("ITEM: ATOMS"):
+                item = line[len("ITEM: "):].split()
+                
+                if item == ["TIMESTEP"]:
+                    timestep = int(readline())
+                elif item == ["NUMBER", "OF", "ATOMS"]:
+                    n_atoms = int(readline())
+                elif item[:2] == ["BOX", "BOUNDS"]:
+                    box_data = [readline().split() for _ in range(3)]
+                else:
+                    custom[" ".join(item)] = [readline()]
+                
+                line = readline()
+            
+            atom_data = tuple(line.split()[2:])
+            
+            for _ in range(n_atoms):
+                readline()
+            
+            snapshots.append((offset, timestep, n_atoms, atom_data, box_data, custom))
+
+def scan(path):
+    with open(path, "rb") as file:
+        return indexing.scan_dump(indexing.map_file(file))
+
+def best_time(function, path):
+    best = float("inf")
+    
+    for _ in range(REPEAT):
+        t = time.perf_counter()
+        result = function(path)
+        best = min(best, time.perf_counter() - t)
+    
+    return best, result
+
+def main(directory):
+    for n_snapshots, n_atoms in DUMPS:
+        path = Path(directory) / f"index_{n_snapshots}x{n_atoms}.dump"
+        write_dump(path, n_snapshots, n_atoms)
+        size = os.path.getsize(path)
+        
+        print(f"{n_snapshots} snapshots x {n_atoms} atoms ({size / 1e6:.0f} MB), best of {REPEAT}:")
+        
+        for name, function in [("readline indexer", index_readline),
+                               ("mmap scanner (indexing.scan_dump)", scan),
+                               ("DumpFileSource", lambda path: DumpFileSource(open(path, "rb")).snapshots)]:
+            elapsed, snapshots = best_time(function, path)
+            
+            assert len(snapshots) == n_snapshots
+            
+            print(f"    {name:36s} {elapsed:7.3f} s ({size / elapsed / 1e9:5.2f} GB/s)")
+        
+        path.unlink()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main(sys.argv[1])
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            main(directory)
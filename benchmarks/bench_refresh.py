@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Times Snapshots.refresh of a followed dump, which should only depend on the number of new
+snapshots and not on the number already indexed. The first refresh also copies the arrays of the
+snapshots so far into buffers with spare capacity, so it is reported separately
+
+Usage: python benchmarks/bench_refresh.py [directory] [n_snapshots ...]
+    (defaults: a temporary directory, and 10000 100000 1000000 snapshots)
+"""
+
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from dumps import write_dump
+from lammps_utility.dump_reader import Snapshots
+
+N_NEW = 10 # Snapshots appended before each refresh
+N_REFRESH = 20
+
+def main(directory, sizes):
+    for n_snapshots in sizes:
+        path = Path(directory) / f"refresh_{n_snapshots}.dump"
+        write_dump(path, n_snapshots, 2)
+        
+        snapshots = Snapshots.from_dump(path, follow = True)
+        times = []
+        
+        for i in range(N_REFRESH):
+            write_dump(path, N_NEW, 2, start = n_snapshots + i * N_NEW, append = True)
+            
+            t = time.perf_counter()
+            new_snapshots = snapshots.refresh()
+            times.append(time.perf_counter() - t)
+            
+            assert len(new_snapshots) == N_NEW
+        
+        assert len(snapshots) == n_snapshots + N_REFRESH * N_NEW
+        
+        print(f"{n_snapshots:8d} snapshots: refresh of {N_NEW} new snapshots, first "
+              f"{times[0] * 1e3:8.3f} ms, median of others {statistics.median(times[1:]) * 1e3:8.3f} ms")
+        
+        del snapshots
+        path.unlink()
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[2:]] or [10000, 100000, 1000000]
+    
+    if len(sys.argv) > 1:
+        main(sys.argv[1], sizes)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            main(directory, sizes)
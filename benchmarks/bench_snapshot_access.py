@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Times access to the global data of each snapshot of a Snapshots object (snapshot.timestep,
+snapshot.box.bounds and setting snapshot.timestep), which should not depend on the number of
+snapshots
+
+Usage: python benchmarks/bench_snapshot_access.py [directory] [n_snapshots ...]
+    (defaults: a temporary directory, and 1000 5000 20000 200000 snapshots)
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from dumps import write_dump
+from lammps_utility.dump_reader import Snapshots
+
+def per_snapshot(function, snapshots):
+    """Time of function(snapshot) per snapshot, in microseconds"""
+    
+    t = time.perf_counter()
+    
+    for snapshot in snapshots:
+        function(snapshot)
+    
+    return (time.perf_counter() - t) * 1e6 / len(snapshots)
+
+def set_timestep(snapshot):
+    snapshot.timestep = snapshot.timestep + 1
+
+def main(directory, sizes):
+    path = Path(directory) / "access.dump"
+    write_dump(path, max(sizes), 5)
+    
+    all_snapshots = Snapshots.from_dump(path)
+    
+    print("Per-snapshot access time (us), 5-atom snapshots:")
+    
+    for n_snapshots in sizes:
+        snapshots = all_snapshots.new[:n_snapshots].snapshots
+        
+        timestep = per_snapshot(lambda snapshot: snapshot.timestep, snapshots)
+        bounds = per_snapshot(lambda snapshot: snapshot.box.bounds, snapshots)
+        set_time = per_snapshot(set_timestep, snapshots)
+        
+        print(f"    N = {n_snapshots:7d}  timestep {timestep:8.2f}  box.bounds {bounds:8.2f}  "
+              f"set timestep {set_time:8.2f}")
+    
+    del all_snapshots, snapshots
+    path.unlink()
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[2:]] or [1000, 5000, 20000, 200000]
+    
+    if len(sys.argv) > 1:
+        main(sys.argv[1], sizes)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            main(directory, sizes)
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Writes LAMMPS dump files of random atoms for the benchmarks, which import the lammps_utility
+package from the checkout they are in. To compare commits, copy this directory into a checkout of
+each commit and run the same script in both
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+def write_dump(path, n_snapshots, n_atoms, start = 0, append = False, custom = True, seed = 0):
+    """
+    Write (or append) a dump of snapshots with a triclinic box and columns id type x y z
+    
+    Args:
+        path (str or Path): Path of dump file
+        n_snapshots (int): Number of snapshots
+        n_atoms (int): Number of atoms of each snapshot
+        start (int): Number of the first snapshot, whose timestep is 100 * start (default 0)
+        append (bool): Whether to append to the file rather than overwrite it (default False)
+        custom (bool): Whether snapshots have the custom item TIME (default True)
+        seed (int): Seed of the random per-atom data (default 0)
+    """
+    
+    rng = np.random.default_rng(seed)
+    
+    with open(path, "a" if append else "w") as file:
+        for i in range(start, start + n_snapshots):
+            file.write(f"ITEM: TIMESTEP\n{100 * i}\nITEM: NUMBER OF ATOMS\n{n_atoms}\n")
+            
+            if custom:
+                file.write(f"ITEM: TIME\n{0.5 * i}\n")
+            
+            file.write("ITEM: BOX BOUNDS xy xz yz pp pp pp\n-10 10 0.1\n-20 20 0\n-5 5 0\n"
+                       "ITEM: ATOMS id type x y z\n")
+            
+            ids = rng.permutation(n_atoms) + 1
+            x = rng.random((n_atoms, 3)) * 10
+            
+            if n_atoms < 100:
+                file.write("".join(f"{j} {j % 3 + 1} {a:.6f} {b:.6f} {c:.6f}\n"
+                                   for j, (a, b, c) in zip(ids, x)))
+            else:
+                np.savetxt(file, np.column_stack([ids, ids % 3 + 1, x]),
+                           fmt = ["%d", "%d", "%.6f", "%.6f", "%.6f"])
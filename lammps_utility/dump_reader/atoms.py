@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+Internal module of dump_reader for parsing per-atom data into NumPy arrays
+
+The per-atom block of a snapshot is parsed straight from the bytes of the dump file. Numeric blocks
+are parsed by the C parser of np.loadtxt, which was the fastest parser measured. Blocks containing
+non-numeric columns (e.g. element) are tokenized with bytes.split instead, which is much slower.
+
+Parsed columns can be kept in an AtomsCache, so that revisiting a snapshot does not parse it again.
+"""
+
+from collections import OrderedDict
+import io
+import threading
+import numpy as np
+
+# Default byte budget of AtomsCache
+DEFAULT_CACHE_BYTES = 1 << 28
+
+# Per-atom quantities of LAMMPS dumps which are integers. Custom per-atom integer vectors and arrays
+# (i_name, i2_name) are also integers
+INT_COLUMNS = {"id", "mol", "proc", "procp1", "type", "ix", "iy", "iz"}
+INT_PREFIXES = ("i_", "i2_")
+
+def column_dtype(name, float32 = False):
+    """Get dtype of numeric per-atom column name"""
+
+    if name in INT_COLUMNS or name.startswith(INT_PREFIXES):
+        return np.dtype(np.int64)
+
+    return np.dtype(np.float32 if float32 else np.float64)
+
+def is_numeric(token):
+    """Whether bytes token can be parsed as a float"""
+    try:
+        float(token)
+    except ValueError:
+        return False
+
+    return True
+
+def parse_numeric(buffer, start, end, usecols = None):
+    """
+    Parse rows of whitespace-separated numbers of buffer[start:end] into a float64 array. Values of
+    unused columns are skipped by the tokenizer without being converted
+
+    Args:
+        buffer (bytes-like): Dump file contents
+        start (int): Byte offset of first line
+        end (int): Byte offset of end of final line
+        usecols (list of int): Indices of columns to return. If None (default), all columns
+
+    Returns: (rows, len(usecols)) float64 array
+    """
+
+    return np.loadtxt(io.BytesIO(buffer[start:end]), usecols = usecols, ndmin = 2)
+
+def parse_atoms(buffer, start, end, n_atoms, atom_data, columns = None, float32 = False):
+    """
+    Parse per-atom block of a snapshot into column arrays
+
+    Columns are integers (int64) or floats (see column_dtype), or strings if any value of the first
+    atom's column is not a number. Integer columns are parsed as float64, so integers are only exact
+    up to 2**53
+
+    Args:
+        buffer (bytes-like): Dump file contents
+        start (int): Byte offset of per-atom data (i.e. after the ITEM: ATOMS line)
+        end (int): Byte offset of end of per-atom data
+        n_atoms (int): Number of atoms in block
+        atom_data (tuple of str): Per-atom column names
+        columns (iterable of str): Names of columns to parse, from atom_data. If None (default), all
+            columns are parsed
+        float32 (bool): Whether float columns are single precision (default False)
+
+    Returns: dict of 1D arrays of length n_atoms, keyed by the names of the parsed columns
+    """
+
+    n_columns = len(atom_data)
+
+    if columns is None:
+        columns = atom_data
+    else:
+        columns = tuple(columns)
+
+        for name in columns:
+            assert name in atom_data, f"No per-atom data {name}, expected one of {atom_data}"
+
+    indices = [atom_data.index(name) for name in columns]
+
+    if n_atoms == 0:
+        return {name: np.empty(0, column_dtype(name, float32)) for name in columns}
+
+    line_end = buffer.find(b"\n", start, end)
+    first_line = bytes(buffer[start:end if line_end == -1 else line_end])
+    numeric = [is_numeric(token) for token in first_line.split()]
+
+    if len(numeric) != n_columns:
+        raise RuntimeError(f"Per-atom data has {len(numeric)} columns instead of {n_columns}")
+
+    if all(numeric[i] for i in indices):
+        usecols = None if indices == list(range(n_columns)) else indices
+
+        try:
+            values = parse_numeric(buffer, start, end, usecols)
+        except ValueError:
+            raise RuntimeError("Per-atom data contains a value which is not a number, or rows of "
+                               "different lengths") from None
+    else:
+        values = np.array(bytes(buffer[start:end]).split())
+
+        if len(values) != n_atoms * n_columns:
+            raise RuntimeError(f"Per-atom data has {len(values)} values instead of "
+                               f"{n_atoms * n_columns} ({n_atoms} atoms of {n_columns} columns)")
+
+        values = values.reshape(n_atoms, n_columns)[:, indices]
+
+    if len(values) != n_atoms:
+        raise RuntimeError(f"Per-atom data has {len(values)} rows instead of {n_atoms}")
+
+    parsed = {}
+
+    for i, name in enumerate(columns):
+        if not numeric[indices[i]]:
+            parsed[name] = values[:, i].astype(str)
+        else:
+            # Also makes column contiguous
+            parsed[name] = values[:, i].astype(column_dtype(name, float32))
+
+    return parsed
+
+class AtomsCache:
+    """
+    Least-recently-used cache of parsed per-atom columns, bounded by the total size of its arrays
+
+    Entries are keyed by snapshot identifier and precision, and hold the columns of that snapshot
+    parsed so far, so a subset of previously parsed columns is served without parsing. Cached arrays
+    are read-only, since they are shared by all readers. Methods are thread-safe
+
+    ----------------------------------------------------------------------
+    Instance variables:
+
+    max_bytes (int)
+        Byte budget. Least recently used snapshots are evicted to stay within it. Snapshots larger
+        than the budget are not cached, so 0 disables the cache
+
+    nbytes (int, readonly)
+        Total size of cached arrays
+
+    hits, misses, evictions (int, readonly)
+        Number of reads served from the cache, reads which required parsing, and evicted snapshots
+    """
+
+    def __init__(self, max_bytes = DEFAULT_CACHE_BYTES):
+        """
+        Create empty cache
+
+        Args:
+            max_bytes (int): Byte budget of cache (default DEFAULT_CACHE_BYTES)
+        """
+
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def __len__(self):
+        """Number of cached snapshots"""
+        return len(self._entries)
+
+    def __str__(self):
+        return (f"AtomsCache: {len(self)} snapshots, {self._nbytes} / {self.max_bytes} bytes, "
+                f"{self.hits} hits, {self.misses} misses, {self.evictions} evictions")
+
+    __repr__ = __str__
+
+    def get(self, key, columns, parse):
+        """
+        Get columns of a snapshot, parsing the columns which are not cached
+
+        Args:
+            key (hashable): Key of snapshot (e.g. its identifier and precision)
+            columns (tuple of str): Names of columns to get
+            parse (callable): parse(columns) returns dict of parsed arrays for the given column names
+
+        Returns: dict of read-only 1D arrays keyed by columns
+        """
+
+        with self._lock:
+            entry = self._entries.get(key, {})
+            missing = tuple(name for name in columns if name not in entry)
+
+            if missing:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+
+                return {name: entry[name] for name in columns}
+
+        # Parse outside of lock, so that other snapshots can be read concurrently
+        parsed = parse(missing)
+
+        for array in parsed.values():
+            array.setflags(write = False)
+
+        with self._lock:
+            # Entry may have been evicted or extended while parsing
+            entry = self._entries.pop(key, {})
+            self._nbytes -= sum(array.nbytes for array in entry.values())
+
+            entry = {**entry, **parsed}
+            entry_bytes = sum(array.nbytes for array in entry.values())
+
+            if entry_bytes <= self.max_bytes:
+                self._entries[key] = entry
+                self._nbytes += entry_bytes
+
+            self._evict()
+
+        return {name: entry[name] for name in columns}
+
+    def _evict(self):
+        """Evict least recently used snapshots until cache is within budget"""
+
+        while self._nbytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last = False)
+            self._nbytes -= sum(array.nbytes for array in entry.values())
+            self.evictions += 1
+
+    def resize(self, max_bytes):
+        """Change byte budget, evicting snapshots if needed"""
+
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        """Remove all cached snapshots. Counters are not reset"""
+
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
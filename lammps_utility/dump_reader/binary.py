@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+Internal module of dump_reader for LAMMPS binary dump files (dump atom or custom to a file name
+ending in .bin)
+
+Each snapshot of a binary dump is a header followed by the per-atom data of each processor (or
+cluster of processors) as a chunk of doubles, in the byte order of the machine which wrote it:
+
+    magic       int64 -length, char[length] (e.g. "DUMPCUSTOM"), int32 endian, int32 revision.
+                Only written by LAMMPS since 2021
+    timestep    int64
+    n_atoms     int64
+    triclinic   int32
+    boundary    int32[3][2], where 0, 1, 2 and 3 are p, f, s and m
+    box         double[6] xlo xhi ylo yhi zlo zhi, then double[3] xy xz yz if triclinic
+    size_one    int32 number of per-atom columns
+    units       int32 length, char[length] unit style (if revision > 1). Only the first snapshot
+                has a unit style, later ones have length 0
+    time        char flag, then double time if flag (if revision > 1)
+    columns     int32 length, char[length] space-separated column names (if revision > 1)
+    n_chunks    int32
+    chunks      n_chunks times int32 n, double[n] per-atom data of n / size_one atoms
+
+Indexing reads only the headers, seeking over the chunks, and per-atom data is read with
+np.frombuffer straight from the memory-mapped file, without any text conversion. Unit style and time
+are custom data of snapshots, as items UNITS and TIME are in text dumps, where the unit style of the
+first snapshot is given to all snapshots.
+"""
+
+import mmap
+import struct
+import numpy as np
+
+from .sources import Source, SnapshotTable, PackedRows
+from .indexing import SnapshotHeader
+from .store import atoms_to_dump
+from . import indexing, atoms
+
+MAGIC_PREFIX = b"DUMP"
+MAX_MAGIC_LENGTH = 64
+ENDIAN = 1
+
+BOUNDARY_CHARS = "pfsm"
+
+def is_binary(file):
+    """
+    Whether binary file object is a binary dump with a magic string, i.e. written by LAMMPS since
+    2021. The file position is kept
+    """
+
+    position = file.tell()
+    start = file.read(8 + len(MAGIC_PREFIX))
+    file.seek(position)
+
+    if len(start) < 8 + len(MAGIC_PREFIX):
+        return False
+
+    # The marker is the negative length of the magic string, in either byte order
+    markers = struct.unpack("<q", start[:8]) + struct.unpack(">q", start[:8])
+
+    return any(-MAX_MAGIC_LENGTH <= marker < 0 for marker in markers) and start[8:] == MAGIC_PREFIX
+
+def read_header(buffer, offset, atom_data = None):
+    """
+    Read header of the snapshot at byte offset of a binary dump, and skip over its chunks
+
+    Args:
+        buffer (bytes-like): Binary dump file contents
+        offset (int): Byte offset of snapshot
+        atom_data (tuple of str): Per-atom column names. If None (default), the column names stored
+            in the dump are used
+
+    Returns: (header, order) where header is a SnapshotHeader whose atoms_offset is the byte offset
+        of n_chunks, and order is the struct byte order character of the snapshot ("<" or ">")
+    """
+
+    start = offset
+    order = "<"
+    revision = 1
+
+    def read(fmt):
+        nonlocal offset
+        values = struct.unpack_from(order + fmt, buffer, offset)
+        offset += struct.calcsize(order + fmt)
+
+        return values if len(values) > 1 else values[0]
+
+    try:
+        timestep = read("q")
+
+        if timestep < 0:
+            # Negative length of magic string, which is only written by versions of LAMMPS which
+            # also write the byte order
+            if -timestep > MAX_MAGIC_LENGTH:
+                order = ">"
+                offset = start
+                timestep = read("q")
+
+            offset += -timestep
+
+            if read("i") != ENDIAN:
+                raise RuntimeError(f"Invalid byte order flag in binary dump at byte {start}")
+
+            revision = read("i")
+            timestep = read("q")
+
+        n_atoms = read("q")
+        triclinic = read("i")
+        boundary = read("6i")
+        box = read("9d" if triclinic else "6d")
+        size_one = read("i")
+
+        custom = {}
+        columns = None
+
+        if revision > 1:
+            length = read("i")
+
+            if length > 0:
+                custom["UNITS"] = [bytes(buffer[offset:offset + length]).decode()]
+                offset += length
+
+            if read("b"):
+                custom["TIME"] = [repr(read("d"))]
+
+            length = read("i")
+            columns = bytes(buffer[offset:offset + length]).decode().split()
+            offset += length
+
+        atoms_offset = offset
+
+        n_values = 0
+
+        for _ in range(read("i")):
+            n = read("i")
+            n_values += n
+            offset += 8 * n
+    except struct.error:
+        raise RuntimeError(f"Unexpected end of binary dump in snapshot at byte {start}") from None
+
+    if offset > len(buffer):
+        raise RuntimeError(f"Unexpected end of binary dump in snapshot at byte {start}")
+
+    if n_values != n_atoms * size_one:
+        raise RuntimeError(f"Snapshot at byte {start} of binary dump has {n_values} per-atom values "
+                           f"instead of {n_atoms * size_one} ({n_atoms} atoms of {size_one} columns)")
+
+    if atom_data is None:
+        if columns is None:
+            raise RuntimeError("Binary dump does not contain column names, so atom_data must be given")
+
+        atom_data = columns
+
+    if len(atom_data) != size_one:
+        raise RuntimeError(f"Binary dump has {size_one} per-atom columns, but atom_data has "
+                           f"{len(atom_data)}")
+
+    box_BC = ["".join(BOUNDARY_CHARS[flag] for flag in boundary[2 * i:2 * i + 2]) for i in range(3)]
+    box_data = [[box[2 * i], box[2 * i + 1]] + ([box[6 + i]] if triclinic else []) for i in range(3)]
+
+    header = SnapshotHeader(start, atoms_offset, offset, timestep, n_atoms, tuple(atom_data), box_BC,
+                            box_data, custom)
+
+    return header, order
+
+def scan_binary(buffer, atom_data = None):
+    """
+    Index all snapshots of a binary dump (see read_header)
+
+    Returns: (headers, order) where headers is a list of SnapshotHeader and order is the struct
+        byte order character of the dump
+    """
+
+    headers = []
+    offset = 0
+    order = "<"
+    units = None
+
+    while offset < len(buffer):
+        header, order = read_header(buffer, offset, atom_data)
+
+        # LAMMPS only writes the unit style in the first snapshot
+        if "UNITS" in header.custom:
+            units = header.custom["UNITS"]
+        elif units is not None:
+            header.custom = {"UNITS": units, **header.custom}
+
+        headers.append(header)
+        offset = header.end
+
+    return headers, order
+
+
+class BinaryDumpSource(Source):
+    """
+    Instances of this class index a LAMMPS binary dump file into snapshot objects, whose per-atom
+    data is read from the memory-mapped file (see module docstring)
+
+    ----------------------------------------------------------------------
+    Instance variables:
+
+        file: Binary file object of dump
+
+        buffer: Read-only memory map of file (bytes-like)
+
+        order: Byte order of file, as a struct byte order character ("<" or ">")
+
+        snapshots: SnapshotTable of the SourceSnapshot objects from dump
+
+        snapshot_seek_info: PackedRows of the byte offsets (header, chunks, end) of each
+            SourceSnapshot in the dump file
+    """
+
+    def __init__(self, file, atom_data = None):
+        """
+        Indexes binary dump file, creates Snapshot objects, and returns BinaryDumpSource object
+
+        Args:
+            file (binary file object): opened binary dump file
+            atom_data (iterable of str): Per-atom column names. Required for binary dumps written
+                by LAMMPS before 2021, which do not contain them. If None (default), the column names
+                stored in the dump are used
+        """
+
+        self.file = file
+
+        self.buffer = indexing.map_file(file)
+
+        headers, self.order = scan_binary(self.buffer, None if atom_data is None else tuple(atom_data))
+
+        self.snapshots = SnapshotTable(self)
+
+        self.snapshot_seek_info = PackedRows("q", 3)
+
+        for header in headers:
+            self.snapshot_seek_info.append(header.seek_info)
+            self.snapshots.add_header(header)
+
+    def will_need(self, identifier):
+        """Hint that per-atom data of snapshot will be read soon (see indexing.will_need)"""
+
+        _, start, end = self.snapshot_seek_info[identifier]
+
+        indexing.will_need(self.buffer, start, end)
+
+    def read_values(self, identifier):
+        """Get (n_atoms, size_one) array of per-atom values of snapshot, joining its chunks"""
+
+        n_atoms = self.snapshots.n_atoms[identifier]
+        atom_data = self.snapshots.get_atom_data(identifier)
+        _, offset, _ = self.snapshot_seek_info[identifier]
+
+        dtype = np.dtype(self.order + "f8")
+        read_int = struct.Struct(self.order + "i").unpack_from
+
+        (n_chunks,) = read_int(self.buffer, offset)
+        offset += 4
+
+        chunks = []
+
+        for _ in range(n_chunks):
+            (n,) = read_int(self.buffer, offset)
+            chunks.append(np.frombuffer(self.buffer, dtype, n, offset + 4))
+            offset += 4 + 8 * n
+
+        values = chunks[0] if len(chunks) == 1 else np.concatenate(chunks or [np.empty(0, dtype)])
+
+        return values.reshape(n_atoms, len(atom_data))
+
+    def read_snapshot_atoms(self, identifier, columns = None, float32 = False):
+        """
+        Get per-atom data of snapshot as read-only column arrays. Only the requested columns are
+        copied out of the file
+
+        Args:
+            identifier (int): Identifier of snapshot
+            columns (iterable of str): Names of per-atom columns. If None (default), all columns
+            float32 (bool): Whether float columns are single precision (default False)
+
+        Returns: dict of 1D arrays of length n_atoms, keyed by column name
+        """
+        assert 0 <= identifier < len(self.snapshots), f"Invalid identifier {identifier} when attempting to read snapshot"
+
+        atom_data = self.snapshots.get_atom_data(identifier)
+        values = self.read_values(identifier)
+
+        parsed = {}
+
+        for name in (atom_data if columns is None else columns):
+            assert name in atom_data, f"No per-atom data {name}, expected one of {atom_data}"
+
+            parsed[name] = values[:, atom_data.index(name)].astype(atoms.column_dtype(name, float32))
+            parsed[name].setflags(write = False)
+
+        return parsed
+
+    def read_snapshot_dump(self, identifier):
+        """Get string of snapshot in LAMMPS dump format"""
+        assert 0 <= identifier < len(self.snapshots), f"Invalid identifier {identifier} when attempting to read snapshot"
+
+        snapshot = self.snapshots[identifier]
+
+        return (self.get_snapshot_dump_header(snapshot) +
+                atoms_to_dump(snapshot.atom_data, self.read_snapshot_atoms(identifier)))
+
+    def __del__(self):
+        """Close file when out of scope"""
+        if isinstance(getattr(self, "buffer", None), mmap.mmap):
+            self.buffer.close()
+
+        self.file.close()
@@ -3,6 +3,8 @@
 Some common methods and classes shared throughout dump_reader
 """
 
+import numpy as np
+
 def has_no_length(x):
     """
     Used to test whether x can be considered array-like. In this implementation, strings are not
@@ -33,6 +35,24 @@ def is_single_value(x):
         # If len is not defined, x is a single value
         return True
 
+def attempt_cast_string(array):
+    """Attempts to cast string array to number"""
+    
+    try:
+        numeric_array = np.array(array, dtype = float)
+    except ValueError:
+        return array
+        
+    
+    if np.all(np.char.find(array, '.') == -1): # No decimals means integers
+        try:
+            return np.array(array, dtype = int)
+        except ValueError: # Unless written with exponents (e.g. 1e3) or as inf or nan
+            return numeric_array
+    else:
+        return numeric_array
+        
+
 class readonly:
     """
     Class descriptor which allows property to be set only once (presumably during __init__).
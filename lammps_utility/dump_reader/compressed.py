@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""
+Internal module of dump_reader implementing the compressed snapshot store
+
+A compressed store is a store (see store) whose per-atom data is compressed frame by frame:
+
+    compressed.json     atom_data, column encodings, codec, box boundary conditions and custom data
+    frames.bin          compressed blocks of each column of each snapshot
+    blocks.npy          (N * n_columns + 1) int64, byte offset of each block in frames.bin
+    key_frames.npy      (N) int64, keyframe which decoding of each snapshot starts from
+    n_atoms.npy         (N) int64
+    timesteps.npy, box_bounds.npy, box_tri.npy      as for store
+
+Float columns are quantized to integer multiples of a precision (lossy), unless their precision is
+None. Integer and quantized columns are stored as differences from the previous snapshot, except
+for keyframes, so that slowly changing data such as coordinates becomes small integers. Integers
+are zigzag encoded, narrowed to the smallest sufficient byte width and byte-shuffled (all first
+bytes, then all second bytes, ...) before compression, which lets the compressor find the runs of
+zero bytes. Atoms are sorted by id, so that rows line up between snapshots.
+
+Reading a snapshot decodes from its keyframe, so random access costs at most keyframe_interval
+snapshots, while reading snapshots in order decodes each snapshot once.
+"""
+
+from pathlib import Path
+import bz2
+import json
+import lzma
+import threading
+import zlib
+import numpy as np
+
+from . import atoms, indexing, store
+from .sources import Source
+
+COMPRESSED_VERSION = 1
+META_NAME = "compressed.json"
+
+CODECS = {
+    "zlib": (lambda data, level: zlib.compress(data, level), zlib.decompress),
+    "lzma": (lambda data, level: lzma.compress(data, preset = level), lzma.decompress),
+    "bz2": (lambda data, level: bz2.compress(data, compresslevel = max(level, 1)), bz2.decompress)
+}
+
+# Byte widths which integers are narrowed to
+INT_WIDTHS = (1, 2, 4, 8)
+
+def shuffle(values):
+    """Bytes of array with its byte planes stored one after another"""
+    return values.view(np.uint8).reshape(-1, values.itemsize).T.tobytes()
+
+def unshuffle(data, dtype, n):
+    """Inverse of shuffle"""
+    dtype = np.dtype(dtype)
+    return np.frombuffer(data, np.uint8).reshape(dtype.itemsize, n).T.copy().view(dtype).ravel()
+
+def encode_ints(values):
+    """Encode int64 array as its byte width followed by its narrowed, shuffled zigzag encoding"""
+
+    zigzag = ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+    maximum = int(zigzag.max()) if len(zigzag) > 0 else 0
+    width = next(width for width in INT_WIDTHS if maximum < 1 << (8 * width))
+
+    return bytes([width]) + shuffle(zigzag.astype(f"<u{width}"))
+
+def decode_ints(data, n):
+    """Inverse of encode_ints"""
+
+    zigzag = unshuffle(data[1:], f"<u{data[0]}", n).astype(np.uint64)
+
+    return (zigzag >> np.uint64(1)).view(np.int64) ^ -(zigzag & np.uint64(1)).view(np.int64)
+
+def get_dequantize(precision):
+    """
+    Get function converting quantized integers to floats. Where 1/precision is an integer (e.g.
+    precision 0.001), integers are divided by it, which gives the same floats as reading the
+    quantized values as decimal text
+    """
+
+    inverse = round(1 / precision)
+
+    if inverse > 0 and abs(inverse * precision - 1) < 1e-12:
+        return lambda q: q / inverse
+
+    return lambda q: q * precision
+
+def write_compressed(snapshots, path, precision = 1e-3, keyframe_interval = 10, codec = "zlib",
+                     level = 6, allow_overwrite = False, ignore_custom = False):
+    """
+    Write snapshots to a compressed store, one snapshot at a time
+
+    Args:
+        snapshots (Snapshots): Snapshots to write, which must all have the same atom_data
+        path (str or Path): Path of compressed store directory
+        precision (float, None or dict): Quantization step of float columns. Values are stored
+            within precision/2 of their original value. None stores floats exactly. A dict gives
+            the precision of each column by name, where columns not in the dict are exact
+        keyframe_interval (int): Number of snapshots between keyframes (default 10)
+        codec (str): Compressor from the standard library, one of "zlib" (default, fastest to
+            decode), "lzma" (smallest) or "bz2"
+        level (int): Compression level of codec (default 6)
+        allow_overwrite (bool): Whether to write into an existing directory (default False)
+        ignore_custom (bool): Whether to leave out custom data (default False)
+    """
+
+    assert codec in CODECS, f"Unknown codec {codec}, expected one of {tuple(CODECS)}"
+    assert keyframe_interval >= 1, "keyframe_interval must be positive"
+
+    compress, _ = CODECS[codec]
+
+    path = Path(path)
+    path.mkdir(parents = True, exist_ok = allow_overwrite)
+
+    atom_data = snapshots[0].atom_data if len(snapshots) > 0 else ()
+    sort = "id" in atom_data
+
+    meta = {
+        "version": COMPRESSED_VERSION,
+        "atom_data": list(atom_data),
+        "encodings": None,
+        "codec": codec,
+        "keyframe_interval": keyframe_interval,
+        "sorted": sort
+    }
+
+    blocks = [0]
+    key_frames = []
+    previous = {}
+    previous_n_atoms = None
+
+    with open(path / "frames.bin", "wb") as f:
+        for i, snapshot in enumerate(snapshots):
+            if snapshot.atom_data != atom_data:
+                raise RuntimeError(f"Snapshot {i} has per-atom data {snapshot.atom_data}, but "
+                                   f"snapshots in a compressed store must all have {atom_data}")
+
+            parsed = snapshot.atoms()
+
+            if meta["encodings"] is None:
+                meta["encodings"] = [get_encoding(name, parsed[name].dtype, precision)
+                                     for name in atom_data]
+
+            is_key = i % keyframe_interval == 0 or snapshot.n_atoms != previous_n_atoms
+            key_frames.append(i if is_key else key_frames[-1])
+            previous_n_atoms = snapshot.n_atoms
+
+            order = np.argsort(parsed["id"], kind = "stable") if sort else slice(None)
+
+            for name, encoding in zip(atom_data, meta["encodings"]):
+                values = parsed[name][order]
+
+                if encoding["kind"] in ("int", "quantized"):
+                    quantized = quantize(values, encoding, name, i)
+
+                    delta = quantized if is_key else quantized - previous[name]
+                    previous[name] = quantized
+
+                    data = encode_ints(delta)
+                elif encoding["kind"] == "float":
+                    data = shuffle(values)
+                else:
+                    data = "\n".join(values).encode()
+
+                block = compress(data, level)
+
+                f.write(block)
+                blocks.append(blocks[-1] + len(block))
+
+    np.save(path / "blocks.npy", np.array(blocks, dtype = np.int64))
+    np.save(path / "key_frames.npy", np.array(key_frames, dtype = np.int64))
+    np.save(path / "n_atoms.npy", np.asarray(snapshots.n_atoms, dtype = np.int64))
+
+    store.save_tables(path, snapshots, meta, ignore_custom)
+
+    # Written last, so that an incompletely written store cannot be opened
+    with open(path / META_NAME, "w") as f:
+        json.dump(meta, f)
+
+def get_encoding(name, dtype, precision):
+    """Get encoding of column name with dtype dtype (see write_compressed)"""
+
+    if dtype.kind == "i":
+        return {"kind": "int"}
+
+    if dtype.kind == "U":
+        return {"kind": "str"}
+
+    if isinstance(precision, dict):
+        precision = precision.get(name)
+
+    if precision is None:
+        return {"kind": "float"}
+
+    assert precision > 0, f"Precision of {name} must be positive"
+
+    return {"kind": "quantized", "precision": precision}
+
+def quantize(values, encoding, name, i):
+    """Convert int or quantized column to int64"""
+
+    if encoding["kind"] == "int":
+        return values.astype(np.int64)
+
+    scaled = values / encoding["precision"]
+
+    if not np.all(np.abs(scaled) < 2.0**62):
+        raise RuntimeError(f"Per-atom data {name} of snapshot {i} cannot be quantized with precision "
+                           f"{encoding['precision']}; use precision None for this column")
+
+    return np.rint(scaled).astype(np.int64)
+
+
+class CompressedSource(Source):
+    """
+    Instances of this class open a compressed store (see module docstring) into snapshot objects,
+    whose per-atom data is decompressed when requested
+
+    ----------------------------------------------------------------------
+    Instance variables:
+
+        path: Path of compressed store directory
+
+        atom_data: Headers of per-atom data of all snapshots
+
+        buffer: Read-only memory map of frames.bin
+
+        snapshots: list containing SourceSnapshot objects from compressed store
+
+        atoms_cache: AtomsCache of decoded per-atom data (see atoms)
+    """
+
+    def __init__(self, path, cache_bytes = atoms.DEFAULT_CACHE_BYTES):
+        """
+        Open compressed store and create Snapshot objects
+
+        Args:
+            path (str or Path): Path of compressed store directory
+            cache_bytes (int): Byte budget of atoms_cache (default atoms.DEFAULT_CACHE_BYTES)
+        """
+
+        self.path = Path(path)
+
+        with open(self.path / META_NAME, "r") as f:
+            meta = json.load(f)
+
+        if meta.get("version") != COMPRESSED_VERSION:
+            raise RuntimeError(f"Unsupported compressed store version {meta.get('version')}")
+
+        self.atom_data = tuple(meta["atom_data"])
+        self.encodings = dict(zip(self.atom_data, meta["encodings"] or []))
+
+        _, self.decompress = CODECS[meta["codec"]]
+
+        self.blocks = np.load(self.path / "blocks.npy")
+        self.key_frames = np.load(self.path / "key_frames.npy")
+        self.n_atoms = np.load(self.path / "n_atoms.npy")
+
+        with open(self.path / "frames.bin", "rb") as f:
+            self.buffer = indexing.map_file(f)
+
+        self.snapshots = store.load_snapshots(self, self.path, meta, self.n_atoms)
+
+        self.atoms_cache = atoms.AtomsCache(cache_bytes)
+
+        # Last decoded integers of each column as (snapshot, values), so reading in order decodes
+        # each snapshot once
+        self._last_ints = {}
+        self._lock = threading.Lock()
+
+    def read_block(self, identifier, name):
+        """Decompress block of column name of snapshot identifier"""
+
+        i = identifier * len(self.atom_data) + self.atom_data.index(name)
+
+        return self.decompress(self.buffer[self.blocks[i]:self.blocks[i + 1]])
+
+    def decode_ints(self, identifier, name):
+        """Decode int64 values of int or quantized column by accumulating deltas from keyframe"""
+
+        n_atoms = self.n_atoms[identifier]
+        key_frame = self.key_frames[identifier]
+
+        with self._lock:
+            frame, values = self._last_ints.get(name, (-1, None))
+
+            if not key_frame <= frame <= identifier:
+                frame, values = key_frame, decode_ints(self.read_block(key_frame, name), n_atoms)
+
+            for i in range(frame + 1, identifier + 1):
+                values = values + decode_ints(self.read_block(i, name), n_atoms)
+
+            self._last_ints[name] = (identifier, values)
+
+        return values
+
+    def decode_atoms(self, identifier, columns, float32 = False):
+        """Decode per-atom columns of snapshot into dict of arrays"""
+
+        float_dtype = np.dtype(np.float32 if float32 else np.float64)
+        n_atoms = self.n_atoms[identifier]
+
+        values = {}
+
+        for name in columns:
+            assert name in self.encodings, f"No per-atom data {name}, expected one of {self.atom_data}"
+
+            encoding = self.encodings[name]
+
+            if encoding["kind"] == "int":
+                values[name] = self.decode_ints(identifier, name)
+            elif encoding["kind"] == "quantized":
+                dequantize = get_dequantize(encoding["precision"])
+                values[name] = dequantize(self.decode_ints(identifier, name)).astype(float_dtype)
+            elif encoding["kind"] == "float":
+                data = self.read_block(identifier, name)
+                values[name] = unshuffle(data, np.float64, n_atoms).astype(float_dtype)
+            else:
+                data = self.read_block(identifier, name).decode()
+                values[name] = np.array(data.split("\n") if n_atoms > 0 else [], dtype = str)
+
+        return values
+
+    def read_snapshot_atoms(self, identifier, columns = None, float32 = False):
+        """
+        Decompress per-atom data of snapshot into column arrays, which are read-only since decoded
+        columns are cached in atoms_cache. Atoms are sorted by id
+
+        Args:
+            identifier (int): Identifier of snapshot
+            columns (iterable of str): Names of per-atom columns. If None (default), all columns
+            float32 (bool): Whether float columns are single precision (default False)
+
+        Returns: dict of 1D arrays of length n_atoms, keyed by column name
+        """
+        assert 0 <= identifier < len(self.snapshots), f"Invalid identifier {identifier} when attempting to read snapshot"
+
+        def decode(missing):
+            return self.decode_atoms(identifier, missing, float32)
+
+        columns = self.atom_data if columns is None else tuple(columns)
+
+        return self.atoms_cache.get((identifier, float32), columns, decode)
+
+    def read_snapshot_dump(self, identifier):
+        """Get string of snapshot in LAMMPS dump format"""
+
+        snapshot = self.snapshots[identifier]
+
+        columns = self.read_snapshot_atoms(identifier)
+
+        return self.get_snapshot_dump_header(snapshot) + store.atoms_to_dump(self.atom_data, columns)
+
+    def __del__(self):
+        """Close memory map of frames.bin"""
+        if hasattr(getattr(self, "buffer", None), "close"):
+            self.buffer.close()
@@ -0,0 +1,493 @@
+# -*- coding: utf-8 -*-
+"""
+Internal module of dump_reader for random access to gzip-compressed LAMMPS dumps (e.g. written by
+dump atom/gz or custom/gz)
+
+A gzip stream can only be decompressed from its start, so a compressed dump is indexed in a single
+streaming pass which also records checkpoints, i.e. positions from which decompression can resume.
+Reading a snapshot then only decompresses from the nearest checkpoint before it. Byte offsets of
+snapshots (see indexing.SnapshotHeader) refer to the uncompressed dump.
+
+Checkpoints are of three kinds:
+
+    member      Start of a gzip member (e.g. of concatenated gzip files), which needs no state
+    sync        Start of a deflate block after a sync flush (the empty stored block 00 00 ff ff
+                written by gzflush, which LAMMPS calls after each snapshot by default). These are
+                byte-aligned, and only need the preceding 32 KiB of uncompressed data
+    state       Copy of the decompressor, for streams without member starts or sync flushes
+
+zlib cannot serialize the state of a decompressor, so state checkpoints only exist in memory, while
+member and sync checkpoints are saved with the index of the dump (see index_cache). State
+checkpoints which are lost by loading a saved index are recreated as snapshots are read.
+"""
+
+import base64
+import bisect
+import mmap
+import threading
+import zlib
+from warnings import warn
+
+from .sources import Source, SnapshotTable, PackedRows
+from .indexing import SnapshotHeader
+from . import indexing, index_cache, atoms
+
+GZIP_MAGIC = b"\x1f\x8b"
+GZIP_WBITS = zlib.MAX_WBITS | 16
+GZIP_TRAILER_BYTES = 8
+
+SYNC_MARKER = b"\x00\x00\xff\xff"
+WINDOW_BYTES = 1 << 15
+
+# Compressed bytes decompressed at a time
+READ_BYTES = 1 << 20
+
+# Default number of uncompressed bytes between checkpoints, which bounds the bytes decompressed to
+# read a snapshot
+CHECKPOINT_SPACING = 1 << 25
+
+# Compressed bytes decompressed to check a sync checkpoint
+VERIFY_BYTES = 1 << 16
+
+def is_gzip(file):
+    """Whether binary file object starts with the gzip magic number. The file position is kept"""
+
+    position = file.tell()
+    magic = file.read(len(GZIP_MAGIC))
+    file.seek(position)
+
+    return magic == GZIP_MAGIC
+
+def shift_header(header, shift):
+    """Copy of SnapshotHeader with byte offsets increased by shift"""
+
+    return SnapshotHeader(header.offset + shift, header.atoms_offset + shift, header.end + shift,
+                          header.timestep, header.n_atoms, header.atom_data, header.box_BC,
+                          header.box_data, header.custom)
+
+
+class Inflater:
+    """
+    Decompresses a gzip buffer from a checkpoint, continuing across gzip members
+
+    ----------------------------------------------------------------------
+    Instance variables:
+
+        buffer: Compressed data (bytes-like)
+
+        decompressor: zlib decompression object of the current gzip member
+
+        raw: Whether decompressor decompresses raw deflate data, so the gzip trailer of the member
+            is left to be skipped
+
+        in_offset: Byte offset of buffer up to which data has been decompressed
+
+        out_offset: Byte offset of the uncompressed data produced so far
+
+        member_start: (in_offset, out_offset) of the most recent gzip member started
+    """
+
+    __slots__ = ("buffer", "decompressor", "raw", "in_offset", "out_offset", "member_start")
+
+    def __init__(self, buffer, decompressor, raw, in_offset, out_offset):
+        self.buffer = buffer
+        self.decompressor = decompressor
+        self.raw = raw
+        self.in_offset = in_offset
+        self.out_offset = out_offset
+        self.member_start = None
+
+    def copy(self):
+        """Independent copy of inflater in its current state"""
+        return Inflater(self.buffer, self.decompressor.copy(), self.raw, self.in_offset,
+                        self.out_offset)
+
+    def feed(self, stop):
+        """Decompress buffer[in_offset:stop] and return the uncompressed bytes"""
+
+        output = []
+
+        while self.in_offset < stop:
+            data = self.decompressor.decompress(self.buffer[self.in_offset:stop])
+            output.append(data)
+            self.out_offset += len(data)
+
+            if not self.decompressor.eof:
+                self.in_offset = stop
+                break
+
+            # End of member, after which the next one begins
+            end = stop - len(self.decompressor.unused_data)
+
+            if self.raw:
+                end += GZIP_TRAILER_BYTES
+
+            if self.buffer[end:end + len(GZIP_MAGIC)] != GZIP_MAGIC:
+                # Nothing but padding follows
+                self.in_offset = len(self.buffer)
+                break
+
+            self.decompressor = zlib.decompressobj(GZIP_WBITS)
+            self.raw = False
+            self.in_offset = end
+            self.member_start = (end, self.out_offset)
+
+        return b"".join(output)
+
+    @property
+    def at_end(self):
+        """Whether the stream ended with a complete gzip member"""
+        return self.in_offset >= len(self.buffer) and self.decompressor.eof
+
+
+class Checkpoint:
+    """
+    Position of a gzip buffer from which decompression can resume (see module docstring)
+
+    ----------------------------------------------------------------------
+    Instance variables:
+
+        kind (str): "member", "sync" or "state"
+
+        in_offset (int): Byte offset of compressed data
+
+        out_offset (int): Byte offset of uncompressed data
+
+        window (bytes): For sync checkpoints, the uncompressed data preceding out_offset
+
+        inflater (Inflater): For state checkpoints, the inflater to copy
+    """
+
+    __slots__ = ("kind", "in_offset", "out_offset", "window", "inflater")
+
+    def __init__(self, kind, in_offset, out_offset, window = None, inflater = None):
+        self.kind = kind
+        self.in_offset = in_offset
+        self.out_offset = out_offset
+        self.window = window
+        self.inflater = inflater
+
+    @classmethod
+    def from_inflater(cls, inflater):
+        """State checkpoint of inflater in its current state"""
+        return cls("state", inflater.in_offset, inflater.out_offset, inflater = inflater.copy())
+
+    @property
+    def persistent(self):
+        """Whether checkpoint can be saved"""
+        return self.kind != "state"
+
+    def open(self, buffer):
+        """Create an Inflater decompressing buffer from this checkpoint"""
+
+        if self.kind == "member":
+            return Inflater(buffer, zlib.decompressobj(GZIP_WBITS), False, self.in_offset,
+                            self.out_offset)
+
+        if self.kind == "sync":
+            return Inflater(buffer, zlib.decompressobj(-zlib.MAX_WBITS, zdict = self.window), True,
+                            self.in_offset, self.out_offset)
+
+        return self.inflater.copy()
+
+    def to_list(self):
+        """Convert persistent checkpoint to JSON-compatible list"""
+
+        window = None if self.window is None else base64.b64encode(zlib.compress(self.window)).decode()
+
+        return [self.kind, self.in_offset, self.out_offset, window]
+
+    @classmethod
+    def from_list(cls, values):
+        """Inverse of to_list"""
+
+        kind, in_offset, out_offset, window = values
+
+        if window is not None:
+            window = zlib.decompress(base64.b64decode(window))
+
+        return cls(kind, in_offset, out_offset, window)
+
+def is_sync_point(buffer, inflater, window):
+    """
+    Whether decompression can resume at inflater's position with a fresh raw decompressor and the
+    given window, i.e. whether the preceding sync marker really ends a sync flush. Both are used to
+    decompress the following VERIFY_BYTES, which must give the same data
+    """
+
+    checkpoint = Checkpoint("sync", inflater.in_offset, inflater.out_offset, window)
+    stop = min(inflater.in_offset + VERIFY_BYTES, len(buffer))
+
+    try:
+        data = checkpoint.open(buffer).feed(stop)
+    except zlib.error:
+        return False
+
+    return data == inflater.copy().feed(stop)
+
+def scan_gzip(buffer, spacing = CHECKPOINT_SPACING, verify = False):
+    """
+    Index the snapshots of a gzip-compressed dump in one streaming pass, and record checkpoints
+    about every spacing uncompressed bytes
+
+    Only the unindexed end of the uncompressed data is kept in memory. A compressed dump which ends
+    in the middle of its gzip stream (e.g. one still being written) raises a warning, and an
+    incomplete final snapshot is then ignored
+
+    Args:
+        buffer (bytes-like): Compressed dump file contents
+        spacing (int): Minimum number of uncompressed bytes between checkpoints
+            (default CHECKPOINT_SPACING)
+        verify (bool): Whether to verify the number of per-atom lines (see indexing.scan_snapshot)
+
+    Returns: (headers, checkpoints) where headers is a list of SnapshotHeader with offsets of the
+        uncompressed dump, and checkpoints a list of Checkpoint in order of offset
+    """
+
+    checkpoints = [Checkpoint("member", 0, 0)]
+    inflater = checkpoints[0].open(buffer)
+
+    size = len(buffer)
+
+    headers = []
+    previous = None
+
+    # Uncompressed data from text_offset which is not yet indexed
+    text = bytearray()
+    text_offset = 0
+
+    # Incomplete snapshots are only scanned again once text has grown by half, so that a huge
+    # snapshot is not scanned once per read
+    scan_size = 0
+
+    window = b""
+
+    while inflater.in_offset < size:
+        wanted = inflater.out_offset - checkpoints[-1].out_offset >= spacing
+
+        stop = min(inflater.in_offset + READ_BYTES, size)
+        marker = buffer.find(SYNC_MARKER, inflater.in_offset, stop) if wanted else -1
+
+        if marker != -1:
+            stop = marker + len(SYNC_MARKER)
+
+        member_start = inflater.member_start
+
+        try:
+            data = inflater.feed(stop)
+        except zlib.error as e:
+            raise RuntimeError(f"Compressed dump is corrupt: {e}") from None
+
+        window = (window + data[-WINDOW_BYTES:])[-WINDOW_BYTES:]
+
+        if wanted:
+            if inflater.member_start != member_start:
+                checkpoints.append(Checkpoint("member", *inflater.member_start))
+            elif marker != -1 and is_sync_point(buffer, inflater, window):
+                checkpoints.append(Checkpoint("sync", inflater.in_offset, inflater.out_offset,
+                                              window))
+            elif inflater.out_offset - checkpoints[-1].out_offset >= 2 * spacing:
+                checkpoints.append(Checkpoint.from_inflater(inflater))
+
+        text += data
+
+        if len(text) < scan_size:
+            continue
+
+        new_headers = indexing.scan_dump(text, previous = previous, verify = verify,
+                                         complete_only = True)
+
+        if new_headers:
+            previous = new_headers[-1]
+            headers += [shift_header(header, text_offset) for header in new_headers]
+
+            del text[:previous.end]
+            text_offset += previous.end
+            scan_size = 0
+        else:
+            scan_size = len(text) * 3 // 2
+
+    truncated = not inflater.at_end
+
+    if truncated:
+        warn("Compressed dump ends in the middle of its gzip stream, so it may be truncated")
+
+    new_headers = indexing.scan_dump(text, previous = previous, verify = verify,
+                                     complete_only = truncated)
+    headers += [shift_header(header, text_offset) for header in new_headers]
+
+    return headers, checkpoints
+
+
+class GzipDumpSource(Source):
+    """
+    Instances of this class index a gzip-compressed LAMMPS dump file into snapshot objects, whose
+    data is decompressed from the nearest checkpoint when it is read (see module docstring)
+
+    ----------------------------------------------------------------------
+    Instance variables:
+
+        file: Binary file object of compressed dump
+
+        buffer: Read-only memory map of file (bytes-like)
+
+        snapshots: SnapshotTable of the SourceSnapshot objects from dump
+
+        snapshot_seek_info: PackedRows of the byte offsets (header, per-atom data, end) of each
+            SourceSnapshot in the uncompressed dump
+
+        checkpoints: list of Checkpoint in order of offset
+
+        checkpoint_spacing: Minimum number of uncompressed bytes between checkpoints
+
+        atoms_cache: AtomsCache of parsed per-atom data (see atoms)
+    """
+
+    def __init__(self, file, index_path = None, verify = False, checkpoint_spacing = CHECKPOINT_SPACING,
+                 cache_bytes = atoms.DEFAULT_CACHE_BYTES):
+        """
+        Indexes compressed dump file, creates Snapshot objects, and returns GzipDumpSource object
+
+        Args:
+            file (binary file object): opened gzip-compressed dump file
+            index_path (str or Path): Path of index file to load the index and checkpoints from
+                and save them to (see index_cache). If None (default), the dump file is always
+                indexed
+            verify (bool): Whether to count the per-atom lines of each snapshot while indexing and
+                raise an error if they do not match its number of atoms (default False)
+            checkpoint_spacing (int): Minimum number of uncompressed bytes between checkpoints,
+                which bounds the data decompressed to read a snapshot. Each checkpoint holds up to
+                about 40 KiB (default CHECKPOINT_SPACING, i.e. 32 MiB)
+            cache_bytes (int): Byte budget of the cache of parsed per-atom data, atoms_cache
+                (default atoms.DEFAULT_CACHE_BYTES, i.e. 256 MiB)
+        """
+
+        self.file = file
+
+        self.buffer = indexing.map_file(file)
+
+        self.snapshots = SnapshotTable(self)
+
+        self.snapshot_seek_info = PackedRows("q", 3)
+
+        self.checkpoint_spacing = checkpoint_spacing
+
+        self.atoms_cache = atoms.AtomsCache(cache_bytes)
+
+        self._lock = threading.Lock()
+
+        checkpoints = None
+
+        if index_path is not None:
+            _, extra = index_cache.load_index(index_path, self.buffer, file, self.snapshots,
+                                              self.snapshot_seek_info, extra = True)
+
+            if extra is not None:
+                checkpoints = [Checkpoint.from_list(values) for values in extra["checkpoints"]]
+
+        if checkpoints is None:
+            headers, checkpoints = scan_gzip(self.buffer, checkpoint_spacing, verify)
+
+            for header in headers:
+                self.snapshot_seek_info.append(header.seek_info)
+                self.snapshots.add_header(header)
+
+            if index_path is not None:
+                extra = {"checkpoints": [checkpoint.to_list() for checkpoint in checkpoints
+                                         if checkpoint.persistent]}
+
+                index_cache.save_index(index_path, self.buffer, file, self.snapshots,
+                                       self.snapshot_seek_info, headers[-1].end if headers else 0,
+                                       extra)
+
+        self.checkpoints = checkpoints
+        self._checkpoint_offsets = [checkpoint.out_offset for checkpoint in checkpoints]
+
+    def add_checkpoint(self, checkpoint):
+        """Insert checkpoint, unless it is within checkpoint_spacing of the preceding one"""
+
+        with self._lock:
+            i = bisect.bisect_right(self._checkpoint_offsets, checkpoint.out_offset)
+
+            if checkpoint.out_offset - self._checkpoint_offsets[i - 1] >= self.checkpoint_spacing:
+                self.checkpoints.insert(i, checkpoint)
+                self._checkpoint_offsets.insert(i, checkpoint.out_offset)
+
+    def decompress(self, start, end):
+        """
+        Get bytes [start, end) of the uncompressed dump, decompressing from the nearest checkpoint.
+        State checkpoints are added along the way where checkpoints are further apart than
+        checkpoint_spacing
+
+        Returns: bytes
+        """
+
+        with self._lock:
+            i = bisect.bisect_right(self._checkpoint_offsets, start) - 1
+            inflater = self.checkpoints[i].open(self.buffer)
+
+            next_offset = (self._checkpoint_offsets[i + 1] if i + 1 < len(self.checkpoints)
+                           else float("inf"))
+
+        last_offset = inflater.out_offset
+        output = []
+        size = len(self.buffer)
+
+        while inflater.out_offset < end and inflater.in_offset < size:
+            if (inflater.out_offset - last_offset >= self.checkpoint_spacing
+                and next_offset - inflater.out_offset >= self.checkpoint_spacing):
+                self.add_checkpoint(Checkpoint.from_inflater(inflater))
+                last_offset = inflater.out_offset
+
+            data_offset = inflater.out_offset
+            data = inflater.feed(min(inflater.in_offset + READ_BYTES, size))
+
+            if inflater.out_offset > start:
+                output.append(data[max(0, start - data_offset):end - data_offset])
+
+        return b"".join(output)
+
+    def read_snapshot_dump(self, identifier):
+        """Get string of dump stored in file"""
+        assert 0 <= identifier < len(self.snapshots), f"Invalid identifier {identifier} when attempting to read snapshot"
+
+        start, _, end = self.snapshot_seek_info[identifier]
+
+        return self.decompress(start, end).decode()
+
+    def read_snapshot_atoms(self, identifier, columns = None, float32 = False):
+        """
+        Decompress and parse per-atom data stored in file into column arrays (see
+        atoms.parse_atoms). Parsed columns are cached in atoms_cache, so the returned arrays are
+        read-only
+
+        Args:
+            identifier (int): Identifier of snapshot
+            columns (iterable of str): Names of per-atom columns to parse. If None (default), all
+                columns are parsed
+            float32 (bool): Whether float columns are single precision (default False)
+
+        Returns: dict of 1D arrays of length n_atoms, keyed by column name
+        """
+        assert 0 <= identifier < len(self.snapshots), f"Invalid identifier {identifier} when attempting to read snapshot"
+
+        n_atoms = self.snapshots.n_atoms[identifier]
+        atom_data = self.snapshots.get_atom_data(identifier)
+        _, start, end = self.snapshot_seek_info[identifier]
+
+        def parse(missing):
+            data = self.decompress(start, end)
+
+            return atoms.parse_atoms(data, 0, len(data), n_atoms, atom_data,
+                                     columns = missing, float32 = float32)
+
+        columns = atom_data if columns is None else tuple(columns)
+
+        return self.atoms_cache.get((identifier, float32), columns, parse)
+
+    def __del__(self):
+        """Close file when out of scope"""
+        if isinstance(getattr(self, "buffer", None), mmap.mmap):
+            self.buffer.close()
+
+        self.file.close()
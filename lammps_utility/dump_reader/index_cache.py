@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Internal module of dump_reader for persisting dump file indexes to disk
+
+An index file stores the global data of the snapshots of a dump file, as the columns of its
+sources.SnapshotTable, and their byte offsets, along with the size, modification time and a
+content fingerprint of the dump when it was indexed. Reopening an unchanged dump is then a single
+read of the (small) index file, and a dump which has grown since it was indexed only needs its new
+data scanned.
+
+Indexes are saved from and loaded into the columns directly, so no SnapshotHeader (see indexing)
+is kept per snapshot to save them.
+"""
+
+from pathlib import Path
+import hashlib
+import json
+import os
+from warnings import warn
+
+INDEX_VERSION = 3
+INDEX_SUFFIX = ".index"
+
+FINGERPRINT_BYTES = 1 << 16
+
+def get_index_path(dump_path, cache_dir = None):
+    """
+    Get path of the index file for dump_path
+
+    Args:
+        dump_path (str or Path): Path of dump file
+        cache_dir (str or Path): Directory to store index files in. If None (default), the index
+            file is stored next to the dump file
+
+    Returns: Path
+    """
+
+    dump_path = Path(dump_path).resolve()
+
+    if cache_dir is None:
+        return dump_path.with_name(dump_path.name + INDEX_SUFFIX)
+
+    # Hash full path so that dumps of the same name in different directories do not collide
+    path_hash = hashlib.blake2b(str(dump_path).encode(), digest_size = 8).hexdigest()
+
+    return Path(cache_dir) / f"{dump_path.name}.{path_hash}{INDEX_SUFFIX}"
+
+def fingerprint(buffer, size):
+    """Hash the first and last FINGERPRINT_BYTES of buffer[0:size]"""
+
+    digest = hashlib.blake2b(digest_size = 16)
+    digest.update(buffer[0:min(size, FINGERPRINT_BYTES)])
+    digest.update(buffer[max(0, size - FINGERPRINT_BYTES):size])
+
+    return digest.hexdigest()
+
+def load_index(index_path, buffer, file, snapshots, seek_info, extra = False):
+    """
+    Load index of dump file into the (empty) columns of its snapshots, if it is still valid.
+    Nothing is loaded otherwise
+
+    If the dump file has grown since it was indexed, the final indexed snapshot is discarded, since
+    it may have been incomplete when it was indexed
+
+    Args:
+        index_path (Path): Path of index file
+        buffer (bytes-like): Dump file contents
+        file (file object): Opened dump file
+        snapshots (sources.SnapshotTable): Table the snapshots are appended to
+        seek_info (sources.PackedRows): Rows the byte offsets (header, per-atom data, end) of the
+            snapshots are appended to
+        extra (bool): Whether to also return the extra data saved with the index (see save_index).
+            The index is then only valid if the dump file is unchanged (default False)
+
+    Returns: offset, the byte offset of buffer where indexing must resume, or (offset, extra data)
+        if extra, where the extra data is None if the index is not valid
+    """
+
+    invalid = (0, None) if extra else 0
+
+    try:
+        with open(index_path, "r") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return invalid
+
+    stat = os.fstat(file.fileno())
+    size = len(buffer)
+    indexed_size = index.get("size", -1)
+
+    if index.get("version") != INDEX_VERSION or not 0 <= indexed_size <= size:
+        return invalid
+
+    if index["fingerprint"] != fingerprint(buffer, indexed_size):
+        return invalid
+
+    offsets = index["seek_info"]
+    n_snapshots = len(offsets) // 3
+
+    if indexed_size == size:
+        if index["mtime"] != stat.st_mtime_ns:
+            # Rewritten in place, so the fingerprint cannot be trusted
+            return invalid
+
+        if extra and "extra" not in index:
+            return invalid
+
+        offset = index["offset"]
+    else:
+        # Dump has grown
+        if n_snapshots == 0 or extra:
+            return invalid
+
+        n_snapshots -= 1
+        offset = offsets[3 * n_snapshots]
+
+    # Offsets first, as when indexing (see sources.DumpFileSource.add_header)
+    seek_info.extend(offsets[:3 * n_snapshots])
+    snapshots.add_lists(index["snapshots"], n_snapshots)
+
+    return (offset, index["extra"]) if extra else offset
+
+def save_index(index_path, buffer, file, snapshots, seek_info, offset, extra = None):
+    """
+    Write index of dump file. A warning is raised if the index could not be written
+
+    Args:
+        index_path (Path): Path of index file
+        buffer (bytes-like): Dump file contents
+        file (file object): Opened dump file
+        snapshots (sources.SnapshotTable): All indexed snapshots in dump file
+        seek_info (sources.PackedRows): Byte offsets (header, per-atom data, end) of snapshots
+        offset (int): Byte offset where indexing stopped, which is before the end of buffer if the
+            final snapshot was incomplete
+        extra (JSON-compatible): Additional data of the index, e.g. decompression checkpoints
+            (default None)
+    """
+
+    size = len(buffer)
+
+    index = {
+        "version": INDEX_VERSION,
+        "size": size,
+        "mtime": os.fstat(file.fileno()).st_mtime_ns,
+        "fingerprint": fingerprint(buffer, size),
+        "offset": offset,
+        "seek_info": seek_info.values.tolist(),
+        "snapshots": snapshots.to_lists()
+    }
+
+    if extra is not None:
+        index["extra"] = extra
+
+    temp_path = Path(index_path).with_name(Path(index_path).name + f".{os.getpid()}.tmp")
+
+    try:
+        Path(index_path).parent.mkdir(parents = True, exist_ok = True)
+
+        with open(temp_path, "w") as f:
+            json.dump(index, f, separators = (',', ':'))
+
+        # Atomic, so concurrent readers never see a partially written index
+        os.replace(temp_path, index_path)
+    except OSError as e:
+        warn(f"Could not write dump index {index_path}: {e}")
@@ -0,0 +1,471 @@
+# -*- coding: utf-8 -*-
+"""
+Internal module of dump_reader for locating snapshots in LAMMPS dump files
+
+Indexing operates on a bytes-like buffer of the dump file (usually a read-only memory map), so
+headers are found with bulk byte searches and per-atom lines are never read one at a time. All
+positions recorded here are byte offsets into the buffer.
+"""
+
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+ITEM_BYTES = b"ITEM: "
+ATOMS_ITEM_BYTES = b"ITEM: ATOMS"
+
+# Per-atom blocks estimated to be at least SKIP_MIN_BYTES are skipped over (see skip_atoms). The skip
+# lands SKIP_MARGIN (as a fraction of the estimated block size) short of the estimated end
+SKIP_MIN_BYTES = 1 << 20
+SKIP_MARGIN = 0.02
+
+# Smallest byte range worth handing to a worker process when indexing in parallel
+MIN_RANGE_BYTES = 1 << 26
+
+TIMESTEP_ITEM_STR = "TIMESTEP"
+N_ATOMS_ITEM_STR = "NUMBER OF ATOMS"
+BOX_ITEM_STR = "BOX BOUNDS"
+
+def map_file(f):
+    """
+    Memory-map binary file object f read-only
+
+    Empty files cannot be mapped, so an empty bytes object is returned in that case
+    """
+
+    if os.fstat(f.fileno()).st_size == 0:
+        return b""
+
+    return mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+
+def will_need(buffer, start, end):
+    """
+    Advise the kernel that buffer[start:end] will be read soon, so that it is read ahead in the
+    background. Does nothing unless buffer is a memory map and the platform supports it
+    """
+
+    if not isinstance(buffer, mmap.mmap) or not hasattr(mmap, "MADV_WILLNEED") or end <= start:
+        return
+
+    start -= start % mmap.PAGESIZE
+
+    buffer.madvise(mmap.MADV_WILLNEED, start, end - start)
+
+def find_item(buffer, start, stop, item = ITEM_BYTES):
+    """
+    Find byte offset of the next line in buffer[start:stop] beginning with item, or -1 if none
+
+    Candidates are located by searching for the single leading byte of item, which runs at memchr
+    speed since per-atom data is numeric and rarely contains it. A candidate is only accepted when
+    it begins a line and matches item.
+    """
+
+    find = buffer.find # Localize for speed
+    lead = item[0:1]
+    size = len(item)
+
+    position = find(lead, start, stop)
+
+    while position != -1:
+        # 10 == ord("\n")
+        if (position == 0 or buffer[position - 1] == 10) and buffer[position:position + size] == item:
+            return position
+
+        position = find(lead, position + 1, stop)
+
+    return -1
+
+
+class IncompleteSnapshotError(RuntimeError):
+    """Raised when the data ends part way through a snapshot header"""
+    pass
+
+
+class SnapshotHeader:
+    """
+    Global data and byte offsets of one snapshot, as found while indexing a dump file
+
+    Instances are plain records, so they are cheap to create and can be pickled
+
+    ----------------------------------------------------------------------
+    Instance variables:
+
+        offset: Byte offset of the first header line of the snapshot
+
+        atoms_offset: Byte offset of the first per-atom line of the snapshot
+
+        end: Byte offset one past the last per-atom line of the snapshot
+
+        timestep (int)
+
+        n_atoms (int)
+
+        atom_data (tuple): Headers of per-atom data
+
+        box_BC (list): BC strings for each dim (e.g. ["pp", "pp", "pp"])
+
+        box_data (list): Lists of strings for each numeric entry in the X, Y and Z box data
+
+        custom (dict): Lines (list of str) of each custom item, keyed by item name
+    """
+
+    __slots__ = ("offset", "atoms_offset", "end", "timestep", "n_atoms", "atom_data", "box_BC",
+                 "box_data", "custom")
+
+    def __init__(self, offset, atoms_offset, end, timestep, n_atoms, atom_data, box_BC, box_data,
+                 custom):
+        self.offset = offset
+        self.atoms_offset = atoms_offset
+        self.end = end
+        self.timestep = timestep
+        self.n_atoms = n_atoms
+        self.atom_data = atom_data
+        self.box_BC = box_BC
+        self.box_data = box_data
+        self.custom = custom
+
+    @property
+    def seek_info(self):
+        """Byte offsets of snapshot as [offset, atoms_offset, end]"""
+        return [self.offset, self.atoms_offset, self.end]
+
+
+def parse_header(lines, offset):
+    """
+    Parse the header lines of a snapshot (everything before ITEM: ATOMS)
+
+    Args:
+        lines (list of str): Header lines
+        offset (int): Byte offset of the header, used for error reporting
+
+    Returns: timestep, n_atoms, box_BC, box_data, custom (see SnapshotHeader)
+    """
+
+    timestep, n_atoms, box_BC, box_data = None, None, None, None
+    custom = {}
+
+    n_lines = len(lines)
+    i = 0
+
+    while i < n_lines:
+        line = lines[i]
+
+        if not line.startswith("ITEM: "):
+            raise RuntimeError(f"Dump format error in snapshot header at byte {offset}")
+
+        sep_items = line[6:].split()
+        item_str = ' '.join(sep_items)
+
+        if item_str == TIMESTEP_ITEM_STR:
+            timestep = int(lines[i + 1])
+            i += 2
+        elif item_str == N_ATOMS_ITEM_STR:
+            n_atoms = int(lines[i + 1])
+            i += 2
+        elif ' '.join(sep_items[0:2]) == BOX_ITEM_STR:
+            box_BC = sep_items[-3:]
+            box_data = [lines[i + 1].split(), lines[i + 2].split(), lines[i + 3].split()]
+            i += 4
+        else:
+            # Parsing for custom item occurs if item is not recognized as built-in
+            i += 1
+            item_lines = []
+
+            while i < n_lines and not lines[i].startswith("ITEM: "):
+                item_lines.append(lines[i])
+                i += 1
+
+            if not item_lines: # Empty data is not allowed
+                raise RuntimeError(f"Missing data for custom item {item_str}")
+
+            custom[item_str] = item_lines
+
+    assert timestep is not None, f"Missing timestep header info at byte {offset}"
+    assert n_atoms is not None, f"Missing natoms header info at byte {offset}"
+    assert box_data is not None, f"Missing box header info at byte {offset}"
+
+    return timestep, n_atoms, box_BC, box_data, custom
+
+
+def count_lines(buffer, start, end):
+    """Count lines in buffer[start:end], including a final line without a newline"""
+
+    if end <= start:
+        return 0
+
+    n_lines = np.count_nonzero(np.frombuffer(buffer, np.uint8, end - start, start) == 10)
+
+    if buffer[end - 1] != 10:
+        n_lines += 1
+
+    return int(n_lines)
+
+def is_complete(buffer, header):
+    """
+    Whether the per-atom data of the snapshot of header has been completely written, i.e. it holds
+    n_atoms newline-terminated lines. Only the per-atom block of the snapshot is read
+    """
+
+    if header.n_atoms == 0:
+        return True
+
+    if buffer[header.end - 1] != 10: # 10 == ord("\n")
+        return False
+
+    return count_lines(buffer, header.atoms_offset, header.end) >= header.n_atoms
+
+def skip_atoms(buffer, atoms_offset, stop, n_atoms, atom_data, previous):
+    """
+    Find end of a per-atom block by skipping over most of it
+
+    The byte size of the block is estimated from the bytes per atom of the previous snapshot, and
+    the next item is searched for from SKIP_MARGIN short of the estimated end. The skip is abandoned
+    (returning None) when the estimate does not apply or the result looks wrong: the skip must land
+    on a per-atom line, and the block found must not be more than SKIP_MARGIN larger than estimated.
+    A skip which overshoots into a following snapshot cannot be told apart by its size when the
+    previous snapshot had longer lines, so the skipped bytes must also hold no item.
+
+    Returns: byte offset of end of block, or None if the block must be searched instead
+    """
+
+    if previous is None or previous.atom_data != atom_data or previous.n_atoms == 0:
+        return None
+
+    estimate = (previous.end - previous.atoms_offset) * n_atoms / previous.n_atoms
+
+    if estimate < SKIP_MIN_BYTES:
+        return None
+
+    landing = atoms_offset + int(estimate * (1 - SKIP_MARGIN))
+
+    if landing >= stop:
+        return None
+
+    # The skipped bytes must not hold the next snapshot, else snapshots would be merged
+    if find_item(buffer, atoms_offset, landing) != -1:
+        return None
+
+    end = find_item(buffer, landing, stop)
+
+    if end == -1:
+        end = stop
+
+    if end - atoms_offset > estimate * (1 + SKIP_MARGIN):
+        return None
+
+    # First complete line after landing must be per-atom data
+    line_start = buffer.find(b"\n", landing, end) + 1
+    line_end = buffer.find(b"\n", line_start, end)
+
+    if 0 < line_start < line_end and len(buffer[line_start:line_end].split()) != len(atom_data):
+        return None
+
+    return end
+
+def scan_snapshot(buffer, offset, stop, previous = None, verify = False):
+    """
+    Index the snapshot beginning at byte offset of buffer
+
+    Args:
+        buffer (bytes-like): Dump file contents
+        offset (int): Byte offset of the first header line of the snapshot
+        stop (int): Byte offset where the dump data ends
+        previous (SnapshotHeader): Header of the previous snapshot, used to skip over the per-atom
+            data (see skip_atoms). If None (default), the per-atom data is searched
+        verify (bool): Whether to count the per-atom lines and raise an error if they do not match
+            the number of atoms. This reads the whole per-atom block (default False)
+
+    Returns: SnapshotHeader
+    """
+
+    atoms_item = find_item(buffer, offset, stop, ATOMS_ITEM_BYTES)
+
+    if atoms_item == -1:
+        raise IncompleteSnapshotError(f"Unexpected EOF in snapshot header at byte {offset}")
+
+    atoms_line_end = buffer.find(b"\n", atoms_item, stop)
+
+    if atoms_line_end == -1:
+        raise IncompleteSnapshotError(f"Unexpected EOF in snapshot header at byte {offset}")
+
+    header_lines = bytes(buffer[offset:atoms_item]).decode().splitlines()
+
+    timestep, n_atoms, box_BC, box_data, custom = parse_header(header_lines, offset)
+
+    atom_data = tuple(bytes(buffer[atoms_item + len(ATOMS_ITEM_BYTES):atoms_line_end]).decode().split())
+
+    atoms_offset = atoms_line_end + 1
+
+    # Per-atom data runs until the next item (i.e. the next snapshot) or the end of the data
+    end = None if verify else skip_atoms(buffer, atoms_offset, stop, n_atoms, atom_data, previous)
+
+    if end is None:
+        end = find_item(buffer, atoms_offset, stop)
+
+        if end == -1:
+            end = stop
+
+    if verify:
+        n_lines = count_lines(buffer, atoms_offset, end)
+
+        if n_lines != n_atoms:
+            raise RuntimeError(f"Expected {n_atoms} per-atom lines in snapshot at byte {offset}, found {n_lines}")
+
+    return SnapshotHeader(offset, atoms_offset, end, timestep, n_atoms, atom_data, box_BC, box_data,
+                          custom)
+
+
+def scan_dump(buffer, start = 0, stop = None, verify = False, previous = None, max_snapshots = None,
+              complete_only = False):
+    """
+    Index all snapshots in buffer[start:stop]
+
+    start must be the byte offset of the first header line of a snapshot
+
+    Args:
+        buffer (bytes-like): Dump file contents
+        start (int): Byte offset to begin indexing at (default 0)
+        stop (int): Byte offset to end indexing at (default None, the end of buffer)
+        verify (bool): Whether to verify the number of per-atom lines (see scan_snapshot)
+        previous (SnapshotHeader): Header of the snapshot preceding start, if known (default None)
+        max_snapshots (int): Stop after indexing this many snapshots. If None (default), index to
+            stop
+        complete_only (bool): Whether to silently stop at a final snapshot which is still being
+            written, rather than raising an error or indexing it (default False)
+
+    Returns: list of SnapshotHeader
+    """
+
+    if stop is None:
+        stop = len(buffer)
+
+    if max_snapshots is None:
+        max_snapshots = -1
+
+    headers = []
+    append = headers.append # Localize for speed
+
+    offset = start
+    header = previous
+
+    while offset < stop and len(headers) != max_snapshots:
+        try:
+            header = scan_snapshot(buffer, offset, stop, header, verify)
+        except IncompleteSnapshotError:
+            if complete_only:
+                break
+            raise
+
+        if complete_only and header.end == stop and not is_complete(buffer, header):
+            break
+
+        append(header)
+        offset = header.end
+
+    return headers
+
+
+def resync(buffer, position, stop):
+    """
+    Find byte offset of the snapshot following the first ITEM: ATOMS line at or after position
+
+    The search skips to the end of the next ITEM: ATOMS line, and the next item after it must be the
+    first header line of a snapshot. Custom items may precede ITEM: TIMESTEP, so ITEM: TIMESTEP
+    itself is not a reliable marker. The result is deterministic, so independent workers agree on
+    the boundaries between their byte ranges.
+
+    Returns: byte offset, or stop if no snapshot begins in buffer[position:stop]
+    """
+
+    atoms_item = find_item(buffer, position, stop, ATOMS_ITEM_BYTES)
+
+    if atoms_item == -1:
+        return stop
+
+    atoms_line_end = buffer.find(b"\n", atoms_item, stop)
+
+    if atoms_line_end == -1:
+        return stop
+
+    offset = find_item(buffer, atoms_line_end + 1, stop)
+
+    return stop if offset == -1 else offset
+
+def scan_file_range(path, start, stop, size, first = False, verify = False, complete_only = False):
+    """
+    Index the snapshots of dump file at path which begin within byte range [start, stop)
+
+    Used by worker processes of scan_dump_parallel. start and stop need not be snapshot boundaries.
+
+    Args:
+        path (str or Path): Path of dump file
+        start (int): Byte offset of start of range
+        stop (int): Byte offset of end of range
+        size (int): Byte offset of end of data being indexed, which the file may have grown past
+        first (bool): Whether start is known to be the beginning of a snapshot (default False)
+        verify (bool): Whether to verify the number of per-atom lines (see scan_snapshot)
+        complete_only (bool): Whether to ignore an incomplete final snapshot (see scan_dump)
+
+    Returns: list of SnapshotHeader
+    """
+
+    with open(path, "rb") as f:
+        buffer = map_file(f)
+
+        if not first:
+            start = resync(buffer, start, size)
+
+        if stop < size:
+            stop = resync(buffer, stop, size)
+
+        headers = scan_dump(buffer, start, stop, verify, complete_only = complete_only)
+
+        if isinstance(buffer, mmap.mmap):
+            buffer.close()
+
+    return headers
+
+def scan_dump_parallel(buffer, path, start = 0, processes = None, verify = False,
+                       complete_only = False):
+    """
+    Index all snapshots in buffer[start:] using worker processes, each of which indexes a byte
+    range of the dump file independently
+
+    The number of processes is reduced so each worker has at least MIN_RANGE_BYTES, so small dumps
+    are indexed serially without starting any processes
+
+    Args:
+        buffer (bytes-like): Dump file contents
+        path (str or Path): Path of dump file, which workers open themselves
+        start (int): Byte offset of the first header line of a snapshot to begin indexing at
+        processes (int): Maximum number of worker processes. If None (default), os.cpu_count()
+        verify (bool): Whether to verify the number of per-atom lines (see scan_snapshot)
+        complete_only (bool): Whether to ignore an incomplete final snapshot (see scan_dump)
+
+    Returns: list of SnapshotHeader, in file order
+    """
+
+    size = len(buffer)
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    processes = max(1, min(processes, (size - start) // MIN_RANGE_BYTES))
+
+    if processes == 1:
+        return scan_dump(buffer, start, verify = verify, complete_only = complete_only)
+
+    bounds = [start + (size - start) * i // processes for i in range(processes + 1)]
+
+    with ProcessPoolExecutor(max_workers = processes) as executor:
+        futures = [executor.submit(scan_file_range, path, bounds[i], bounds[i + 1], size, i == 0,
+                                   verify, complete_only)
+                   for i in range(processes)]
+
+        headers = []
+
+        for future in futures:
+            headers += future.result()
+
+    return headers
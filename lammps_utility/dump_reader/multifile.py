@@ -0,0 +1,497 @@
+# -*- coding: utf-8 -*-
+"""
+Internal module of dump_reader for trajectories split over many text dump files
+
+DumpFilesSource reads dumps written as one file per snapshot (e.g. by dump ... dump.*.lammpstrj),
+and SplitDumpSource reads dumps written as one file per processor or group of processors (e.g. by
+dump ... dump.%.*), merging the parts of each timestep into one snapshot.
+
+The files are indexed concurrently. They are not kept open: per-atom data is read with positional
+reads through a FilePool, which keeps a bounded number of files open, so a trajectory of any number
+of files can be opened.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from pathlib import Path
+import glob
+import os
+import re
+import threading
+import numpy as np
+
+from .sources import Source, SnapshotTable, PackedRows
+from .indexing import SnapshotHeader
+from . import indexing, atoms, gzipped, binary
+
+# Default maximum number of files kept open by FilePool
+MAX_OPEN_FILES = 64
+
+# Number of tasks per worker process when indexing, to balance load between workers
+TASKS_PER_PROCESS = 4
+
+def natural_key(name):
+    """Sort key of str name in which numbers are compared by value (e.g. dump.2 before dump.10)"""
+    return [(0, int(part), "") if part.isdigit() else (1, 0, part) for part in re.split(r"(\d+)", name)]
+
+def expand_paths(path):
+    """
+    Get paths of dump files from a glob pattern or an iterable of paths
+
+    Returns: list of Path, in natural order (see natural_key) if path is a pattern
+    """
+
+    if isinstance(path, (str, Path)):
+        paths = sorted(glob.glob(str(path)), key = natural_key)
+
+        if not paths:
+            raise RuntimeError(f"No dump files match {path}")
+
+        return [Path(name) for name in paths]
+
+    return [Path(name) for name in path]
+
+def is_pattern(path):
+    """Whether str or Path path is a glob pattern rather than the path of an existing file"""
+    return isinstance(path, (str, Path)) and not Path(path).exists() and any(char in str(path)
+                                                                             for char in "*?[")
+
+def index_file(path, verify = False):
+    """
+    Index all snapshots of the text dump file at path
+
+    Returns: list of SnapshotHeader
+    """
+
+    with open(path, "rb") as f:
+        if gzipped.is_gzip(f) or binary.is_binary(f):
+            raise RuntimeError(f"{path} is not a text dump, but only text dumps can be opened as "
+                               "one of several files")
+
+        buffer = indexing.map_file(f)
+
+        try:
+            return indexing.scan_dump(buffer, verify = verify)
+        finally:
+            if not isinstance(buffer, bytes):
+                buffer.close()
+
+def index_files(paths, processes = 1, verify = False):
+    """
+    Index text dump files concurrently
+
+    Args:
+        paths (list of Path): Paths of dump files
+        processes (int): Number of worker processes, where None means one per CPU. If 1 (default),
+            files are indexed by a thread pool instead, which mostly waits on opening and reading
+            files
+        verify (bool): Whether to verify the number of per-atom lines (see indexing.scan_snapshot)
+
+    Returns: list containing the list of SnapshotHeader of each file
+    """
+
+    verifies = [verify] * len(paths)
+
+    if processes == 1:
+        with ThreadPoolExecutor() as executor:
+            return list(executor.map(index_file, paths, verifies))
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    chunksize = max(1, len(paths) // (processes * TASKS_PER_PROCESS))
+
+    with ProcessPoolExecutor(max_workers = processes) as executor:
+        return list(executor.map(index_file, paths, verifies, chunksize = chunksize))
+
+
+class FilePool:
+    """
+    Pool of files opened read-only for positional reads, which keeps at most max_open of them open.
+    Least recently read files are closed first, except while they are being read. Methods are
+    thread-safe
+
+    ----------------------------------------------------------------------
+    Instance variables:
+
+        paths: list of Path of files, which are identified by their index
+
+        max_open (int): Maximum number of files kept open
+    """
+
+    def __init__(self, paths, max_open = MAX_OPEN_FILES):
+        self.paths = paths
+        self.max_open = max_open
+
+        # File index: [file descriptor, number of reads in progress]
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Number of open files"""
+        return len(self._open)
+
+    def _evict(self):
+        """Close least recently read files which are not being read until within max_open"""
+
+        for i in list(self._open):
+            if len(self._open) <= self.max_open:
+                break
+
+            fd, readers = self._open[i]
+
+            if readers == 0:
+                del self._open[i]
+                os.close(fd)
+
+    def _acquire(self, i):
+        """Get file descriptor of file i, opening it if needed. It stays open until released"""
+
+        with self._lock:
+            entry = self._open.get(i)
+
+            if entry is None:
+                entry = self._open[i] = [os.open(self.paths[i], os.O_RDONLY | getattr(os, "O_BINARY", 0)), 0]
+
+            entry[1] += 1
+            self._open.move_to_end(i)
+            self._evict()
+
+            return entry
+
+    def _release(self, entry):
+        """Release file descriptor entry returned by _acquire"""
+
+        with self._lock:
+            entry[1] -= 1
+            self._evict()
+
+    def read(self, i, start, end):
+        """Read bytes [start, end) of file i"""
+
+        entry = self._acquire(i)
+
+        try:
+            if hasattr(os, "pread"):
+                return os.pread(entry[0], end - start, start)
+
+            # No positional reads (Windows), so file positions must not be shared
+            with self._lock:
+                os.lseek(entry[0], start, os.SEEK_SET)
+                return os.read(entry[0], end - start)
+        finally:
+            self._release(entry)
+
+    def will_need(self, i, start, end):
+        """
+        Advise the kernel that bytes [start, end) of file i will be read soon, so that they are
+        read ahead in the background. Does nothing if the platform does not support it
+        """
+
+        if not hasattr(os, "posix_fadvise"):
+            return
+
+        entry = self._acquire(i)
+
+        try:
+            os.posix_fadvise(entry[0], start, end - start, os.POSIX_FADV_WILLNEED)
+        finally:
+            self._release(entry)
+
+    def close(self):
+        """Close all open files"""
+
+        with self._lock:
+            for fd, _ in self._open.values():
+                os.close(fd)
+
+            self._open.clear()
+
+
+class DumpFilesSource(Source):
+    """
+    Instances of this class index several text dump files into snapshot objects, ordered by timestep
+    (see module docstring)
+
+    ----------------------------------------------------------------------
+    Instance variables:
+
+        paths: list of Path of dump files
+
+        files: FilePool of dump files
+
+        snapshots: SnapshotTable of the SourceSnapshot objects from dump files, ordered by
+            timestep. Snapshots of the same timestep are in the order of paths
+
+        snapshot_files: list containing the index in paths of the file of each SourceSnapshot
+
+        snapshot_seek_info: PackedRows of the byte offsets (header, per-atom data, end) of each
+            SourceSnapshot in its dump file
+
+        atoms_cache: AtomsCache of parsed per-atom data (see atoms)
+    """
+
+    def __init__(self, paths, processes = 1, verify = False, max_open = MAX_OPEN_FILES,
+                 cache_bytes = atoms.DEFAULT_CACHE_BYTES):
+        """
+        Indexes dump files, creates Snapshot objects, and returns DumpFilesSource object
+
+        Args:
+            paths (iterable of str or Path): Paths of text dump files
+            processes (int): Number of worker processes used for indexing, where None means one per
+                CPU. If 1 (default), files are indexed by a thread pool
+            verify (bool): Whether to count the per-atom lines of each snapshot while indexing and
+                raise an error if they do not match its number of atoms (default False)
+            max_open (int): Maximum number of files kept open (default MAX_OPEN_FILES)
+            cache_bytes (int): Byte budget of the cache of parsed per-atom data, atoms_cache
+                (default atoms.DEFAULT_CACHE_BYTES, i.e. 256 MiB)
+        """
+
+        self.paths = [Path(path) for path in paths]
+
+        self.files = FilePool(self.paths, max_open)
+
+        self.atoms_cache = atoms.AtomsCache(cache_bytes)
+
+        file_headers = index_files(self.paths, processes, verify)
+
+        # Stable, so snapshots of the same timestep stay in file order
+        entries = sorted(((header, i) for i, headers in enumerate(file_headers) for header in headers),
+                         key = lambda entry: entry[0].timestep)
+
+        self.snapshots = SnapshotTable(self)
+
+        self.snapshot_files = [i for _, i in entries]
+
+        self.snapshot_seek_info = PackedRows("q", 3)
+
+        for header, _ in entries:
+            self.snapshot_seek_info.append(header.seek_info)
+            self.snapshots.add_header(header)
+
+    def will_need(self, identifier):
+        """Hint that per-atom data of snapshot will be read soon (see FilePool.will_need)"""
+
+        _, start, end = self.snapshot_seek_info[identifier]
+
+        self.files.will_need(self.snapshot_files[identifier], start, end)
+
+    def dump_file_path(self, identifier):
+        """Path of the text dump file containing snapshot, as str"""
+        return str(self.paths[self.snapshot_files[identifier]])
+
+    def read_snapshot_dump(self, identifier):
+        """Get string of dump stored in file"""
+        assert 0 <= identifier < len(self.snapshots), f"Invalid identifier {identifier} when attempting to read snapshot"
+
+        start, _, end = self.snapshot_seek_info[identifier]
+
+        return self.files.read(self.snapshot_files[identifier], start, end).decode()
+
+    def read_snapshot_atoms(self, identifier, columns = None, float32 = False):
+        """
+        Parse per-atom data stored in file into column arrays (see atoms.parse_atoms). Parsed
+        columns are cached in atoms_cache, so the returned arrays are read-only
+
+        Args:
+            identifier (int): Identifier of snapshot
+            columns (iterable of str): Names of per-atom columns to parse. Other columns are skipped
+                over. If None (default), all columns are parsed
+            float32 (bool): Whether float columns are single precision (default False)
+
+        Returns: dict of 1D arrays of length n_atoms, keyed by column name
+        """
+        assert 0 <= identifier < len(self.snapshots), f"Invalid identifier {identifier} when attempting to read snapshot"
+
+        n_atoms = self.snapshots.n_atoms[identifier]
+        atom_data = self.snapshots.get_atom_data(identifier)
+        _, start, end = self.snapshot_seek_info[identifier]
+
+        def parse(missing):
+            data = self.files.read(self.snapshot_files[identifier], start, end)
+
+            return atoms.parse_atoms(data, 0, len(data), n_atoms, atom_data,
+                                     columns = missing, float32 = float32)
+
+        columns = atom_data if columns is None else tuple(columns)
+
+        return self.atoms_cache.get((identifier, float32), columns, parse)
+
+    def __del__(self):
+        """Close files when out of scope"""
+        if hasattr(self, "files"):
+            self.files.close()
+
+
+class SplitDumpSource(Source):
+    """
+    Instances of this class index the files of a dump split over processors (see module docstring)
+    into snapshot objects, one per timestep, whose per-atom data joins the parts of that timestep
+    in all files
+
+    ----------------------------------------------------------------------
+    Instance variables:
+
+        paths: list of Path of dump files
+
+        files: FilePool of dump files
+
+        sort (bool): Whether the atoms of each snapshot are sorted by id
+
+        snapshots: SnapshotTable of the SourceSnapshot objects, ordered by timestep
+
+        snapshot_parts: list containing the parts of each SourceSnapshot as a list of (index in
+            paths, byte offset of per-atom data, byte offset of end, number of atoms), in the order
+            of paths
+
+        atoms_cache: AtomsCache of parsed per-atom data (see atoms)
+    """
+
+    def __init__(self, paths, sort = False, processes = 1, verify = False, max_open = MAX_OPEN_FILES,
+                 cache_bytes = atoms.DEFAULT_CACHE_BYTES):
+        """
+        Indexes dump files, merges the parts of each timestep, creates Snapshot objects, and
+        returns SplitDumpSource object
+
+        The box and custom data of a snapshot are those of its first part, since LAMMPS writes the
+        same ones to every file. Every timestep must have as many parts as the others, in different
+        files, else the files are not the parts of one dump and an error is raised
+
+        Args:
+            paths (iterable of str or Path): Paths of text dump files, whose parts are joined in
+                this order
+            sort (bool): Whether to sort the atoms of each snapshot by id, which then must be a
+                per-atom column. Otherwise, atoms are in the order of paths (default False)
+            processes (int): Number of worker processes used for indexing, where None means one per
+                CPU. If 1 (default), files are indexed by a thread pool
+            verify (bool): Whether to count the per-atom lines of each snapshot while indexing and
+                raise an error if they do not match its number of atoms (default False)
+            max_open (int): Maximum number of files kept open (default MAX_OPEN_FILES)
+            cache_bytes (int): Byte budget of the cache of parsed per-atom data, atoms_cache
+                (default atoms.DEFAULT_CACHE_BYTES, i.e. 256 MiB)
+        """
+
+        self.paths = [Path(path) for path in paths]
+
+        self.files = FilePool(self.paths, max_open)
+
+        self.sort = sort
+
+        self.atoms_cache = atoms.AtomsCache(cache_bytes)
+
+        parts = {}
+
+        for i, headers in enumerate(index_files(self.paths, processes, verify)):
+            for header in headers:
+                parts.setdefault(header.timestep, []).append((i, header))
+
+        self.snapshots = SnapshotTable(self)
+        self.snapshot_parts = []
+
+        n_parts = max((len(timestep_parts) for timestep_parts in parts.values()), default = 0)
+
+        for timestep in sorted(parts):
+            first = parts[timestep][0][1]
+
+            # Every timestep has one part per processor (or group of processors), each in a
+            # different file
+            files = {i for i, _ in parts[timestep]}
+
+            if len(parts[timestep]) != n_parts or len(files) != n_parts:
+                raise RuntimeError(f"Timestep {timestep} has {len(parts[timestep])} parts in "
+                                   f"{len(files)} files, but other timesteps have {n_parts} parts, so "
+                                   "the timesteps of the files disagree")
+
+            for i, header in parts[timestep]:
+                if header.atom_data != first.atom_data:
+                    raise RuntimeError(f"Timestep {timestep} has per-atom data {header.atom_data} in "
+                                       f"{self.paths[i]}, but {first.atom_data} in another file")
+
+            if sort and "id" not in first.atom_data:
+                raise RuntimeError(f"Atoms cannot be sorted by id, since timestep {timestep} has no "
+                                   "per-atom data id")
+
+            n_atoms = sum(header.n_atoms for _, header in parts[timestep])
+
+            merged = SnapshotHeader(first.offset, first.atoms_offset, first.end, timestep, n_atoms,
+                                    first.atom_data, first.box_BC, first.box_data, first.custom)
+
+            self.snapshot_parts.append([(i, header.atoms_offset, header.end, header.n_atoms)
+                                        for i, header in parts[timestep]])
+            self.snapshots.add_header(merged)
+
+    def will_need(self, identifier):
+        """Hint that per-atom data of snapshot will be read soon (see FilePool.will_need)"""
+
+        for i, start, end, _ in self.snapshot_parts[identifier]:
+            self.files.will_need(i, start, end)
+
+    def read_parts(self, identifier):
+        """Get per-atom data of all parts of snapshot as a list of bytes"""
+        return [self.files.read(i, start, end) for i, start, end, _ in self.snapshot_parts[identifier]]
+
+    def parse_parts(self, identifier, columns, float32 = False):
+        """Parse columns of all parts of snapshot (see atoms.parse_atoms) and join them in order"""
+
+        atom_data = self.snapshots.get_atom_data(identifier)
+        parts = []
+
+        for block, (_, _, _, n_atoms) in zip(self.read_parts(identifier),
+                                             self.snapshot_parts[identifier]):
+            parts.append(atoms.parse_atoms(block, 0, len(block), n_atoms, atom_data,
+                                           columns = columns, float32 = float32))
+
+        return {name: np.concatenate([part[name] for part in parts]) for name in columns}
+
+    def read_snapshot_dump(self, identifier):
+        """Get string of snapshot in LAMMPS dump format, joining its parts"""
+        assert 0 <= identifier < len(self.snapshots), f"Invalid identifier {identifier} when attempting to read snapshot"
+
+        snapshot = self.snapshots[identifier]
+
+        lines = [line for block in self.read_parts(identifier)
+                 for line in block.decode().splitlines()]
+
+        if self.sort:
+            order = np.argsort(self.parse_parts(identifier, ("id",))["id"], kind = "stable")
+            lines = [lines[i] for i in order]
+
+        atoms_line = f"{self.item_str}{self.atoms_item_str} {' '.join(snapshot.atom_data)}\n"
+
+        return self.get_snapshot_dump_header(snapshot) + atoms_line + "".join(line + "\n" for line in lines)
+
+    def read_snapshot_atoms(self, identifier, columns = None, float32 = False):
+        """
+        Parse per-atom data of all parts of snapshot into column arrays (see atoms.parse_atoms),
+        joined in the order of paths or sorted by id. Parsed columns are cached in atoms_cache, so
+        the returned arrays are read-only
+
+        Args:
+            identifier (int): Identifier of snapshot
+            columns (iterable of str): Names of per-atom columns to parse. Other columns are skipped
+                over. If None (default), all columns are parsed
+            float32 (bool): Whether float columns are single precision (default False)
+
+        Returns: dict of 1D arrays of length n_atoms, keyed by column name
+        """
+        assert 0 <= identifier < len(self.snapshots), f"Invalid identifier {identifier} when attempting to read snapshot"
+
+        def parse(missing):
+            if not self.sort:
+                return self.parse_parts(identifier, missing, float32)
+
+            names = missing + (() if "id" in missing else ("id",))
+            parsed = self.parse_parts(identifier, names, float32)
+            order = np.argsort(parsed["id"], kind = "stable")
+
+            return {name: parsed[name][order] for name in missing}
+
+        atom_data = self.snapshots.get_atom_data(identifier)
+        columns = atom_data if columns is None else tuple(columns)
+
+        return self.atoms_cache.get((identifier, float32), columns, parse)
+
+    def __del__(self):
+        """Close files when out of scope"""
+        if hasattr(self, "files"):
+            self.files.close()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Internal module of dump_reader for iterating over snapshots while the next ones are read in the
+background
+
+iter_prefetched parses the per-atom data of the next few snapshots on background threads while the
+caller works on the current one, and asks the source of each snapshot to start reading it from disk
+as soon as it is queued (see Source.will_need), so that the kernel fetches the file pages
+asynchronously. Threads are used rather than processes, since parsed arrays would otherwise be
+pickled back to the caller. Parsing holds the GIL, so it overlaps with work of the caller which
+releases it (most NumPy operations, file I/O), while reading from disk overlaps with any work.
+
+The number of queued snapshots is bounded both by depth and by the estimated size of their parsed
+arrays, so that prefetching large snapshots does not exhaust memory. At least one snapshot is always
+queued, however large it is.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from . import atoms
+
+# Default number of snapshots parsed ahead of the caller
+DEFAULT_DEPTH = 4
+
+# Default byte budget of the parsed arrays of queued snapshots
+DEFAULT_MAX_BYTES = 1 << 28
+
+def estimate_bytes(snapshot, columns = None, float32 = False):
+    """Estimate size of the parsed per-atom arrays of snapshot"""
+
+    names = snapshot.atom_data if columns is None else columns
+
+    return snapshot.n_atoms * sum(atoms.column_dtype(name, float32).itemsize for name in names)
+
+def iter_prefetched(snapshots, columns = None, depth = DEFAULT_DEPTH, max_bytes = DEFAULT_MAX_BYTES,
+                    float32 = False, workers = 1):
+    """
+    Iterate over snapshots, parsing the per-atom data of the next snapshots in the background
+
+    Args:
+        snapshots (iterable of Snapshot): Snapshots to iterate over, which is only iterated as far
+            as the queue requires, so it may be lazy
+        columns (iterable of str): Names of per-atom columns to parse. If None (default), all
+            columns
+        depth (int): Maximum number of snapshots queued ahead of the caller (default DEFAULT_DEPTH)
+        max_bytes (int): Maximum estimated size of the parsed arrays of queued snapshots (default
+            DEFAULT_MAX_BYTES)
+        float32 (bool): Whether float columns are single precision (default False)
+        workers (int): Number of background threads, each parsing one snapshot at a time (default 1)
+
+    Yields: (snapshot, atoms) where atoms is the dict returned by snapshot.atoms
+    """
+    assert depth >= 1, f"Invalid prefetch depth {depth}, must be at least 1"
+    assert workers >= 1, f"Invalid number of workers {workers}, must be at least 1"
+
+    columns = None if columns is None else tuple(columns)
+
+    def parse(snapshot):
+        return snapshot.atoms(columns, float32 = float32)
+
+    iterator = iter(snapshots)
+    queue = deque()
+    queued_bytes = 0
+
+    # Next snapshot to queue, with its estimated size, once there is room for it
+    upcoming = None
+
+    executor = ThreadPoolExecutor(max_workers = workers, thread_name_prefix = "dump_reader_prefetch")
+
+    try:
+        while True:
+            # Fill queue up to depth and memory budget
+            while len(queue) < depth:
+                if upcoming is None:
+                    snapshot = next(iterator, None)
+
+                    if snapshot is None:
+                        break
+
+                    upcoming = snapshot, estimate_bytes(snapshot, columns, float32)
+
+                snapshot, nbytes = upcoming
+
+                if queue and queued_bytes + nbytes > max_bytes:
+                    break
+
+                snapshot.source.will_need(snapshot.identifier)
+
+                queue.append((snapshot, executor.submit(parse, snapshot), nbytes))
+                queued_bytes += nbytes
+                upcoming = None
+
+            if not queue:
+                return
+
+            snapshot, future, nbytes = queue.popleft()
+            parsed = future.result()
+            queued_bytes -= nbytes
+
+            yield snapshot, parsed
+    finally:
+        # Caller stopped early or parsing failed, so queued snapshots are not needed
+        for _, future, _ in queue:
+            future.cancel()
+
+        executor.shutdown(wait = True)
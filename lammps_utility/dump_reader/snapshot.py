@@ -48,6 +48,9 @@ class Snapshot:
         Headers of per-atom data stored
     """
     
+    # Subclasses may define __slots__ to avoid a __dict__ per instance (see snapshots)
+    __slots__ = ("_source", "_identifier", "_atom_data", "__weakref__")
+    
     source = readonly()
     identifier = readonly()
     atom_data = readonly()
@@ -108,6 +111,23 @@ class Snapshot:
         """Get string of dump stored in source"""
         return self.source.read_snapshot_dump(self.identifier)
     
+    def atoms(self, columns = None, float32 = False):
+        """
+        Parse per-atom data stored in source into NumPy arrays
+        
+        Integer quantities (id, type, image flags, ...) are int64 arrays, and non-numeric quantities
+        (e.g. element) are string arrays. Parsed arrays are cached by the source and shared, so they
+        are read-only
+        
+        Args:
+            columns (iterable of str): Names of per-atom columns to read, from atom_data. Reading
+                fewer columns is faster and uses less memory. If None (default), all columns are read
+            float32 (bool): Whether float columns are single precision (default False)
+        
+        Returns: dict of 1D arrays of length n_atoms, keyed by column name
+        """
+        return self.source.read_snapshot_atoms(self.identifier, columns = columns, float32 = float32)
+    
     def render(self):
         """Use Ovito module to create interactive view of snapshot"""
         return render_snapshot(self)
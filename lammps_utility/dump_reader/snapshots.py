@@ -5,32 +5,76 @@ Container module for Snapshots class, as summarized below.
 
 from pathlib import Path
 import re
+import threading
+import time
+import weakref
 import numpy as np
 from warnings import warn
 from collections import abc
 
-from . import sources
+from . import sources, index_cache, atoms, trajectory, store, compressed, gzipped, binary, multifile, \
+    streaming, readahead
 from .snapshot import Snapshot
 from .box import Box
-from .common import is_single_value
+from .common import is_single_value, attempt_cast_string
 
 RESERVED_ITEMS = {"timestep", "n_atoms", "box_bounds", "box_tri", "box_BC"}
 READONLY_ITEMS = {"n_atoms"}
 
-def attempt_cast_string(array):
-    """Attempts to cast string array to number"""
+
+def _join(parts):
+    """
+    Join arrays of rows, where incompatible types (e.g. numbers and strings) are left for NumPy to
+    unify
+    """
     
     try:
-        numeric_array = np.array(array, dtype = float)
-    except ValueError:
-        return array
-        
+        return np.concatenate(parts)
+    except (TypeError, ValueError):
+        return np.array([value for part in parts for value in part])
+
+
+def _append_rows(buffers, name, value, new_rows):
+    """
+    Get an array of the rows of value followed by new_rows, for arrays which grow by appending
+    (e.g. as a followed dump is refreshed)
     
-    if np.all(np.char.find(array, '.') == -1): # No decimals means integers
-        return np.array(array, dtype = int)
-    else:
-        return numeric_array
+    The array is a view of the first rows of a buffer with spare rows, whose capacity is doubled
+    when it is full. While value is the view last returned for name, new_rows are written into the
+    buffer instead of copying value, so appending takes time proportional to len(new_rows). Rows of
+    value are never modified, so views of them held elsewhere stay valid
+    
+    Args:
+        buffers (dict): (buffer, view) of each grown array keyed by name, which is updated
+        name (str): Name of array
+        value (ndarray): Rows so far
+        new_rows (ndarray): Rows to append
+    
+    Returns: ndarray
+    """
+    
+    buffer, view = buffers.get(name, (None, None))
+    n_rows = len(value) + len(new_rows)
+    
+    try:
+        dtype = np.result_type(value.dtype, new_rows.dtype)
+    except TypeError:
+        dtype = None
+    
+    if (view is not value or dtype != buffer.dtype or n_rows > len(buffer)
+            or new_rows.shape[1:] != value.shape[1:]):
+        joined = _join((value, new_rows))
         
+        buffer = np.empty((2 * n_rows,) + joined.shape[1:], dtype = joined.dtype)
+        buffer[:n_rows] = joined
+    else:
+        buffer[len(value):n_rows] = new_rows
+    
+    view = buffer[:n_rows]
+    buffers[name] = (buffer, view)
+    
+    return view
+
 
 class _SnapshotItemDescriptor():
     """
@@ -49,6 +93,18 @@ class _SnapshotItemDescriptor():
     def __init__(self, item_name):
         self.item_name = item_name
 
+class _RowItemDescriptor(_SnapshotItemDescriptor):
+    """
+    _SnapshotItemDescriptor of _ReferenceSnapshot, which passes requests straight to the
+    _SnapshotsItems object of its Snapshots object rather than creating its items object
+    """
+    
+    def __get__(self, instance, owner):
+        return instance._snapshots._items.get_snapshot_value(instance, self.item_name)
+        
+    def __set__(self, instance, value):
+        instance._snapshots._items.set_snapshot_value(instance, self.item_name, value)
+
 class _SnapshotItems(abc.MutableMapping):
     """
     Instances of this class provide a dict-like interface for the data contained in Snapshot objects
@@ -67,6 +123,8 @@ class _SnapshotItems(abc.MutableMapping):
     
     """
     
+    __slots__ = ("_snapshots_items", "_snapshot")
+    
     def __init__(self, snapshot, snapshots_items):
         self._snapshots_items = snapshots_items
         self._snapshot = snapshot
@@ -101,7 +159,7 @@ class _SnapshotCustom(_SnapshotItems):
     Functions identically to _SnapshotItems, except this object is passed a _SnapshotsCustom object
     """
     
-    pass
+    __slots__ = ()
     
 class _SnapshotsItems(dict):
     """
@@ -109,12 +167,21 @@ class _SnapshotsItems(dict):
     
     Instances of this class store the data for Snapshot objects contained in a Snapshots instance
     
+    Arrays of a Snapshots object created by slicing another (see take) are views of the arrays of
+    the other. Each object copies a shared array before it writes to it or returns it (or a view of
+    a row of it) to a caller, who may modify it. Arrays which have been returned to a caller are
+    copied rather than shared when slicing, so that editing one Snapshots object never affects
+    another
+    
     Class variables: used internally for type and shape enforcement of non-custom data
     
     ----------------------------------------------------------------------
     Instance variables:
         _snapshots: Snapshots object
         _num_snapshots: Number of Snapshot objects in Snapshots object
+        _shared: Names of items whose arrays may be shared with other _SnapshotsItems objects
+        _exposed: Names of items whose arrays may be held (and modified) by a caller
+        _timestep_index: (order, timesteps) of sorted_timesteps, or None until it is needed
     
     """
     
@@ -172,6 +239,12 @@ class _SnapshotsItems(dict):
         
         self._snapshots = snapshots
         self._num_snapshots = len(snapshots_old)
+        self._shared = set()
+        self._exposed = set()
+        self._timestep_index = None
+        
+        # Buffers of the arrays grown by extend (see _append_rows)
+        self._buffers = {}
         
         for i, snapshot in enumerate(snapshots_old):
             if set(snapshot.items.keys()) != key_set:
@@ -188,6 +261,214 @@ class _SnapshotsItems(dict):
         for item_name, value in template_dict.items():
             self.__setitem__(item_name, value, user = False)
         
+    @classmethod
+    def from_table(cls, snapshots, table, start = 0, stop = None, attempt_cast_strings = False):
+        """
+        Creates _SnapshotsItems from the columns of snapshots [start, stop) of a
+        sources.SnapshotTable, without creating an object per snapshot. Other args are the same as
+        for __init__
+        """
+        
+        items = cls(snapshots, [])
+        
+        columns = table.columns(start, stop)
+        custom_keys = table.custom.keys()
+        
+        if columns:
+            items._num_snapshots = len(columns["timestep"])
+        
+        for item_name, value in columns.items():
+            if attempt_cast_strings and item_name in custom_keys:
+                value = attempt_cast_string(value)
+            
+            items.__setitem__(item_name, value, user = False)
+        
+        return items
+    
+    @classmethod
+    def from_arrays(cls, snapshots, values, num_snapshots):
+        """
+        Creates _SnapshotsItems of snapshots from a dict of (num_snapshots, ...) arrays keyed by
+        item name, which are copied
+        """
+        
+        items = cls(snapshots, [])
+        items._num_snapshots = num_snapshots
+        
+        for item_name, value in values.items():
+            items.__setitem__(item_name, value, user = False)
+        
+        return items
+    
+    def take(self, snapshots, index):
+        """
+        Creates _SnapshotsItems of snapshots from the rows of this object selected by index (slice
+        or integer array)
+        
+        A slice is taken without copying, as views of the arrays of this object, which both objects
+        then copy before modifying them. Arrays which a caller may hold are copied, since the caller
+        could modify them at any time
+        """
+        
+        if type(index) != slice:
+            values = {item_name: value[index] for item_name, value in dict.items(self)}
+            
+            return type(self).from_arrays(snapshots, values, len(index))
+        
+        items = type(self)(snapshots, [])
+        items._num_snapshots = len(range(self._num_snapshots)[index])
+        
+        for item_name, value in dict.items(self):
+            view = value[index]
+            
+            if item_name in self._exposed and item_name not in self.readonly:
+                view = view.copy()
+            else:
+                self._shared.add(item_name)
+                items._shared.add(item_name)
+            
+            dict.__setitem__(items, item_name, view)
+        
+        return items
+    
+    def sorted_timesteps(self):
+        """
+        Get the timesteps sorted for binary search
+        
+        Kept until the timesteps may have been modified, i.e. until they are set or their array is
+        returned by __getitem__
+        
+        Returns: (order, timesteps) where order is the stable argsort of the timestep array, so
+            duplicate timesteps keep their order, and timesteps is that array sorted
+        """
+        
+        if self._timestep_index is None:
+            if "timestep" in self:
+                timesteps = super().__getitem__("timestep")
+            else:
+                # Empty snapshots object
+                timesteps = np.empty(0, dtype = int)
+            
+            order = np.argsort(timesteps, kind = "stable")
+            
+            self._timestep_index = order, timesteps[order]
+        
+        return self._timestep_index
+    
+    def _own(self, item_name):
+        """Replace array of item by a copy, if it may be shared with another object"""
+        
+        if item_name in self._shared:
+            value = dict.__getitem__(self, item_name).copy()
+            value.flags.writeable = item_name not in self.readonly
+            
+            dict.__setitem__(self, item_name, value)
+            self._shared.discard(item_name)
+            self._exposed.discard(item_name)
+            self._buffers.pop(item_name, None)
+    
+    @classmethod
+    def concatenate(cls, snapshots, items_list):
+        """
+        Creates _SnapshotsItems of snapshots by joining the rows of several _SnapshotsItems, which
+        must have the same items
+        """
+        
+        # Empty objects may have no items at all
+        items_list = [items for items in items_list if items._num_snapshots > 0]
+        
+        if not items_list:
+            return cls(snapshots, [])
+        
+        num_snapshots = 0
+        
+        for items in items_list:
+            if set(items.keys()) != set(items_list[0].keys()):
+                raise RuntimeError(f"Non-matching custom data at snapshot {num_snapshots}")
+            
+            num_snapshots += items._num_snapshots
+        
+        values = {}
+        
+        for item_name in items_list[0]:
+            values[item_name] = _join([dict.__getitem__(items, item_name) for items in items_list])
+        
+        return cls.from_arrays(snapshots, values, num_snapshots)
+    
+    def extend(self, new_items):
+        """
+        Appends the arrays of another _SnapshotsItems (new_items) to this object's arrays
+        
+        Used when snapshot objects are added to a lazily indexed or followed Snapshots object. The
+        arrays grow in buffers (see _append_rows), so this takes time proportional to the number of
+        new snapshots. Rows already present are not modified, so arrays shared or handed out
+        before remain valid views of them
+        """
+        
+        if new_items._num_snapshots == 0:
+            return
+        
+        if self._num_snapshots == 0:
+            self._num_snapshots = new_items._num_snapshots
+            
+            for item_name, value in dict.items(new_items):
+                self.__setitem__(item_name, value, user = False)
+            
+            return
+        
+        if set(new_items.keys()) != set(self.keys()):
+            raise RuntimeError(f"Non-matching custom data at snapshot {self._num_snapshots}")
+        
+        values = {item_name: _append_rows(self._buffers, item_name, value,
+                                          dict.__getitem__(new_items, item_name))
+                  for item_name, value in dict.items(self)}
+        
+        self._num_snapshots += new_items._num_snapshots
+        
+        for item_name, value in values.items():
+            value.flags.writeable = item_name not in self.readonly
+            dict.__setitem__(self, item_name, value)
+        
+        self._timestep_index = None
+    
+    def extend_table(self, table, start, stop):
+        """
+        Appends snapshots [start, stop) of a sources.SnapshotTable whose first start snapshots are
+        the snapshots of this object, i.e. of a lazily indexed or followed dump
+        
+        Custom data read as strings are cast to numbers as if their whole column were cast at once
+        (see attempt_cast_string), so that the result does not depend on how the dump was indexed.
+        New values are cast like the column so far. If they cannot be, the whole column is cast
+        again from the strings of table, which discards edits of its values
+        """
+        
+        assert start == self._num_snapshots, f"Cannot append snapshot {start} to {self._num_snapshots} snapshots"
+        
+        new_items = type(self).from_table(self._snapshots, table, start, stop)
+        recast = {}
+        
+        for item_name, strings in table.custom.items():
+            new_strings = strings[start:stop]
+            new_value = attempt_cast_string(new_strings)
+            
+            if self._num_snapshots > 0:
+                kind = dict.__getitem__(self, item_name).dtype.kind
+                new_kind = new_value.dtype.kind if isinstance(new_value, np.ndarray) else "U"
+                
+                if kind == "f" and new_kind in "iu":
+                    # Integers of a float column
+                    new_value = np.array(new_strings, dtype = float)
+                elif kind != new_kind:
+                    recast[item_name] = attempt_cast_string(strings[:stop])
+                    continue
+            
+            new_items.__setitem__(item_name, new_value, user = False)
+        
+        self.extend(new_items)
+        
+        for item_name, value in recast.items():
+            self.__setitem__(item_name, value, user = False)
+    
     def set_snapshot_value(self, snapshot, item_name, value):
         """
         Sets the snapshot item's value in this object's array
@@ -207,7 +488,12 @@ class _SnapshotsItems(dict):
         assert item_name in self, "Key not found, create custom data from snapshots object"
         assert item_name not in self.readonly, f"{item_name} is read only"
         
-        self[item_name][self._snapshots.index(snapshot)] = value
+        self._own(item_name)
+        
+        if item_name == "timestep":
+            self._timestep_index = None
+        
+        super().__getitem__(item_name)[snapshot._row] = value
         
     
     def get_snapshot_value(self, snapshot, item_name):
@@ -216,10 +502,50 @@ class _SnapshotsItems(dict):
 
         Called when a user gets a snapshot item from the Snapshot object
             e.g. snapshot.timestep
+        
+        The snapshot's row in the arrays is stored on it (_ReferenceSnapshot._row), so no search
+        of the Snapshots object is needed
         """
         assert item_name in self, "Key not found, create custom data from snapshots object"
         
-        return self[item_name][self._snapshots.index(snapshot)]
+        value = super().__getitem__(item_name)
+        
+        if value.ndim == 1:
+            # Single values are copies, so a shared array need not be copied
+            return value[snapshot._row]
+        
+        # Row is a view, which the caller may modify
+        self._own(item_name)
+        self._exposed.add(item_name)
+        
+        return super().__getitem__(item_name)[snapshot._row]
+    
+    def __getitem__(self, item_name):
+        """
+        Get an item's array. Arrays shared with another Snapshots object are copied first, since
+        the caller may modify the array
+        """
+        
+        self._own(item_name)
+        self._exposed.add(item_name)
+        
+        if item_name == "timestep":
+            self._timestep_index = None
+        
+        return super().__getitem__(item_name)
+    
+    def __iter__(self):
+        # Overridden so that dict(items) gets arrays through __getitem__
+        return super().__iter__()
+    
+    def get(self, item_name, default = None):
+        return self[item_name] if item_name in self else default
+    
+    def values(self):
+        return [self[item_name] for item_name in self]
+    
+    def items(self):
+        return [(item_name, self[item_name]) for item_name in self]
     
     def __delitem__(self, item_name):
         """Delete item from items. Only valid for custom data"""
@@ -227,6 +553,9 @@ class _SnapshotsItems(dict):
         assert item_name not in self.reserved, f"{item_name} cannot be deleted"
         
         super().__delitem__(item_name)
+        self._shared.discard(item_name)
+        self._exposed.discard(item_name)
+        self._buffers.pop(item_name, None)
     
     def __setitem__(self, item_name, value, user = True):
         """
@@ -264,6 +593,12 @@ class _SnapshotsItems(dict):
         assert len(value) == self._num_snapshots, "Incorrectly sized input"
         
         super().__setitem__(item_name, value)
+        self._shared.discard(item_name)
+        self._exposed.discard(item_name)
+        self._buffers.pop(item_name, None)
+        
+        if item_name == "timestep":
+            self._timestep_index = None
 
 
 class _SnapshotsCustom(abc.MutableMapping):
@@ -385,6 +720,174 @@ class _ReferenceBox(Box):
             return super().__str__()
 
 
+class _SnapshotReferences():
+    """
+    Stores what the snapshot objects of a Snapshots object refer to, i.e. the source, identifier
+    and atom_data of each, as arrays rather than as objects. _ReferenceSnapshot objects are only
+    created from these when they are requested (see Snapshots._snapshot)
+    
+    ----------------------------------------------------------------------
+    Instance variables:
+        sources (list): Distinct sources of the snapshots
+        source_index ((N,) int ndarray): Index in sources of the source of each snapshot
+        identifiers ((N,) ndarray): Identifier of each snapshot in its source (int if all are int)
+        atom_data_types (list of tuple): Distinct per-atom data headers of the snapshots
+        atom_data_index ((N,) int ndarray): Index in atom_data_types of the headers of each
+            snapshot
+    """
+    
+    __slots__ = ("sources", "source_index", "identifiers", "atom_data_types", "atom_data_index",
+                 "_buffers")
+    
+    def __init__(self, sources, source_index, identifiers, atom_data_types, atom_data_index):
+        self.sources = sources
+        self.source_index = source_index
+        self.identifiers = identifiers
+        self.atom_data_types = atom_data_types
+        self.atom_data_index = atom_data_index
+        
+        # Buffers of the arrays grown by extend (see _append_rows)
+        self._buffers = {}
+    
+    def __len__(self):
+        return len(self.identifiers)
+    
+    def get(self, row):
+        """Get (source, identifier, atom_data) of the snapshot at row"""
+        
+        # item gives Python ints rather than NumPy integers
+        return (self.sources[self.source_index.item(row)], self.identifiers.item(row),
+                self.atom_data_types[self.atom_data_index.item(row)])
+    
+    @classmethod
+    def empty(cls):
+        return cls([], np.empty(0, dtype = np.int64), np.empty(0, dtype = np.int64), [],
+                   np.empty(0, dtype = np.int64))
+    
+    @classmethod
+    def from_table(cls, table, start = 0, stop = None):
+        """References to snapshots [start, stop) of a sources.SnapshotTable"""
+        
+        stop = len(table) if stop is None else stop
+        
+        return cls([table.source], np.zeros(stop - start, dtype = np.int64),
+                   np.arange(start, stop, dtype = np.int64), list(table.atom_data_types),
+                   np.array(table.atom_data_index[start:stop], dtype = np.int64))
+    
+    @classmethod
+    def from_snapshots(cls, snapshots):
+        """References to the same data as an iterable of Snapshot objects"""
+        
+        sources = {}
+        atom_data_types = {}
+        
+        source_index = []
+        identifiers = []
+        atom_data_index = []
+        
+        for snapshot in snapshots:
+            source_index.append(sources.setdefault(id(snapshot.source),
+                                                   (len(sources), snapshot.source))[0])
+            atom_data_index.append(atom_data_types.setdefault(tuple(snapshot.atom_data),
+                                                              len(atom_data_types)))
+            identifiers.append(snapshot.identifier)
+        
+        return cls([source for _, source in sources.values()],
+                   np.array(source_index, dtype = np.int64), _identifier_array(identifiers),
+                   list(atom_data_types), np.array(atom_data_index, dtype = np.int64))
+    
+    def take(self, index):
+        """References to the snapshots selected by index (slice or integer array)"""
+        
+        return type(self)(self.sources, self.source_index[index], self.identifiers[index],
+                          self.atom_data_types, self.atom_data_index[index])
+    
+    @classmethod
+    def concatenate(cls, references_list):
+        """References to the snapshots of several _SnapshotReferences, in order"""
+        
+        sources = {}
+        atom_data_types = {}
+        
+        source_index = []
+        identifiers = []
+        atom_data_index = []
+        
+        for references in references_list:
+            source_map = [sources.setdefault(id(source), (len(sources), source))[0]
+                          for source in references.sources]
+            atom_data_map = [atom_data_types.setdefault(atom_data, len(atom_data_types))
+                             for atom_data in references.atom_data_types]
+            
+            source_index.append(np.array(source_map, dtype = np.int64)[references.source_index])
+            atom_data_index.append(np.array(atom_data_map, dtype = np.int64)[references.atom_data_index])
+            identifiers.append(references.identifiers)
+        
+        if not references_list:
+            return cls.empty()
+        
+        return cls([source for _, source in sources.values()], np.concatenate(source_index),
+                   np.concatenate(identifiers), list(atom_data_types),
+                   np.concatenate(atom_data_index))
+    
+    def extend(self, references):
+        """
+        References to the snapshots of this object followed by those of references, as with
+        concatenate, in time proportional to len(references)
+        
+        The arrays of the returned object grow in the buffers of this object (see _append_rows),
+        which it takes over, so this object is left unchanged but must not be extended again
+        """
+        
+        sources = list(self.sources)
+        atom_data_types = list(self.atom_data_types)
+        
+        source_numbers = {id(source): i for i, source in enumerate(sources)}
+        atom_data_numbers = {atom_data: i for i, atom_data in enumerate(atom_data_types)}
+        
+        for source in references.sources:
+            if id(source) not in source_numbers:
+                source_numbers[id(source)] = len(sources)
+                sources.append(source)
+        
+        for atom_data in references.atom_data_types:
+            if atom_data not in atom_data_numbers:
+                atom_data_numbers[atom_data] = len(atom_data_types)
+                atom_data_types.append(atom_data)
+        
+        source_map = np.array([source_numbers[id(source)] for source in references.sources],
+                              dtype = np.int64)
+        atom_data_map = np.array([atom_data_numbers[atom_data]
+                                  for atom_data in references.atom_data_types], dtype = np.int64)
+        
+        buffers, self._buffers = self._buffers, {}
+        
+        extended = type(self)(
+            sources,
+            _append_rows(buffers, "source_index", self.source_index,
+                         source_map[references.source_index]),
+            _append_rows(buffers, "identifiers", self.identifiers, references.identifiers),
+            atom_data_types,
+            _append_rows(buffers, "atom_data_index", self.atom_data_index,
+                         atom_data_map[references.atom_data_index]))
+        
+        extended._buffers = buffers
+        
+        return extended
+
+
+def _identifier_array(identifiers):
+    """Array of snapshot identifiers, which is an int array if all are int"""
+    
+    if all(type(identifier) == int for identifier in identifiers):
+        return np.array(identifiers, dtype = np.int64)
+    
+    array = np.empty(len(identifiers), dtype = object)
+    array[:] = identifiers
+    
+    return array
+
+
 class _ReferenceSnapshot(Snapshot):
     """    
     Instance represents the atoms and box of a LAMMPS simulation (i.e. a single dump).
@@ -396,6 +899,11 @@ class _ReferenceSnapshot(Snapshot):
     data. Therefore, atomic data cannot be modified unless you convert it to another format
     (e.g. atomman) and then convert that to a snapshot.
     
+    Instances are lightweight views of a row of the arrays of a Snapshots object, which are only
+    created when the Snapshots object is indexed or iterated over. They hold no data of their own
+    besides their source, identifier and atom_data, and items, custom and box are created when
+    accessed
+    
     ----------------------------------------------------------------------
     Instance variables:
         
@@ -422,41 +930,45 @@ class _ReferenceSnapshot(Snapshot):
         
     custom (_SnapshotCustom)
         Dict-like object containing user-defined global data for snapshot.
+    
+    _snapshots (Snapshots)
+        Snapshots object which this belongs to
+    
+    _row (int)
+        Position of snapshot in the Snapshots object which this belongs to, i.e. its row in the
+        arrays of its items
     """
     
-    timestep = _SnapshotItemDescriptor("timestep")
-    n_atoms = _SnapshotItemDescriptor("n_atoms")
+    __slots__ = ("_snapshots", "_row")
+    
+    timestep = _RowItemDescriptor("timestep")
+    n_atoms = _RowItemDescriptor("n_atoms")
     
-    def __init__(self, source, identifier, atom_data, snapshots_items, snapshots_custom):
+    def __init__(self, snapshots, row):
         """
         Creates snapshot object
         
         Args: 
-            source, identifier, atom_data are self-explanatory (see docstring)
-        
-            snapshots_items (_SnapshotsItems): SnapshotsItems object corresponding to the
-                snapshots object which this belongs to
-            
-            snapshots_custom (_SnapshotsCustom): SnapshotsCustom object corresponding to the
-                snapshots object which this belongs to
+            snapshots (Snapshots): Snapshots object which this belongs to
+            row (int): Position of snapshot in snapshots
         """
         
-        
-        super().__init__(source, identifier)
-        
-        self.atom_data = tuple(atom_data)
-        
-        self.items = _SnapshotItems(self, snapshots_items)
-        self.custom = _SnapshotCustom(self, snapshots_custom)
-        self.box = _ReferenceBox(self.items)
-
- 
-    @classmethod
-    def from_existing(cls, snapshot, snapshots_items, snapshots_custom):
-        """Clones existing snapshot. Args are same as for __init__"""
-        
-        return cls(snapshot.source, snapshot.identifier, snapshot.atom_data, snapshots_items, 
-                   snapshots_custom)
+        # Readonly attributes are assigned directly, since checking that they are unset is slow
+        self._source, self._identifier, self._atom_data = snapshots._references.get(row)
+        self._snapshots = snapshots
+        self._row = row
+    
+    @property
+    def items(self):
+        return _SnapshotItems(self, self._snapshots._items)
+    
+    @property
+    def custom(self):
+        return _SnapshotCustom(self, self._snapshots._custom)
+    
+    @property
+    def box(self):
+        return _ReferenceBox(self.items)
 
 
 class Snapshots():
@@ -467,12 +979,19 @@ class Snapshots():
     Snapshots object will never affect a snapshot object in a different Snapshots object.
     
     The snapshot objects contained a Snapshots object are fixed. Therefore, operations like adding
-    and slicing always create a new snapshots object.
+    and slicing always create a new snapshots object. The only exception is a Snapshots object
+    following a dump file which is still being written, which appends snapshots as they are
+    completed (see refresh).
     
     Snapshots objects collect the global-data of snapshot objects into ndarrays of size (N, ...),
     where N is the number of snapshots. Alternatively, you can edit properties on a snapshot object 
     and the changes will propagate here.
     
+    Snapshot objects are views of a row of these arrays, which are only created when the Snapshots
+    object is indexed or iterated over, so creating, slicing and adding Snapshots objects does not
+    create an object per snapshot. A snapshot object is kept while it is referenced elsewhere, so
+    indexing the same snapshot again returns the same object.
+    
     ----------------------------------------------------------------------
     Instance variables:
         
@@ -502,19 +1021,181 @@ class Snapshots():
     
     def __iter__(self):
         """Returns iterator over contained snapshot objects"""
-        return iter(self.snapshots)
+        
+        if self._lazy_source is None:
+            return map(self._snapshot, range(len(self._references)))
+        
+        return self._iter_lazy()
+    
+    def _iter_lazy(self):
+        """Iterate while indexing, doubling the number of indexed snapshots as needed"""
+        
+        i = 0
+        
+        while True:
+            if i == len(self._references):
+                self._index(max(2*i, 1))
+                
+                if i == len(self._references):
+                    return
+                
+            yield self._snapshot(i)
+            i += 1
+    
+    def _snapshot(self, row):
+        """Get snapshot object of row, creating it if it is not referenced elsewhere"""
+        
+        snapshot = self._snapshot_objects.get(row)
+        
+        if snapshot is None:
+            snapshot = _ReferenceSnapshot(self, row)
+            self._snapshot_objects[row] = snapshot
+        
+        return snapshot
     
     def __getitem__(self, index):
         """Returns snapshot object(s), where slicing is supported"""
-        return self.snapshots[index]
+        
+        rows = self._rows(index)
+        
+        if type(rows) == range:
+            return tuple(map(self._snapshot, rows))
+        
+        return self._snapshot(rows)
+    
+    def _rows(self, index):
+        """
+        Get row (int) or rows (range) of the snapshot objects indexed by index (int or slice).
+        Lazily indexed Snapshots are only indexed as far as needed
+        """
+        
+        if self._lazy_source is not None:
+            # Negative indices require the whole file
+            if type(index) == int and index >= 0:
+                self._index(index + 1)
+            elif (type(index) == slice and index.stop is not None and index.stop >= 0 and
+                  (index.start or 0) >= 0 and (index.step or 1) > 0):
+                self._index(index.stop)
+            else:
+                self._index()
+        
+        return range(len(self._references))[index]
+    
+    def _array_rows(self, index):
+        """
+        Get rows ((n,) int ndarray) of the snapshot objects indexed by an integer array or selected
+        by a boolean mask. Lazily indexed Snapshots are fully indexed
+        """
+        
+        self._index()
+        
+        n_snapshots = len(self._references)
+        array = np.asarray(index)
+        
+        if array.ndim == 0:
+            raise RuntimeError(f"Unexpected type {type(index)} in snapshots")
+        
+        index = array
+        
+        if index.ndim != 1:
+            raise RuntimeError(f"Unexpected index of shape {index.shape} in snapshots, expected 1D")
+        
+        if index.dtype == bool:
+            if len(index) != n_snapshots:
+                raise IndexError(f"Boolean index of length {len(index)} does not match "
+                                 f"{n_snapshots} snapshots")
+            
+            return np.flatnonzero(index)
+        
+        if len(index) == 0:
+            return np.empty(0, dtype = np.int64)
+        
+        if not np.issubdtype(index.dtype, np.integer):
+            raise RuntimeError(f"Unexpected type {index.dtype} in snapshots")
+        
+        if index.min() < -n_snapshots or index.max() >= n_snapshots:
+            raise IndexError(f"Index out of range for {n_snapshots} snapshots")
+        
+        return np.where(index < 0, index + n_snapshots, index).astype(np.int64)
     
     def __setitem__(self, index, values):
         raise RuntimeError("Attempt to modify immutable snapshots object")
     
     def index(self, *args, **kwargs):
-        """Pass-through method to get index of snapshot object. See tuple.index"""
+        """
+        Pass-through method to get index of snapshot object. See tuple.index
+        
+        Snapshot objects of this Snapshots object are looked up by their stored row, without a
+        search
+        """
+        
+        if len(args) == 1 and not kwargs:
+            snapshot = args[0]
+            
+            if isinstance(snapshot, _ReferenceSnapshot) and snapshot._snapshots is self:
+                return snapshot._row
+        
         return self.snapshots.index(*args, **kwargs)
     
+    def at_timestep(self, timestep, nearest = False):
+        """
+        Get the snapshot object at a timestep, found by binary search of the sorted timesteps
+        
+        Args:
+            timestep (int): Timestep of snapshot
+            nearest (bool): Whether to get the snapshot whose timestep is nearest if no snapshot is
+                at timestep, where the earlier of two equally near timesteps is chosen. Otherwise,
+                an error is raised (default False)
+        
+        Returns: snapshot object. If several snapshots have the timestep, the first of them
+        """
+        
+        order, timesteps = self.items.sorted_timesteps()
+        
+        if len(timesteps) == 0:
+            raise RuntimeError("Snapshots object contains no snapshots")
+        
+        i = np.searchsorted(timesteps, timestep)
+        
+        if i == len(timesteps) or timesteps[i] != timestep:
+            if not nearest:
+                raise RuntimeError(f"No snapshot at timestep {timestep}")
+            
+            if i == len(timesteps) or (i > 0 and timestep - timesteps[i - 1] <= timesteps[i] - timestep):
+                # First snapshot of the earlier timestep
+                i = np.searchsorted(timesteps, timesteps[i - 1])
+        
+        return self._snapshot(int(order[i]))
+    
+    def select(self, start = None, stop = None):
+        """
+        Create Snapshots object of the snapshots with timesteps from start to stop (inclusive),
+        found by binary search of the sorted timesteps. All snapshots of duplicate timesteps are
+        selected, and snapshots keep their order
+        
+        Snapshots selected by other global data are obtained with a boolean mask, e.g.
+        snapshots.new[snapshots.custom["c_temp"] > 500]
+        
+        Args:
+            start (int): First timestep selected. If None (default), from the first timestep
+            stop (int): Last timestep selected. If None (default), up to the last timestep
+        
+        Returns: Snapshots object
+        """
+        
+        order, timesteps = self.items.sorted_timesteps()
+        
+        first = 0 if start is None else np.searchsorted(timesteps, start, side = "left")
+        last = len(timesteps) if stop is None else np.searchsorted(timesteps, stop, side = "right")
+        
+        rows = np.sort(order[first:last])
+        
+        if len(rows) > 0 and rows[-1] - rows[0] + 1 == len(rows):
+            # Contiguous rows are sliced, without copying
+            return type(self).from_index(self, slice(int(rows[0]), int(rows[-1]) + 1))
+        
+        return type(self).from_index(self, rows)
+    
     def __add__(self, object2):
         """
         Add either an individual snapshot or another snapshots object and return a new Snapshots
@@ -529,21 +1210,42 @@ class Snapshots():
         
         if type(object2) is not type(self):
             if issubclass(type(object2), Snapshot):
-                return type(self)(self.snapshots + (object2,))
+                return type(self)._concatenate((self, type(self)([object2])))
             
             raise RuntimeError(f"Incompatible type {type(object2)} for sum")
         
-        return type(self)(self.snapshots + object2.snapshots)
+        return type(self)._concatenate((self, object2))
     
     
     def __radd__(self, object2):
         """Reverse add to handle snapshot + Snapshots case. See __add__"""
         
         if issubclass(type(object2), Snapshot):
-            return type(self)((object2,) + self.snapshots)
+            return type(self)._concatenate((type(self)([object2]), self))
         
         raise RuntimeError(f"Incompatible type {type(object2)} for sum")    
     
+    @classmethod
+    def _concatenate(cls, snapshots_list):
+        """
+        Create Snapshots object of the snapshot objects of several Snapshots objects in order, by
+        joining their arrays
+        """
+        
+        for snapshots in snapshots_list:
+            snapshots._index()
+        
+        new_snapshots = cls.__new__(cls)
+        
+        references = _SnapshotReferences.concatenate([snapshots._references
+                                                      for snapshots in snapshots_list])
+        items = _SnapshotsItems.concatenate(new_snapshots, [snapshots._items
+                                                            for snapshots in snapshots_list])
+        
+        new_snapshots._setup(references, items)
+        
+        return new_snapshots
+    
     def __str__(self):
         """Give nicely formatted str representation"""
         
@@ -561,7 +1263,206 @@ class Snapshots():
     
     def __len__(self):
         """Returns number of contained snapshot objects"""
-        return len(self.snapshots)
+        self._index()
+        return len(self._references)
+    
+    @property
+    def snapshots(self):
+        """Tuple of contained snapshot objects, which are created if needed"""
+        self._index()
+        return tuple(self)
+    
+    @property
+    def items(self):
+        """Dict-like object containing (N, ...) ndarrays for global data in snapshot objects"""
+        self._index()
+        return self._items
+    
+    @property
+    def custom(self):
+        """Dict-like object containing (N, ...) ndarrays for custom global data"""
+        self._index()
+        return self._custom
+    
+    @property
+    def boxes(self):
+        """The boxes of contained snapshot objects"""
+        self._index()
+        return self._boxes
+    
+    def refresh(self):
+        """
+        Append snapshots which have been completed in the dump file since it was last indexed. Only
+        available for Snapshots objects created with from_dump(..., follow = True)
+        
+        Only data written since the last refresh is read.
+        
+        Returns: tuple of the appended snapshot objects
+        """
+        
+        if self._follow_source is None:
+            raise RuntimeError("Snapshots object is not following a dump file")
+        
+        with self._index_lock:
+            self._index() # Finish any lazy indexing first
+            n_old = len(self._references)
+            
+            self._extend(self._follow_source.snapshots, self._follow_source.refresh())
+            n_new = len(self._references)
+        
+        return self[n_old:n_new]
+    
+    def follow(self, interval = 1, timeout = None):
+        """
+        Generator yielding every snapshot object, including those appended as the dump file is
+        written. Only available for Snapshots objects created with from_dump(..., follow = True)
+        
+        Args:
+            interval (float): Seconds to wait between refreshes (default 1)
+            timeout (float): Stop once no snapshot has been completed for this many seconds. If
+                None (default), never stop
+        """
+        
+        yield from self
+        
+        last_time = time.monotonic()
+        
+        while timeout is None or time.monotonic() - last_time < timeout:
+            time.sleep(interval)
+            
+            new_snapshots = self.refresh()
+            
+            if new_snapshots:
+                last_time = time.monotonic()
+                yield from new_snapshots
+    
+    def prefetch(self, columns = None, depth = readahead.DEFAULT_DEPTH,
+                 max_bytes = readahead.DEFAULT_MAX_BYTES, float32 = False, workers = 1):
+        """
+        Iterate over snapshots together with their parsed per-atom data, reading and parsing the
+        next snapshots on background threads while the caller works on the current one, e.g.
+        
+            for snapshot, atoms in snapshots.prefetch(["x", "y", "z"]):
+                ...
+        
+        Iteration is lazy, so it may be stopped early, and lazily opened dumps are only indexed as
+        far as needed
+        
+        Args:
+            columns (iterable of str): Names of per-atom columns to parse. If None (default), all
+                columns
+            depth (int): Maximum number of snapshots read ahead (default readahead.DEFAULT_DEPTH)
+            max_bytes (int): Maximum estimated size of the parsed arrays of snapshots read ahead,
+                although at least one snapshot is always read ahead (default
+                readahead.DEFAULT_MAX_BYTES)
+            float32 (bool): Whether float columns are single precision (default False)
+            workers (int): Number of background threads (default 1)
+        
+        Yields: (snapshot, atoms) where atoms is the dict returned by snapshot.atoms
+        """
+        
+        return readahead.iter_prefetched(self, columns = columns, depth = depth,
+                                         max_bytes = max_bytes, float32 = float32,
+                                         workers = workers)
+    
+    def stack(self, columns, index = None, sort = False, float32 = False, processes = None,
+              out = None):
+        """
+        Read per-atom data of snapshots into one (n_snapshots, n_atoms, len(columns)) array, e.g.
+        the positions of every atom over a trajectory
+        
+        Snapshots are parsed in parallel by worker processes, so calling code must be guarded by
+        if __name__ == "__main__" where processes are spawned (e.g. Windows)
+        
+        Args:
+            columns (iterable of str): Names of per-atom columns to read, from atom_data
+            index (int, slice or iterable of int): Indices of snapshots to read. If None (default),
+                all snapshots
+            sort (bool): Whether to sort the atoms of each snapshot by id (default False)
+            float32 (bool): Whether the array is single precision, otherwise double (default False)
+            processes (int): Maximum number of worker processes, where None (default) means one
+                per CPU
+            out (None, str, Path or SharedMemory): If None (default), a new array is returned. If a
+                path, the array is a memory-mapped .npy file created at that path. If a
+                multiprocessing.shared_memory.SharedMemory block, the array is stored in it
+        
+        Returns: ndarray
+        """
+        
+        if index is None:
+            snapshots = self.snapshots
+        elif type(index) == int:
+            snapshots = (self[index],)
+        elif type(index) == slice:
+            snapshots = self[index]
+        else:
+            snapshots = tuple(self[i] for i in index)
+        
+        return trajectory.stack_snapshots(snapshots, columns, sort = sort, float32 = float32,
+                                          processes = processes, out = out)
+    
+    def trajectory(self, columns, sort = False, float32 = False):
+        """
+        Get array-like object of shape (n_snapshots, n_atoms, len(columns)) containing per-atom data
+        of the snapshots, which is only parsed when indexed. This allows NumPy-style indexing, e.g.
+        trajectory[100:200:5, mask, 0:3], of trajectories which do not fit in memory
+        
+        Args:
+            columns (iterable of str): Names of per-atom columns, from atom_data
+            sort (bool): Whether to sort the atoms of each snapshot by id (default False)
+            float32 (bool): Whether the array is single precision, otherwise double (default False)
+        
+        Returns: TrajectoryArray (see trajectory)
+        """
+        
+        return trajectory.TrajectoryArray(self.snapshots, columns, sort = sort, float32 = float32)
+    
+    def _extend(self, table, identifiers):
+        """
+        Append snapshots of a sources.SnapshotTable (of a lazily indexed or followed source) to
+        this object
+        
+        Args:
+            table (sources.SnapshotTable): Snapshots of source
+            identifiers (range): Identifiers of the snapshots to append, as returned by the index
+                or refresh methods of the source
+        """
+        
+        if not identifiers:
+            return
+        
+        start, stop = identifiers.start, identifiers.stop
+        
+        # Both take time proportional to the number of new snapshots, so following a dump does not
+        # slow down as it grows
+        self._items.extend_table(table, start, stop)
+        self._references = self._references.extend(_SnapshotReferences.from_table(table, start, stop))
+    
+    def _index(self, n_snapshots = None):
+        """
+        For lazily indexed Snapshots, index until at least n_snapshots snapshot objects are
+        contained (all if None). Does nothing if fully indexed
+        
+        Indexing and appending the indexed snapshots are done under a lock, so that snapshots are
+        appended once and in order when several threads index at once
+        """
+        
+        if self._lazy_source is None:
+            return
+        
+        with self._index_lock:
+            source = self._lazy_source
+            
+            if source is None:
+                # Indexed by another thread meanwhile
+                return
+            
+            self._extend(source.snapshots, source.index(n_snapshots))
+            
+            # Only cleared once the snapshots have been appended, since other threads then stop
+            # waiting for the lock
+            if source.complete:
+                self._lazy_source = None
     
     
     def write_dump(self, path, allow_overwrite = False, ignore_custom = False):
@@ -582,6 +1483,54 @@ class Snapshots():
             for snapshot in self:
                 file.write(snapshot.to_dump(ignore_custom = ignore_custom))
     
+    def write_store(self, path, allow_overwrite = False, float32 = False, ignore_custom = False):
+        """
+        Write collection of snapshot objects to a store, a directory of binary columns which
+        from_store opens without parsing (see store). Snapshots must all have the same per-atom
+        data headers
+        
+        Args:
+            path (Path or str): Path of store directory to create
+            allow_overwrite (bool): Whether to write into an existing directory. If false and the
+                                    path exists, an error will be raised (default False)
+            float32 (bool): Whether to store float per-atom data in single precision (default False)
+            ignore_custom (bool): Determines whether custom data is written to store or not
+        
+        Returns: None
+        """
+        
+        store.write_store(self, path, allow_overwrite = allow_overwrite, float32 = float32,
+                          ignore_custom = ignore_custom)
+    
+    def write_compressed(self, path, precision = 1e-3, keyframe_interval = 10, codec = "zlib",
+                         level = 6, allow_overwrite = False, ignore_custom = False):
+        """
+        Write collection of snapshot objects to a compressed store, in which float per-atom data is
+        quantized to a given precision (see compressed). Open it with from_compressed. Snapshots
+        must all have the same per-atom data headers, and atoms are stored sorted by id
+        
+        Args:
+            path (Path or str): Path of compressed store directory to create
+            precision (float, None or dict): Quantization step of float per-atom data, so that
+                values are stored within precision/2. None stores floats exactly, and a dict gives
+                the precision of each column by name (columns not in the dict are exact)
+                (default 1e-3)
+            keyframe_interval (int): Number of snapshots between keyframes. Reading a snapshot
+                decodes at most this many snapshots (default 10)
+            codec (str): "zlib" (default, fastest), "lzma" (smallest) or "bz2"
+            level (int): Compression level of codec (default 6)
+            allow_overwrite (bool): Whether to write into an existing directory. If false and the
+                                    path exists, an error will be raised (default False)
+            ignore_custom (bool): Determines whether custom data is written or not
+        
+        Returns: None
+        """
+        
+        compressed.write_compressed(self, path, precision = precision,
+                                    keyframe_interval = keyframe_interval, codec = codec,
+                                    level = level, allow_overwrite = allow_overwrite,
+                                    ignore_custom = ignore_custom)
+    
     class _new():
         def __init__(self, instance):
             self.instance = instance
@@ -594,25 +1543,54 @@ class Snapshots():
     timesteps = _SnapshotItemDescriptor("timestep")
     n_atoms = _SnapshotItemDescriptor("n_atoms")
         
-    def __init__(self, snapshots_old, attempt_cast_strings = False):
+    def __init__(self, snapshots_old, attempt_cast_strings = False, lazy_source = None):
         """
         Constructor for Snapshots. Not recommended to call directly, use one of the class methods
         to get a Snapshots object
         
         Args:
-            snapshots_old (list-like): Snapshot objects to create Snapshots from
+            snapshots_old (list-like): Snapshot objects to create Snapshots from. If a
+                sources.SnapshotTable, global data is taken from its columns, without creating
+                its SourceSnapshot objects
             attempt_cast_strings (bool): Whether to attempt to cast custom data that are strings to
                 number. This is performed when custom data is read as a string from a dump file
                 Default: False
+            lazy_source (DumpFileSource): Source which is not yet fully indexed, whose remaining
+                snapshots are appended to snapshots_old as they are needed. Default: None
+        """
+        
+        if isinstance(snapshots_old, sources.SnapshotTable):
+            items = _SnapshotsItems.from_table(self, snapshots_old,
+                                               attempt_cast_strings = attempt_cast_strings)
+            references = _SnapshotReferences.from_table(snapshots_old)
+        else:
+            snapshots_old = list(snapshots_old)
+            
+            items = _SnapshotsItems(self, snapshots_old, attempt_cast_strings = attempt_cast_strings)
+            references = _SnapshotReferences.from_snapshots(snapshots_old)
+        
+        self._setup(references, items, lazy_source)
+    
+    def _setup(self, references, items, lazy_source = None):
         """
+        Assign instance variables from the references of the snapshots (_SnapshotReferences) and
+        their global data (_SnapshotsItems of this object)
+        """
+        
+        self._references = references
+        
+        self._items = items
+        self._custom = _SnapshotsCustom(self._items)
+        self._boxes = _ReferenceBox(self._items)
         
-        self.items = _SnapshotsItems(self, snapshots_old, attempt_cast_strings = attempt_cast_strings)        
-        self.custom = _SnapshotsCustom(self.items)
+        # Snapshot objects which are referenced elsewhere, keyed by row
+        self._snapshot_objects = weakref.WeakValueDictionary()
         
-        # Clone snapshot objects
-        self.snapshots = tuple(_ReferenceSnapshot.from_existing(snapshot, self.items, self.custom) for snapshot in snapshots_old)    
+        self._lazy_source = lazy_source
+        self._follow_source = None
         
-        self.boxes = _ReferenceBox(self.items)
+        # Held while indexing lazily or refreshing (see _index)
+        self._index_lock = threading.RLock()
 
         self.new = type(self)._new(self)
 
@@ -663,17 +1641,195 @@ class Snapshots():
         return cls(snapshots)
     
     @classmethod
-    def from_dump(cls, path):
+    def from_dump(cls, path, cache_index = False, cache_dir = None, processes = 1, verify = False,
+                  lazy = False, follow = False, cache_bytes = atoms.DEFAULT_CACHE_BYTES):
         """
         Creates Snapshots object from a LAMMPS dump file
         
+        gzip-compressed dumps (e.g. written by dump atom/gz) are recognized by their contents, and
+        are indexed in one pass which records checkpoints to decompress each snapshot from (see
+        gzipped). They are always indexed serially, and cannot be indexed lazily or followed.
+        Binary dumps written by LAMMPS since 2021 are also recognized, and are opened as by
+        from_binary_dump
+        
+        A trajectory split over several text dump files (e.g. one file per timestep) is opened from
+        a glob pattern or a list of paths. The files are indexed concurrently (by a thread pool, or
+        by processes if processes is not 1), and their snapshots are ordered by timestep. Files
+        are only kept open while they are read (see multifile). Indexes of such files are not
+        saved, and they cannot be indexed lazily or followed
+        
         Args:
-            path (str of Path): Path of dump file
+            path (str of Path): Path of dump file, glob pattern of dump files (e.g. "dump.*.lammpstrj")
+                or iterable of paths of dump files
+            cache_index (bool): Whether to save the index of the dump file to disk, so that
+                reopening the dump does not require it to be indexed again. The saved index is
+                validated against the dump file and is extended if the dump has grown
+                (default False)
+            cache_dir (str or Path): Directory to save the index in. If None (default), the index
+                is saved next to the dump file as <dump name>.index
+            processes (int): Maximum number of worker processes used to index the dump, where None
+                means one per CPU. Each worker indexes a byte range of the dump. Small dumps are
+                always indexed serially (default 1)
+            verify (bool): Whether to check that every snapshot has as many per-atom lines as
+                atoms. Otherwise, per-atom data is only searched for the next item (default False)
+            lazy (bool): Whether to index the dump only as far as needed. Indexing or iterating
+                only indexes up to the requested snapshots, while len(), negative indices and
+                accessing Snapshots-level data (e.g. timesteps) index the whole dump (default False)
+            follow (bool): Whether the dump is still being written (e.g. by a running simulation).
+                An incomplete final snapshot is ignored, and refresh or follow append snapshots
+                to the Snapshots object as they are completed (default False)
+            cache_bytes (int): Byte budget of the cache of per-atom data parsed by Snapshot.atoms.
+                The cache is shared by all Snapshots objects containing snapshots of this dump
+                (default 256 MiB)
         
         Returns: Snapshots object
         """
-        file = open(path, "r")
-        source = sources.DumpFileSource(file)
+        if not isinstance(path, (str, Path)) or multifile.is_pattern(path):
+            if lazy or follow:
+                raise RuntimeError("Dumps of several files cannot be indexed lazily or followed")
+            
+            source = multifile.DumpFilesSource(multifile.expand_paths(path), processes = processes,
+                                               verify = verify, cache_bytes = cache_bytes)
+            
+            return cls(source.snapshots, attempt_cast_strings = True)
+        
+        file = open(path, "rb")
+        
+        index_path = index_cache.get_index_path(path, cache_dir) if cache_index else None
+        
+        if gzipped.is_gzip(file):
+            if lazy or follow:
+                file.close()
+                raise RuntimeError("gzip-compressed dumps cannot be indexed lazily or followed")
+            
+            source = gzipped.GzipDumpSource(file, index_path = index_path, verify = verify,
+                                            cache_bytes = cache_bytes)
+            
+            return cls(source.snapshots, attempt_cast_strings = True)
+        
+        if binary.is_binary(file):
+            if lazy or follow:
+                file.close()
+                raise RuntimeError("Binary dumps cannot be indexed lazily or followed")
+            
+            return cls(binary.BinaryDumpSource(file).snapshots, attempt_cast_strings = True)
+        
+        source = sources.DumpFileSource(file, index_path = index_path, processes = processes,
+                                        verify = verify, lazy = lazy, follow = follow,
+                                        cache_bytes = cache_bytes)
+        
+        snapshots = cls(source.snapshots, attempt_cast_strings = True,
+                        lazy_source = None if source.complete else source)
+        
+        if follow:
+            snapshots._follow_source = source
+        
+        return snapshots
+    
+    @staticmethod
+    def iter_dump(path, columns = None, float32 = False, verify = False):
+        """
+        Read a LAMMPS dump file in one sequential pass, yielding the data of each snapshot as a
+        lightweight record instead of creating a Snapshots object
+        
+        Only the current snapshot is held in memory, so memory use does not depend on the number
+        of snapshots. gzip-compressed dumps are decompressed as they are read
+        
+        Args:
+            path (str or Path): Path of dump file
+            columns (iterable of str): Names of per-atom columns to parse. If None (default), all
+                columns are parsed
+            float32 (bool): Whether float columns are single precision (default False)
+            verify (bool): Whether to check that every snapshot has as many per-atom lines as
+                atoms (default False)
+        
+        Yields: streaming.Frame, with attributes timestep, n_atoms, box_bounds, box_tri, box_BC,
+            custom and atoms (dict of per-atom arrays keyed by column name)
+        """
+        
+        return streaming.iter_dump(path, columns = columns, float32 = float32, verify = verify)
+    
+    @classmethod
+    def from_split_dump(cls, path, sort = False, processes = 1, verify = False,
+                        cache_bytes = atoms.DEFAULT_CACHE_BYTES):
+        """
+        Creates Snapshots object from a dump split over processors, i.e. written with % in its file
+        name (e.g. dump ... dump.%.* or dump ... dump.%), which writes one file per processor or
+        group of processors. The parts of each timestep in all files are merged into one snapshot
+        
+        Args:
+            path (str, Path or iterable): Glob pattern of dump files (e.g. "dump.*"), or iterable
+                of paths of dump files. Parts are joined in the order of the paths, where numbers
+                in matched file names are ordered by value
+            sort (bool): Whether to sort the atoms of each snapshot by id. Otherwise, atoms are in
+                the order of the files (default False)
+            processes (int): Number of worker processes used to index the files, where None means
+                one per CPU. If 1 (default), files are indexed by a thread pool
+            verify (bool): Whether to check that every part has as many per-atom lines as atoms
+                (default False)
+            cache_bytes (int): Byte budget of the cache of per-atom data parsed by Snapshot.atoms
+                (default 256 MiB)
+        
+        Returns: Snapshots object
+        """
+        
+        source = multifile.SplitDumpSource(multifile.expand_paths(path), sort = sort,
+                                           processes = processes, verify = verify,
+                                           cache_bytes = cache_bytes)
+        
+        return cls(source.snapshots, attempt_cast_strings = True)
+    
+    @classmethod
+    def from_binary_dump(cls, path, atom_data = None):
+        """
+        Creates Snapshots object from a LAMMPS binary dump file (e.g. dump custom to a .bin file).
+        Only the snapshot headers are read, and per-atom data is read from the file as arrays
+        without any text conversion
+        
+        Args:
+            path (str or Path): Path of binary dump file
+            atom_data (iterable of str): Per-atom column names. Required for binary dumps written
+                by LAMMPS before 2021, which do not contain them. If None (default), the column
+                names stored in the dump are used
+        
+        Returns: Snapshots object
+        """
+        
+        source = binary.BinaryDumpSource(open(path, "rb"), atom_data = atom_data)
+        
+        return cls(source.snapshots, attempt_cast_strings = True)
+    
+    @classmethod
+    def from_store(cls, path):
+        """
+        Creates Snapshots object from a store written by write_store. Per-atom data is
+        memory-mapped, so Snapshot.atoms returns views of the store without parsing
+        
+        Args:
+            path (str or Path): Path of store directory
+        
+        Returns: Snapshots object
+        """
+        
+        source = store.StoreSource(path)
+        
+        return cls(source.snapshots, attempt_cast_strings = True)
+    
+    @classmethod
+    def from_compressed(cls, path, cache_bytes = atoms.DEFAULT_CACHE_BYTES):
+        """
+        Creates Snapshots object from a compressed store written by write_compressed. Per-atom data
+        is decompressed when requested
+        
+        Args:
+            path (str or Path): Path of compressed store directory
+            cache_bytes (int): Byte budget of the cache of decompressed per-atom data
+                (default 256 MiB)
+        
+        Returns: Snapshots object
+        """
+        
+        source = compressed.CompressedSource(path, cache_bytes = cache_bytes)
         
         return cls(source.snapshots, attempt_cast_strings = True)
     
@@ -684,16 +1840,34 @@ class Snapshots():
         
         Used by new
         
+        The new object's arrays are views of the arrays of snapshots, which are only copied by
+        either object when it modifies them, so slicing takes constant time
+        
+        Integer arrays and boolean masks select snapshots as in NumPy. The new object's arrays are
+        then copies
+        
         Args:
-            index (int or slice): index(es) of Snapshot objects to include in new Snapshots
+            index (int, slice, iterable of int or iterable of bool): index(es) of Snapshot objects
+                to include in new Snapshots, or a boolean mask of the Snapshot objects to include
             
         Returns: Snapshots object
         """
         
-        if type(index) == slice:
-            return cls(snapshots[index])
-        elif type(index) == int:
-            return cls([snapshots[index]])
+        if isinstance(index, np.integer):
+            index = int(index)
+        
+        if type(index) in (int, slice):
+            rows = snapshots._rows(index)
+            
+            if type(index) == int:
+                index = slice(rows, rows + 1)
         else:
-            raise RuntimeError(f"Unexpected type {type(index)} in snapshots")
+            index = snapshots._array_rows(index)
+        
+        new_snapshots = cls.__new__(cls)
+        
+        new_snapshots._setup(snapshots._references.take(index),
+                             snapshots._items.take(new_snapshots, index))
+        
+        return new_snapshots
      
@@ -4,46 +4,23 @@ Internal module of dump_reader handling parsing of LAMMPS files
 """
 
 from pathlib import Path
+from array import array
+from collections import abc
 import re
+import os
+import mmap
 import numpy as np
 import tempfile
+import threading
 
 from .snapshot import Snapshot
 from .box import Box
 from .common import has_no_length, readonly
+from . import indexing, index_cache, atoms
 
-def jump_lines(f, num):
-    """Skip past num lines in file f"""
-    
-    readline = f.readline # Localize for speed
-    
-    for _ in range(num):
-        readline()
-
-
-def read_lines(f, num):
-    """Read num lines from f and return as list"""
-    
-    lines = []
-    
-    # Localize for speed
-    readline = f.readline
-    append = lines.append
-    
-    for _ in range(num):
-        append(readline())
-        
-    return lines
+# Number of snapshots scanned at a time by DumpFileSource.index
+INDEX_BATCH = 1 << 16
 
-def get_position(f):
-    """Get file position handle"""
-    return f.tell()
-
-def set_position(f, N):
-    """Set file position using handle"""
-    f.seek(N)
-    
-    
 def str_starts_with(long_str, short_str):
     """self-explanatory"""
     return long_str[0:len(short_str)] == short_str
@@ -183,21 +160,286 @@ class SourceSnapshot(Snapshot):
 
 
 
-class DumpFileSource():
+class PackedRows(abc.Sequence):
+    """
+    Growable sequence of rows of a fixed number of numbers, packed into one array.array so that
+    rows are not Python objects. Rows are returned as tuples
     """
-    Instances of this class parse a LAMMPS dump file into snapshot objects which contain the global
-    dump data and a position handle to lookup the per-atom data in the file
     
-    Class variables are used as constants and are self-explanatory, so they will not be documented
+    def __init__(self, typecode, width):
+        """
+        Create empty sequence
+        
+        Args:
+            typecode (str): array.array type code of values (e.g. "q" or "d")
+            width (int): Number of values per row
+        """
+        
+        self.values = array(typecode)
+        self.width = width
+    
+    def __len__(self):
+        return len(self.values) // self.width
+    
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        
+        if not 0 <= index < len(self):
+            raise IndexError("Row index out of range")
+        
+        return tuple(self.values[index * self.width:(index + 1) * self.width])
+    
+    def append(self, row):
+        """Append row (sequence of width numbers)"""
+        
+        assert len(row) == self.width, f"Expected row of {self.width} values, got {len(row)}"
+        
+        self.values.extend(row)
+    
+    def extend(self, values):
+        """Append rows from a flat sequence of values (width values per row)"""
+        
+        assert len(values) % self.width == 0, f"Expected rows of {self.width} values"
+        
+        self.values.extend(values)
+    
+    def to_numpy(self, start = 0, stop = None):
+        """Copy rows [start, stop) into a (n_rows, width) ndarray"""
+        
+        stop = len(self) if stop is None else stop
+        values = self.values[start * self.width:stop * self.width]
+        
+        return np.frombuffer(values, dtype = values.typecode).reshape(-1, self.width)
+
+
+class SnapshotTable(abc.Sequence):
+    """
+    Sequence of the SourceSnapshot objects of a source, whose global data is stored column by
+    column (struct of arrays) rather than in SourceSnapshot objects
+    
+    Sources append the SnapshotHeader of each snapshot found while indexing, which is reduced to
+    a few packed values, so indexing creates no Python objects per snapshot that outlive it.
+    Snapshots objects are built from the columns directly (see columns), while a SourceSnapshot is
+    only created when it is indexed. The identifier of each snapshot is its position
     
     ----------------------------------------------------------------------
     Instance variables:
         
-        file: File object of dump
+        source: Source of snapshots
+        
+        timestep, n_atoms: array.array of int64
+        
+        box_bounds: PackedRows of (xlo, xhi, ylo, yhi, zlo, zhi)
         
-        snapshots: list containing SourceSnapshot objects from dump
+        box_tri: PackedRows of (xy, xz, yz), all zero if box is not triclinic
         
-        snapshot_seek_info: list containing the file position for each SourceSnapshot in the dump file
+        box_BC: list of str of the 6 BC chars of each box (e.g. "pppppp"), shared between boxes
+        
+        atom_data_types: list of the distinct tuples of per-atom column names
+        
+        atom_data_index: array.array of int64 index in atom_data_types of the atom_data of each
+            snapshot (see get_atom_data)
+        
+        custom: dict of lists of custom data keyed by item name, where single values are str and
+            others are parsed by Source.parse_custom_data. All snapshots have the same items
+    """
+    
+    def __init__(self, source):
+        self.source = source
+        
+        self.timestep = array("q")
+        self.n_atoms = array("q")
+        self.box_bounds = PackedRows("d", 6)
+        self.box_tri = PackedRows("d", 3)
+        self.box_BC = []
+        self.atom_data_types = []
+        self.atom_data_index = array("q")
+        self.custom = {}
+        
+        # Number of complete rows, only incremented once every column is appended, so that
+        # concurrent readers never see a partial row
+        self._length = 0
+        
+        # Identical BC strings are shared, and atom_data tuples are numbered
+        self._shared = {}
+        self._atom_data_numbers = {}
+    
+    def __len__(self):
+        return self._length
+    
+    def add_header(self, header):
+        """Append snapshot of indexing.SnapshotHeader header"""
+        
+        if self._length == 0:
+            self.custom = {name: [] for name in header.custom}
+        elif header.custom.keys() != self.custom.keys():
+            raise RuntimeError(f"Non-matching custom data at snapshot {self._length}")
+        
+        # Everything is converted before any column is appended
+        custom = {}
+        
+        for name, lines in header.custom.items():
+            tokens = lines[0].split() if len(lines) == 1 else None
+            custom[name] = tokens[0] if tokens and len(tokens) == 1 else self.source.parse_custom_data(lines)
+        
+        x_data, y_data, z_data = header.box_data
+        
+        bounds = (float(x_data[0]), float(x_data[1]), float(y_data[0]), float(y_data[1]),
+                  float(z_data[0]), float(z_data[1]))
+        tri = (float(x_data[2]), float(y_data[2]), float(z_data[2])) if len(x_data) == 3 else (0.0, 0.0, 0.0)
+        
+        BC = "".join(header.box_BC)
+        
+        for name, value in custom.items():
+            self.custom[name].append(value)
+        
+        self.box_bounds.append(bounds)
+        self.box_tri.append(tri)
+        self.box_BC.append(self._shared.setdefault(BC, BC))
+        
+        number = self._atom_data_numbers.get(header.atom_data)
+        
+        if number is None:
+            number = self._atom_data_numbers[header.atom_data] = len(self.atom_data_types)
+            self.atom_data_types.append(header.atom_data)
+        
+        self.atom_data_index.append(number)
+        
+        self.timestep.append(header.timestep)
+        self.n_atoms.append(header.n_atoms)
+        
+        self._length += 1
+    
+    def __getitem__(self, index):
+        """Create SourceSnapshot of the snapshot at index (or a list of them, for a slice)"""
+        
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        
+        if index < 0:
+            index += len(self)
+        
+        if not 0 <= index < len(self):
+            raise IndexError("Snapshot index out of range")
+        
+        xlo, xhi, ylo, yhi, zlo, zhi = self.box_bounds[index]
+        xy, xz, yz = self.box_tri[index]
+        BC = self.box_BC[index]
+        
+        box = SourceBox([BC[0:2], BC[2:4], BC[4:6]], [xlo, xhi, xy], [ylo, yhi, xz], [zlo, zhi, yz])
+        
+        custom = {name: np.str_(values[index]) if isinstance(values[index], str) else values[index]
+                  for name, values in self.custom.items()}
+        
+        return SourceSnapshot(self.source, index, self.timestep[index], self.n_atoms[index],
+                              self.get_atom_data(index), box, custom)
+    
+    def get_atom_data(self, identifier):
+        """Get per-atom column names (tuple of str) of snapshot"""
+        return self.atom_data_types[self.atom_data_index[identifier]]
+    
+    def to_lists(self, stop = None):
+        """
+        Get global data of snapshots [0, stop) as JSON-compatible lists, e.g. to save the index of
+        a dump file (see index_cache). Inverse of add_lists
+        
+        Returns: dict of lists keyed by column name, where rows of box_bounds and box_tri are
+            flattened and custom is a dict of lists
+        """
+        
+        stop = len(self) if stop is None else stop
+        
+        custom = {name: [value if isinstance(value, str) else value.tolist() for value in values[:stop]]
+                  for name, values in self.custom.items()}
+        
+        return {
+            "timestep": self.timestep[:stop].tolist(),
+            "n_atoms": self.n_atoms[:stop].tolist(),
+            "box_bounds": self.box_bounds.values[:6 * stop].tolist(),
+            "box_tri": self.box_tri.values[:3 * stop].tolist(),
+            "box_BC": self.box_BC[:stop],
+            "atom_data_types": [list(atom_data) for atom_data in self.atom_data_types],
+            "atom_data_index": self.atom_data_index[:stop].tolist(),
+            "custom": custom
+        }
+    
+    def add_lists(self, lists, stop = None):
+        """
+        Append snapshots [0, stop) of lists returned by to_lists, e.g. of a saved index
+        
+        Args:
+            lists (dict): Global data of snapshots (see to_lists)
+            stop (int): Number of snapshots to append. If None (default), all of lists
+        """
+        
+        stop = len(lists["timestep"]) if stop is None else stop
+        custom = lists["custom"]
+        
+        if self._length == 0:
+            self.custom = {name: [] for name in custom}
+        elif custom.keys() != self.custom.keys():
+            raise RuntimeError(f"Non-matching custom data at snapshot {self._length}")
+        
+        numbers = []
+        
+        for atom_data in map(tuple, lists["atom_data_types"]):
+            number = self._atom_data_numbers.get(atom_data)
+            
+            if number is None:
+                number = self._atom_data_numbers[atom_data] = len(self.atom_data_types)
+                self.atom_data_types.append(atom_data)
+            
+            numbers.append(number)
+        
+        # Values which were parsed (see Source.parse_custom_data) are arrays of str again
+        for name, values in custom.items():
+            self.custom[name].extend(value if isinstance(value, str) else np.array(value, dtype = str)
+                                     for value in values[:stop])
+        
+        self.box_bounds.extend(lists["box_bounds"][:6 * stop])
+        self.box_tri.extend(lists["box_tri"][:3 * stop])
+        self.box_BC.extend(self._shared.setdefault(BC, BC) for BC in lists["box_BC"][:stop])
+        self.atom_data_index.extend(numbers[i] for i in lists["atom_data_index"][:stop])
+        
+        self.timestep.extend(lists["timestep"][:stop])
+        self.n_atoms.extend(lists["n_atoms"][:stop])
+        
+        self._length += stop
+    
+    def columns(self, start = 0, stop = None):
+        """
+        Get global data of snapshots [start, stop) as columns, in the layout of Snapshots items
+        
+        Returns: dict of (n, ...) ndarrays keyed by item name, where custom data are lists (see
+            custom), or an empty dict if there are no snapshots
+        """
+        
+        stop = len(self) if stop is None else stop
+        
+        if stop <= start:
+            return {}
+        
+        columns = {name: values[start:stop] for name, values in self.custom.items()}
+        
+        columns["timestep"] = np.frombuffer(self.timestep[start:stop], dtype = np.int64)
+        columns["n_atoms"] = np.frombuffer(self.n_atoms[start:stop], dtype = np.int64)
+        columns["box_bounds"] = self.box_bounds.to_numpy(start, stop).reshape(-1, 3, 2)
+        columns["box_tri"] = self.box_tri.to_numpy(start, stop)
+        columns["box_BC"] = np.array(self.box_BC[start:stop], dtype = "U6").view("U1").reshape(-1, 3, 2)
+        
+        return columns
+
+
+class Source():
+    """
+    Base class of sources, i.e. objects containing the per-atom data of snapshots, which a snapshot
+    requests from its source using its identifier
+    
+    Implements conversion between snapshots and the LAMMPS dump file format, which is shared by all
+    sources. Subclasses implement read_snapshot_dump and read_snapshot_atoms
+    
+    Class variables are used as constants and are self-explanatory, so they will not be documented
     """
     
     item_pattern = re.compile("^ITEM: (.+)")
@@ -261,30 +503,6 @@ class DumpFileSource():
         
         return header_string + box_string + atoms_string
     
-    @classmethod
-    def snapshot_from_atomman(cls, system, timestep = 0, custom = None, **kwargs):
-        """
-        Create SourceSnapshot from atomman System
-        
-        Args:
-            system (Atomman System): Atomman system object
-            timestep (int): Timestep of snapshot
-            custom (dict-like): Custom data for snapshot (default None)
-            
-            **kwargs: Passed through to atomman method system.dump("atom_dump", **kwargs)
-            
-        Returns:
-            SourceSnapshot of atomman System
-        """
-        string = cls.atomman_to_dump(system, timestep, custom, **kwargs)
-        
-        # Store as a file for RAM cleanup
-        file = tempfile.TemporaryFile("r+")
-        file.write(string)
-        file.seek(0) # Return to beginning
-        
-        return cls(file).snapshots[0]
-    
     @classmethod
     def snapshot_to_atomman(cls, snapshot, *args, **kwargs):
         """
@@ -428,132 +646,291 @@ class DumpFileSource():
         elif np.any(is_single):
             ndvalue = ndvalue.flatten()
         
-        # Note: DumpFileSource does not attempt to cast to a numeric type
+        # Note: Source does not attempt to cast to a numeric type
         
         return ndvalue
-     
+    
+    def will_need(self, identifier):
+        """
+        Hint that the per-atom data of snapshot will be read soon, so that the source can start
+        reading it in the background. Does nothing by default
+        """
+        pass
+    
+    def dump_file_path(self, identifier):
+        """
+        Path of the text dump file containing snapshot, as str, so that it can be parsed by other
+        processes (see trajectory). None if the snapshot is not stored in a named text dump file
+        """
+        return None
+    
+
+
+class DumpFileSource(Source):
+    """
+    Instances of this class parse a LAMMPS dump file into snapshot objects which contain the global
+    dump data and a position handle to lookup the per-atom data in the file
+    
+    Concurrency: reads (read_snapshot_dump, read_snapshot_atoms) are safe from any number of threads
+    at once. The file is only read through its memory map, by slicing byte ranges, so no file
+    position is shared between readers. index and refresh are serialized by a lock and may run
+    while other threads read. A snapshot's byte offsets are stored before the snapshot itself, so a
+    reader never sees a snapshot it cannot locate, and a map replaced by refresh stays valid for
+    readers still holding it. The source must not be read after it is closed (garbage collected)
+    
+    ----------------------------------------------------------------------
+    Instance variables:
+        
+        file: Binary file object of dump
+        
+        buffer: Read-only memory map of file (bytes-like)
+        
+        snapshots: SnapshotTable of the SourceSnapshot objects from dump
+        
+        snapshot_seek_info: PackedRows of the byte offsets (header, per-atom data, end) of each
+            SourceSnapshot in the dump file
+        
+        indexed_offset: byte offset of file where indexing resumes
+        
+        complete: whether all (complete) snapshots in the file have been indexed
+        
+        index_path, processes, verify, follow: indexing options (see __init__)
+        
+        atoms_cache: AtomsCache of parsed per-atom data (see atoms)
+    """
+    
+    @classmethod
+    def snapshot_from_atomman(cls, system, timestep = 0, custom = None, **kwargs):
+        """
+        Create SourceSnapshot from atomman System
+        
+        Args:
+            system (Atomman System): Atomman system object
+            timestep (int): Timestep of snapshot
+            custom (dict-like): Custom data for snapshot (default None)
+            
+            **kwargs: Passed through to atomman method system.dump("atom_dump", **kwargs)
+            
+        Returns:
+            SourceSnapshot of atomman System
+        """
+        string = cls.atomman_to_dump(system, timestep, custom, **kwargs)
+        
+        # Store as a file for RAM cleanup
+        file = tempfile.TemporaryFile("w+b")
+        file.write(string.encode())
+        file.seek(0) # Return to beginning (also flushes so the file can be memory-mapped)
+        
+        return cls(file).snapshots[0]
+    
+    def will_need(self, identifier):
+        """Hint that per-atom data of snapshot will be read soon (see indexing.will_need)"""
+        
+        _, start, end = self.snapshot_seek_info[identifier]
+        
+        indexing.will_need(self.buffer, start, end)
+    
+    def dump_file_path(self, identifier):
+        """Path of dump file as str, or None if file was not opened from a path"""
+        
+        name = getattr(self.file, "name", None)
+        
+        return name if isinstance(name, str) and Path(name).is_file() else None
+    
     def read_snapshot_dump(self, identifier):
         """Get string of dump stored in file"""
         assert 0 <= identifier < len(self.snapshots), f"Invalid identifier {identifier} when attempting to read snapshot"
         # Could store these as attrs on snapshot, but that seems unclean
-        position, n_lines = self.snapshot_seek_info[identifier]
+        start, _, end = self.snapshot_seek_info[identifier]
         
-        set_position(self.file, position)
+        # Slicing the map is a positional read, so concurrent readers do not interfere
+        return self.buffer[start:end].decode()
+    
+    def read_snapshot_atoms(self, identifier, columns = None, float32 = False):
+        """
+        Parse per-atom data stored in file into column arrays (see atoms.parse_atoms). Parsed
+        columns are cached in atoms_cache, so the returned arrays are read-only
         
-        return ''.join(read_lines(self.file, n_lines))        
+        Args:
+            identifier (int): Identifier of snapshot
+            columns (iterable of str): Names of per-atom columns to parse. Other columns are skipped
+                over. If None (default), all columns are parsed
+            float32 (bool): Whether float columns are single precision (default False)
+        
+        Returns: dict of 1D arrays of length n_atoms, keyed by column name
+        """
+        assert 0 <= identifier < len(self.snapshots), f"Invalid identifier {identifier} when attempting to read snapshot"
+        
+        n_atoms = self.snapshots.n_atoms[identifier]
+        atom_data = self.snapshots.get_atom_data(identifier)
+        _, start, end = self.snapshot_seek_info[identifier]
+        
+        def parse(missing):
+            return atoms.parse_atoms(self.buffer, start, end, n_atoms, atom_data,
+                                     columns = missing, float32 = float32)
+        
+        columns = atom_data if columns is None else tuple(columns)
+        
+        return self.atoms_cache.get((identifier, float32), columns, parse)
  
     def __del__(self):
         """Close file when out of scope"""
+        if isinstance(getattr(self, "buffer", None), mmap.mmap):
+            self.buffer.close()
+        
         self.file.close()
     
-    def __init__(self, file):
+    def add_header(self, header):
+        """Append snapshot of indexing.SnapshotHeader to this source"""
+        
+        # Offsets first, so that concurrent readers can locate any snapshot in snapshots
+        self.snapshot_seek_info.append(header.seek_info)
+        self.snapshots.add_header(header)
+        
+        self.indexed_offset = header.end
+        self._last_header = header
+    
+    def index(self, n_snapshots = None):
         """
-        Parses dump file, creates Snapshot objects, and returns DumpFileSource object
+        Continue indexing the file until at least n_snapshots snapshots are indexed, or the end of
+        the file is reached
+        
+        The index is saved to index_path (if given) once the whole file is indexed
         
         Args:
-            file (str or Path): location of dump file
-        """
+            n_snapshots (int): Number of snapshots required. If None (default), index whole file
         
-        self.file = file
+        Returns: range of the identifiers (i.e. positions in snapshots) of the newly indexed
+            snapshots
+        """
         
-        self.snapshots = []
+        with self._index_lock:
+            return self._index(n_snapshots)
+    
+    def _index(self, n_snapshots):
+        """Implementation of index, called with _index_lock held"""
         
-        self.snapshot_seek_info = []
+        n_old = len(self.snapshots)
         
-        # Locals for current snapshot in loop
+        if self.complete or (n_snapshots is not None and n_old >= n_snapshots):
+            return range(n_old, n_old)
         
-        # Need to track these so we can grab dump strings from file later
-        snapshot_seek_position, snapshot_n_lines = None, 0
-        # Data for snapshot object
-        snapshot_timestep, snapshot_n_atoms, snapshot_box = None, None, None
-        custom_snapshot_items = {}
-
-        # Tracked for error reporting
-        curr_line_position = 0
-
-        def readline():
-            # Readline but increment counters
-            nonlocal snapshot_n_lines, curr_line_position
-            snapshot_n_lines += 1
-            curr_line_position += 1
-            return self.file.readline()
-        
-        current_line = None
-        
-        while True:
-            if snapshot_seek_position == None:
-                snapshot_seek_position = get_position(self.file)
-
-            line = current_line or readline()
-            current_line = None
-            
-            if not line:
-                break
+        if n_snapshots is None and self.processes != 1:
+            for header in indexing.scan_dump_parallel(self.buffer, self.file.name,
+                                                      self.indexed_offset, self.processes,
+                                                      self.verify, self.follow):
+                self.add_header(header)
             
+            self.complete = True
+        else:
+            # Scanned in batches, so that only a batch of SnapshotHeader objects exists at once
+            while not self.complete and (n_snapshots is None or len(self.snapshots) < n_snapshots):
+                batch = INDEX_BATCH if n_snapshots is None else min(INDEX_BATCH, n_snapshots - len(self.snapshots))
+                
+                headers = indexing.scan_dump(self.buffer, self.indexed_offset, verify = self.verify,
+                                             previous = self._last_header, max_snapshots = batch,
+                                             complete_only = self.follow)
+                
+                for header in headers:
+                    self.add_header(header)
+                
+                self.complete = len(headers) < batch
+        
+        if self.complete and len(self.snapshots) > n_old and self.index_path is not None:
+            index_cache.save_index(self.index_path, self.buffer, self.file, self.snapshots,
+                                   self.snapshot_seek_info, self.indexed_offset)
+        
+        return range(n_old, len(self.snapshots))
+    
+    def refresh(self):
+        """
+        For sources following a dump file (follow = True), index snapshots completed since the file
+        was last indexed. Only data written since then is read
+        
+        Returns: range of the identifiers of the newly indexed snapshots (see index)
+        """
+        
+        assert self.follow, "Source is not following its file"
+        
+        with self._index_lock:
+            size = os.fstat(self.file.fileno()).st_size
             
-            item_match = self.item_pattern.match(line)
+            if size < len(self.buffer):
+                raise RuntimeError("Dump file was truncated while being followed")
             
-            assert item_match, f"Dump format error at line {curr_line_position}"
+            if size > len(self.buffer):
+                # Previous map is left to be garbage collected rather than closed, since concurrent
+                # readers may still be slicing it
+                self.buffer = indexing.map_file(self.file)
+                self.complete = False
             
-            sep_items = self.sep_pattern.findall(item_match.group(1))
+            return self._index(None)
+    
+    def __init__(self, file, index_path = None, processes = 1, verify = False, lazy = False,
+                 follow = False, cache_bytes = atoms.DEFAULT_CACHE_BYTES):
+        """
+        Indexes dump file, creates Snapshot objects, and returns DumpFileSource object
+        
+        The file is memory-mapped and snapshots are located with byte searches (see indexing), so
+        per-atom data is never read while indexing
+        
+        Args:
+            file (binary file object): opened dump file
+            index_path (str or Path): Path of index file to load the index from and save it to
+                (see index_cache). If None (default), the dump file is always fully indexed
+            processes (int): Maximum number of worker processes used for indexing, where None
+                means one per CPU. Workers open the file by name, so file must have been opened
+                from a path. Small files are always indexed serially (default 1)
+            verify (bool): Whether to count the per-atom lines of each snapshot while indexing and
+                raise an error if they do not match its number of atoms. Otherwise, per-atom data is
+                only searched for the next item (default False)
+            lazy (bool): Whether to defer indexing until index is called. Snapshots loaded from
+                index_path are still available immediately (default False)
+            follow (bool): Whether the file is still being written. An incomplete final snapshot is
+                then ignored instead of raising an error, and refresh can be called to index
+                snapshots as they are completed (default False)
+            cache_bytes (int): Byte budget of the cache of parsed per-atom data, atoms_cache
+                (default atoms.DEFAULT_CACHE_BYTES, i.e. 256 MiB)
+        """
+        
+        self.file = file
+        
+        self.buffer = indexing.map_file(file)
+        
+        self.snapshots = SnapshotTable(self)
+        
+        self.snapshot_seek_info = PackedRows("q", 3)
+        
+        self.atoms_cache = atoms.AtomsCache(cache_bytes)
+        
+        self.index_path = index_path
+        self.processes = processes
+        self.verify = verify
+        self.follow = follow
+        
+        # Byte offset where indexing resumes, and whether there is nothing left to index
+        self.indexed_offset = 0
+        self.complete = False
+        
+        # Only the byte layout of the last indexed snapshot is needed to scan on (see
+        # indexing.skip_atoms), so no other SnapshotHeader is kept
+        self._last_header = None
+        
+        # Serializes indexing (index, refresh); reads need no lock
+        self._index_lock = threading.Lock()
+        
+        if index_path is not None:
+            self.indexed_offset = index_cache.load_index(index_path, self.buffer, file,
+                                                         self.snapshots, self.snapshot_seek_info)
             
-            item_str = sep_items[0]
-                        
-            if item_str == self.atoms_item_str:
-                # atoms_item_str comes last, so collect data and create Snapshot object
-                assert snapshot_timestep is not None, f"Missing timestep header info at line {curr_line_position}"
-                assert snapshot_n_atoms is not None, f"Missing natoms header info at line {curr_line_position}"
-                assert snapshot_box is not None, f"Missing box header info at line {curr_line_position}"
-                
-                snapshot_n_lines += snapshot_n_atoms
-                
-                new_snapshot = SourceSnapshot(self, len(self.snapshots), snapshot_timestep,
-                                              snapshot_n_atoms, sep_items[1:], snapshot_box, custom_snapshot_items)
-                
-                self.snapshots.append(new_snapshot)
-                self.snapshot_seek_info.append([snapshot_seek_position, snapshot_n_lines])
-                
-                # Skip past atomic data
-                jump_lines(self.file, snapshot_n_atoms)
-                
-                # Reset locals
-                custom_snapshot_items = {}
-                snapshot_seek_position, snapshot_n_lines = None, 0
-                snapshot_timestep, snapshot_n_atoms, snapshot_box = None, None, None
-            elif item_str == self.timestep_item_str:
-                snapshot_timestep = int(readline().strip())
-            elif len(sep_items) > 1 and (' ').join(sep_items[0:2]) == self.box_item_str:
-                line1, line2, line3 = readline(), readline(), readline()
-                                
-                x_data = self.sep_pattern.findall(line1)
-                y_data = self.sep_pattern.findall(line2)
-                z_data = self.sep_pattern.findall(line3)
-                
-                snapshot_box = SourceBox(sep_items[5:], x_data, y_data, z_data)
-                
-            elif len(sep_items) == 3 and (' ').join(sep_items[0:3]) == self.n_atoms_item_str:
-                snapshot_n_atoms = int(readline().strip())
-            else:
-                # Parsing for custom item occurs if item is not recognized as built-in
-                item_name = ' '.join(sep_items)
-                lines = []
-                
-                while True:
-                    current_line = readline()
-                    
-                    if self.item_pattern.match(current_line) is not None:
-                        break
-                    elif not current_line:
-                        # dumps should always end with per-atom data
-                        raise RuntimeError(f"Unexpected EOF during custom item {item_name} parsing")
-                    
-                    
-                    lines.append(current_line)
-                
-                if not lines: # Empty data is not allowed
-                    raise RuntimeError("Missing data for custom item {item_name}")
-                
-                # Parse
-                custom_snapshot_items[item_name] = type(self).parse_custom_data(lines)
-                
+            if len(self.snapshots) > 0:
+                offset, atoms_offset, end = self.snapshot_seek_info[-1]
                 
+                self._last_header = indexing.SnapshotHeader(offset, atoms_offset, end,
+                                                            self.snapshots.timestep[-1],
+                                                            self.snapshots.n_atoms[-1],
+                                                            self.snapshots.get_atom_data(-1),
+                                                            None, None, None)
+        
+        if not lazy:
+            self.index()
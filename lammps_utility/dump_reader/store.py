@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Internal module of dump_reader implementing the columnar snapshot store
+
+A store is a directory holding the snapshots of a Snapshots object in binary form:
+
+    store.json          atom_data, column dtypes, box boundary conditions and custom data
+    offsets.npy         (N + 1) int64, first per-atom row of each snapshot (and total rows)
+    timesteps.npy       (N) int64
+    box_bounds.npy      (N, 3, 2) float64
+    box_tri.npy         (N, 3) float64
+    atoms_<i>.npy       per-atom column i of atom_data for all snapshots, one row per atom
+
+Per-atom columns are memory-mapped when a store is opened, so reading a snapshot is a slice of each
+column without any parsing.
+"""
+
+from pathlib import Path
+import json
+import numpy as np
+
+from .sources import Source, SourceSnapshot, SourceBox
+
+STORE_VERSION = 1
+META_NAME = "store.json"
+
+# Minimum width of string columns, since the widest string is only known after writing
+MIN_STRING_WIDTH = 16
+
+def column_path(path, i):
+    """Path of per-atom column i of store"""
+    return Path(path) / f"atoms_{i}.npy"
+
+def write_store(snapshots, path, allow_overwrite = False, float32 = False, ignore_custom = False):
+    """
+    Write snapshots to a store, one snapshot at a time
+
+    Args:
+        snapshots (Snapshots): Snapshots to write, which must all have the same atom_data
+        path (str or Path): Path of store directory
+        allow_overwrite (bool): Whether to write into an existing directory (default False)
+        float32 (bool): Whether to store float columns in single precision (default False)
+        ignore_custom (bool): Whether to leave out custom data (default False)
+    """
+
+    path = Path(path)
+    path.mkdir(parents = True, exist_ok = allow_overwrite)
+
+    n_atoms = np.asarray(snapshots.n_atoms, dtype = np.int64)
+    offsets = np.concatenate(([0], np.cumsum(n_atoms)))
+
+    atom_data = snapshots[0].atom_data if len(snapshots) > 0 else ()
+
+    meta = {
+        "version": STORE_VERSION,
+        "atom_data": list(atom_data),
+        "dtypes": []
+    }
+
+    columns = None
+
+    for i, snapshot in enumerate(snapshots):
+        if snapshot.atom_data != atom_data:
+            raise RuntimeError(f"Snapshot {i} has per-atom data {snapshot.atom_data}, but snapshots in "
+                               f"a store must all have {atom_data}")
+
+        parsed = snapshot.atoms(float32 = float32)
+
+        if columns is None:
+            # Column dtypes are those of the first snapshot
+            columns = []
+
+            for j, name in enumerate(atom_data):
+                dtype = parsed[name].dtype
+
+                if dtype.kind == "U":
+                    dtype = np.dtype(f"U{max(MIN_STRING_WIDTH, dtype.itemsize // 4)}")
+
+                meta["dtypes"].append(dtype.str)
+                columns.append(np.lib.format.open_memmap(column_path(path, j), mode = "w+",
+                                                         dtype = dtype, shape = (int(offsets[-1]),)))
+
+        for name, column in zip(atom_data, columns):
+            values = parsed[name]
+
+            if values.dtype.kind == "U" and values.dtype.itemsize > column.dtype.itemsize:
+                raise RuntimeError(f"String in per-atom data {name} of snapshot {i} is longer than "
+                                   f"{column.dtype.itemsize // 4} characters")
+
+            column[offsets[i]:offsets[i + 1]] = values
+
+    for column in columns or []:
+        column.flush()
+
+    np.save(path / "offsets.npy", offsets)
+
+    save_tables(path, snapshots, meta, ignore_custom)
+
+    # Written last, so that an incompletely written store cannot be opened
+    with open(path / META_NAME, "w") as f:
+        json.dump(meta, f)
+
+def save_tables(path, snapshots, meta, ignore_custom = False):
+    """
+    Save global data of snapshots (timesteps, boxes and custom data) to a store directory. Box
+    boundary conditions and custom data are added to the dict meta (as "box_BC" and "custom")
+    """
+
+    np.save(path / "timesteps.npy", np.asarray(snapshots.timesteps, dtype = np.int64))
+    np.save(path / "box_bounds.npy", np.asarray(snapshots.boxes.bounds, dtype = float).reshape(-1, 3, 2))
+    np.save(path / "box_tri.npy", np.asarray(snapshots.boxes.tri, dtype = float).reshape(-1, 3))
+
+    meta["box_BC"] = []
+    meta["custom"] = []
+
+    for snapshot in snapshots:
+        meta["box_BC"].append(["".join(BC) for BC in snapshot.box.BC])
+
+        custom = {} if ignore_custom else snapshot.custom
+        meta["custom"].append({key: Source.custom_value_to_dump(value).split("\n")
+                               for key, value in custom.items()})
+
+def load_snapshots(source, path, meta, n_atoms):
+    """
+    Create SourceSnapshot objects of source from global data saved by save_tables
+
+    Args:
+        source (Source): Source of snapshots
+        path (Path): Path of store directory
+        meta (dict): Metadata of store, including atom_data
+        n_atoms (sequence of int): Number of atoms of each snapshot
+
+    Returns: list of SourceSnapshot
+    """
+
+    timesteps = np.load(path / "timesteps.npy")
+    bounds = np.load(path / "box_bounds.npy")
+    tri = np.load(path / "box_tri.npy")
+
+    snapshots = []
+
+    for i, (BC, custom_lines) in enumerate(zip(meta["box_BC"], meta["custom"])):
+        box = SourceBox(BC, *(list(bounds[i, axis]) + [tri[i, axis]] for axis in range(3)))
+
+        custom = {name: source.parse_custom_data(lines) for name, lines in custom_lines.items()}
+
+        snapshots.append(SourceSnapshot(source, i, int(timesteps[i]), int(n_atoms[i]),
+                                        meta["atom_data"], box, custom))
+
+    return snapshots
+
+def atoms_to_dump(atom_data, columns):
+    """
+    Format per-atom data as the ITEM: ATOMS section of a LAMMPS dump
+
+    Args:
+        atom_data (tuple of str): Per-atom column names
+        columns (dict): 1D arrays of per-atom data keyed by atom_data
+
+    Returns: str
+    """
+
+    # Shortest representations which read back as the same values
+    strings = [columns[name].astype(str) for name in atom_data]
+
+    lines = "".join(" ".join(row) + "\n" for row in zip(*strings))
+
+    return f"{Source.item_str}{Source.atoms_item_str} {' '.join(atom_data)}\n{lines}"
+
+
+class StoreSource(Source):
+    """
+    Instances of this class open a store (see module docstring) into snapshot objects, whose per-atom
+    data are slices of the memory-mapped columns of the store
+
+    ----------------------------------------------------------------------
+    Instance variables:
+
+        path: Path of store directory
+
+        atom_data: Headers of per-atom data of all snapshots
+
+        columns: dict of memory-mapped per-atom columns of all snapshots, keyed by atom_data
+
+        offsets: (N + 1) int array of the first per-atom row of each snapshot in columns
+
+        snapshots: list containing SourceSnapshot objects from store
+    """
+
+    def __init__(self, path):
+        """
+        Open store and create Snapshot objects
+
+        Args:
+            path (str or Path): Path of store directory
+        """
+
+        self.path = Path(path)
+
+        with open(self.path / META_NAME, "r") as f:
+            meta = json.load(f)
+
+        if meta.get("version") != STORE_VERSION:
+            raise RuntimeError(f"Unsupported store version {meta.get('version')}")
+
+        self.atom_data = tuple(meta["atom_data"])
+
+        self.columns = {name: np.load(column_path(self.path, i), mmap_mode = "r")
+                        for i, name in enumerate(self.atom_data)}
+
+        self.offsets = np.load(self.path / "offsets.npy")
+
+        self.snapshots = load_snapshots(self, self.path, meta, np.diff(self.offsets))
+
+    def read_snapshot_atoms(self, identifier, columns = None, float32 = False):
+        """
+        Get per-atom data of snapshot as read-only views of the store columns. Float columns are
+        only copied if float32 does not match the precision they are stored in
+
+        Args:
+            identifier (int): Identifier of snapshot
+            columns (iterable of str): Names of per-atom columns. If None (default), all columns
+            float32 (bool): Whether float columns are single precision (default False)
+
+        Returns: dict of 1D arrays of length n_atoms, keyed by column name
+        """
+        assert 0 <= identifier < len(self.snapshots), f"Invalid identifier {identifier} when attempting to read snapshot"
+
+        start, end = self.offsets[identifier], self.offsets[identifier + 1]
+
+        float_dtype = np.dtype(np.float32 if float32 else np.float64)
+
+        values = {}
+
+        for name in (self.atom_data if columns is None else columns):
+            assert name in self.columns, f"No per-atom data {name}, expected one of {self.atom_data}"
+
+            column = self.columns[name][start:end].view(np.ndarray)
+
+            if column.dtype.kind == "f" and column.dtype != float_dtype:
+                column = column.astype(float_dtype)
+                column.setflags(write = False)
+
+            values[name] = column
+
+        return values
+
+    def read_snapshot_dump(self, identifier):
+        """Get string of snapshot in LAMMPS dump format"""
+
+        snapshot = self.snapshots[identifier]
+
+        # Float columns in the precision they are stored in, so they are formatted as written
+        float32 = any(column.dtype == np.float32 for column in self.columns.values())
+
+        columns = self.read_snapshot_atoms(identifier, float32 = float32)
+
+        return self.get_snapshot_dump_header(snapshot) + atoms_to_dump(self.atom_data, columns)
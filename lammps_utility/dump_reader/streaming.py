@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Internal module of dump_reader for reading a dump file in one sequential pass
+
+iter_dump reads a dump file from start to end in chunks and yields a Frame for each snapshot, without
+creating any Snapshot objects. Consumed data is discarded, so only the current chunk and the current
+snapshot are in memory, however many snapshots the dump has. The file is never read backwards, so
+gzip-compressed dumps are simply decompressed as they are read.
+"""
+
+import gzip
+
+from .sources import Source, SourceBox
+from .common import attempt_cast_string
+from . import indexing, atoms, gzipped
+
+# Bytes read from the file at a time
+READ_BYTES = 1 << 22
+
+class Frame:
+    """
+    Global and per-atom data of one snapshot, as yielded by iter_dump
+
+    ----------------------------------------------------------------------
+    Instance variables:
+
+        timestep (int)
+
+        n_atoms (int)
+
+        box_bounds: (3, 2) float array of (lo, hi) bounds of each dimension
+
+        box_tri: (3) float array of tilt factors (xy, xz, yz), all zero if box is not triclinic
+
+        box_BC: (3, 2) str array of boundary conditions
+
+        custom (dict): Custom data, cast to numbers where possible
+
+        atoms (dict): 1D arrays of per-atom data keyed by column name (see atoms.parse_atoms)
+    """
+
+    __slots__ = ("timestep", "n_atoms", "box_bounds", "box_tri", "box_BC", "custom", "atoms")
+
+    def __init__(self, timestep, n_atoms, box_bounds, box_tri, box_BC, custom, atoms):
+        self.timestep = timestep
+        self.n_atoms = n_atoms
+        self.box_bounds = box_bounds
+        self.box_tri = box_tri
+        self.box_BC = box_BC
+        self.custom = custom
+        self.atoms = atoms
+
+    def __str__(self):
+        return f"Frame: timestep {self.timestep}, {self.n_atoms} atoms, columns {tuple(self.atoms)}"
+
+    __repr__ = __str__
+
+def make_frame(buffer, header, columns = None, float32 = False):
+    """Create Frame of the snapshot of SnapshotHeader header in buffer, parsing its per-atom data"""
+
+    box = SourceBox(header.box_BC, *header.box_data)
+
+    custom = {name: attempt_cast_string(Source.parse_custom_data(lines))
+              for name, lines in header.custom.items()}
+
+    parsed = atoms.parse_atoms(buffer, header.atoms_offset, header.end, header.n_atoms,
+                               header.atom_data, columns = columns, float32 = float32)
+
+    return Frame(header.timestep, header.n_atoms, box.bounds, box.tri, box.BC, custom, parsed)
+
+def iter_dump(path, columns = None, float32 = False, verify = False, read_bytes = READ_BYTES):
+    """
+    Read a dump file sequentially and yield a Frame for each snapshot
+
+    Args:
+        path (str or Path): Path of text dump file, which may be gzip-compressed
+        columns (iterable of str): Names of per-atom columns to parse. If None (default), all
+            columns are parsed
+        float32 (bool): Whether float columns are single precision (default False)
+        verify (bool): Whether to verify the number of per-atom lines (see indexing.scan_snapshot)
+        read_bytes (int): Bytes read from the file at a time (default READ_BYTES)
+
+    Yields: Frame
+    """
+
+    with open(path, "rb") as f:
+        compressed = gzipped.is_gzip(f)
+
+    buffer = bytearray()
+    previous = None
+
+    # Incomplete snapshots are only scanned again once the buffer has grown by half, so that a huge
+    # snapshot is not scanned once per read
+    scan_size = 0
+
+    with (gzip.open if compressed else open)(path, "rb") as f:
+        while True:
+            data = f.read(read_bytes)
+            buffer += data
+
+            if data and len(buffer) < scan_size:
+                continue
+
+            headers = indexing.scan_dump(buffer, previous = previous, verify = verify,
+                                         complete_only = bool(data))
+
+            for header in headers:
+                yield make_frame(buffer, header, columns, float32)
+
+            if headers:
+                previous = headers[-1]
+                del buffer[:previous.end]
+                scan_size = 0
+            else:
+                scan_size = len(buffer) * 3 // 2
+
+            if not data:
+                break
@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""
+Internal module of dump_reader for reading per-atom data of many snapshots as one array
+
+stack_snapshots reads snapshots into one array. Snapshots are parsed by worker processes, which open
+the dump files by name and write their frames straight into the output, so per-atom data never
+passes through the parent process when the output is a memory-mapped .npy file or a shared memory
+block.
+
+TrajectoryArray is an array-like view of snapshots which only parses the snapshots and columns
+needed by each indexing operation.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import os
+import numpy as np
+
+from . import atoms, indexing
+from .common import readonly
+
+# Number of tasks per worker process, to balance load between workers
+TASKS_PER_PROCESS = 4
+
+class FrameTask:
+    """Location of per-atom data of a snapshot, and its frame in the output"""
+
+    __slots__ = ("frame", "path", "start", "end", "n_atoms", "atom_data")
+
+    def __init__(self, frame, path, start, end, n_atoms, atom_data):
+        self.frame = frame
+        self.path = path
+        self.start = start
+        self.end = end
+        self.n_atoms = n_atoms
+        self.atom_data = atom_data
+
+def parse_frame(buffer, task, columns, sort, dtype):
+    """
+    Parse per-atom data of a snapshot into a (n_atoms, len(columns)) array
+
+    Args:
+        buffer (bytes-like): Dump file contents
+        task (FrameTask): Location of per-atom data
+        columns (tuple of str): Names of columns
+        sort (bool): Whether to sort atoms by id
+        dtype (dtype): dtype of frame
+
+    Returns: ndarray
+    """
+
+    parse_columns = columns + ("id",) if sort and "id" not in columns else columns
+
+    parsed = atoms.parse_atoms(buffer, task.start, task.end, task.n_atoms, task.atom_data,
+                               columns = parse_columns, float32 = dtype == np.float32)
+
+    return frame_from_columns(parsed, columns, sort, dtype)
+
+def frame_from_columns(parsed, columns, sort, dtype):
+    """Stack dict of parsed column arrays into a (n_atoms, len(columns)) array"""
+
+    frame = np.empty((len(parsed[columns[0]]), len(columns)), dtype = dtype)
+
+    order = np.argsort(parsed["id"], kind = "stable") if sort else slice(None)
+
+    for i, name in enumerate(columns):
+        frame[:, i] = parsed[name][order]
+
+    return frame
+
+def open_output(out, shape, dtype, create = False):
+    """
+    Open output array
+
+    Args:
+        out (tuple): ("npy", path) for a memory-mapped .npy file or ("shm", name) for a shared memory
+            block
+        shape (tuple of int): Shape of output
+        dtype (dtype): dtype of output
+        create (bool): Whether to create .npy file (default False)
+
+    Returns: (ndarray, handle) where handle is a SharedMemory object which must be closed once the
+        array is no longer used, or None
+    """
+
+    kind, location = out
+
+    if kind == "npy":
+        mode = "w+" if create else "r+"
+        return np.lib.format.open_memmap(location, mode = mode, dtype = dtype, shape = shape), None
+
+    shm = shared_memory.SharedMemory(name = location)
+
+    return np.ndarray(shape, dtype = dtype, buffer = shm.buf), shm
+
+def stack_worker(tasks, columns, sort, dtype, shape, out):
+    """
+    Parse snapshots in a worker process
+
+    Args:
+        tasks (list of FrameTask): Snapshots to parse
+        columns, sort, dtype: See parse_frame
+        shape (tuple of int): Shape of output
+        out (tuple): See open_output. If None, the frames are returned instead
+
+    Returns: list of (frame index, ndarray) if out is None, otherwise an empty list
+    """
+
+    buffers = {}
+    frames = []
+
+    if out is not None:
+        array, shm = open_output(out, shape, dtype)
+
+    try:
+        for task in tasks:
+            if task.path not in buffers:
+                with open(task.path, "rb") as f:
+                    buffers[task.path] = indexing.map_file(f)
+
+            frame = parse_frame(buffers[task.path], task, columns, sort, dtype)
+
+            if out is None:
+                frames.append((task.frame, frame))
+            else:
+                array[task.frame] = frame
+    finally:
+        if out is not None:
+            if shm is None:
+                array.flush()
+
+            del array
+
+            if shm is not None:
+                shm.close()
+
+    return frames
+
+def split_tasks(tasks, n_groups):
+    """Split tasks into at most n_groups lists of consecutive tasks"""
+
+    size = -(-len(tasks) // n_groups)
+
+    return [tasks[i:i + size] for i in range(0, len(tasks), size)]
+
+def get_n_atoms(snapshots, columns, sort):
+    """
+    Get common number of atoms of snapshots, checking that they all contain columns (and id if sort)
+    """
+
+    assert len(columns) > 0, "No columns given"
+
+    n_atoms = {snapshot.n_atoms for snapshot in snapshots}
+
+    if len(n_atoms) > 1:
+        raise RuntimeError(f"Snapshots have different numbers of atoms: {sorted(map(int, n_atoms))}")
+
+    for snapshot in snapshots:
+        for name in columns + (("id",) if sort else ()):
+            assert name in snapshot.atom_data, f"No per-atom data {name} at timestep {snapshot.timestep}"
+
+    return int(n_atoms.pop()) if n_atoms else 0
+
+def stack_snapshots(snapshots, columns, sort = False, float32 = False, processes = None,
+                    out = None):
+    """
+    Read per-atom columns of snapshots into a (n_snapshots, n_atoms, len(columns)) array
+
+    Args:
+        snapshots (sequence of Snapshot): Snapshots to read, which must have the same number of atoms
+        columns (iterable of str): Names of per-atom columns to read
+        sort (bool): Whether to sort atoms of each snapshot by id (default False)
+        float32 (bool): Whether output is single precision, otherwise double (default False)
+        processes (int): Maximum number of worker processes, where None (default) means one per CPU.
+            Snapshots whose source is not a named text dump file are read by the calling process
+        out (None, str, Path or SharedMemory): Where to store the output. If None (default), in a new
+            array. If a path, in a memory-mapped .npy file created there. If a SharedMemory block
+            (which must be large enough), in that block
+
+    Returns: ndarray, which is a view of out if out is a SharedMemory block
+    """
+
+    columns = tuple(columns)
+    dtype = np.dtype(np.float32 if float32 else np.float64)
+
+    shape = (len(snapshots), get_n_atoms(snapshots, columns, sort), len(columns))
+
+    # Output
+    if out is None:
+        array = np.empty(shape, dtype = dtype)
+        out_spec = None
+    elif isinstance(out, shared_memory.SharedMemory):
+        assert out.size >= np.prod(shape) * dtype.itemsize, "Shared memory block is too small"
+        array = np.ndarray(shape, dtype = dtype, buffer = out.buf)
+        out_spec = ("shm", out.name)
+    else:
+        array, _ = open_output(("npy", str(out)), shape, dtype, create = True)
+        out_spec = ("npy", str(out))
+
+    # Snapshots of named text dump files are parsed by workers, others in this process
+    tasks = []
+    local = []
+
+    for frame, snapshot in enumerate(snapshots):
+        source = snapshot.source
+        name = source.dump_file_path(snapshot.identifier)
+
+        if name is not None:
+            _, start, end = source.snapshot_seek_info[snapshot.identifier]
+            tasks.append(FrameTask(frame, name, start, end, snapshot.n_atoms, snapshot.atom_data))
+        else:
+            local.append((frame, snapshot))
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    processes = min(processes, len(tasks))
+
+    if processes > 1:
+        with ProcessPoolExecutor(processes) as executor:
+            futures = [executor.submit(stack_worker, group, columns, sort, dtype, shape, out_spec)
+                       for group in split_tasks(tasks, processes * TASKS_PER_PROCESS)]
+
+            for future in futures:
+                for frame, values in future.result():
+                    array[frame] = values
+    else:
+        # Through the source, which caches parsed columns
+        local = [(task.frame, snapshots[task.frame]) for task in tasks] + local
+
+    for frame, snapshot in local:
+        parse_columns = columns + ("id",) if sort and "id" not in columns else columns
+        parsed = snapshot.atoms(columns = parse_columns, float32 = float32)
+
+        array[frame] = frame_from_columns(parsed, columns, sort, dtype)
+
+    if isinstance(array, np.memmap):
+        array.flush()
+
+    return array
+
+
+def reduce_index(index, size):
+    """
+    Reduce index of one axis to the positions which must be read, and the index of those positions
+    which is equivalent to index
+
+    Args:
+        index (int, slice, or array-like of int or bool): Index of axis
+        size (int): Length of axis
+
+    Returns: (positions, index) where positions is a sorted int array
+    """
+
+    if isinstance(index, (int, np.integer)):
+        if not -size <= index < size:
+            raise IndexError(f"Index {index} is out of bounds for axis with size {size}")
+
+        return np.array([index % size]), 0
+
+    if isinstance(index, slice):
+        return np.arange(size)[index], slice(None)
+
+    positions = np.arange(size)[np.asarray(index)]
+    unique, inverse = np.unique(positions, return_inverse = True)
+
+    return unique, inverse.reshape(positions.shape)
+
+class TrajectoryArray:
+    """
+    Read-only array-like object of shape (n_snapshots, n_atoms, n_columns) containing per-atom data
+    of snapshots, which is parsed from the source only when indexed. Indexing supports integers,
+    slices, integer arrays and boolean masks (with NumPy semantics), and np.asarray reads the whole
+    array
+
+    Only the snapshots and columns an index selects are parsed, and per-atom rows are selected
+    snapshot by snapshot, so memory is only needed for the selected snapshots, atoms and columns
+    rather than whole snapshots. Parsed columns are cached
+    by the sources of the snapshots (see atoms.AtomsCache), so nearby indexing operations reuse them
+
+    ----------------------------------------------------------------------
+    Instance variables (readonly):
+
+    snapshots (tuple)
+        Snapshot objects of each frame
+
+    columns (tuple of str)
+        Names of per-atom columns
+
+    sort (bool)
+        Whether the atoms of each snapshot are sorted by id
+
+    shape (tuple of int), dtype, ndim
+        As for ndarray
+    """
+
+    snapshots = readonly()
+    columns = readonly()
+    sort = readonly()
+    shape = readonly()
+    dtype = readonly()
+
+    ndim = 3
+
+    def __init__(self, snapshots, columns, sort = False, float32 = False):
+        """
+        Create trajectory array
+
+        Args:
+            snapshots (sequence of Snapshot): Snapshots of each frame, which must have the same
+                number of atoms
+            columns (iterable of str): Names of per-atom columns
+            sort (bool): Whether to sort atoms of each snapshot by id (default False)
+            float32 (bool): Whether array is single precision, otherwise double (default False)
+        """
+
+        self.snapshots = tuple(snapshots)
+        self.columns = tuple(columns)
+        self.sort = sort
+        self.dtype = np.dtype(np.float32 if float32 else np.float64)
+
+        n_atoms = get_n_atoms(self.snapshots, self.columns, sort)
+        self.shape = (len(self.snapshots), n_atoms, len(self.columns))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __str__(self):
+        return (f"TrajectoryArray of {self.shape[0]} snapshots, {self.shape[1]} atoms and columns "
+                f"{self.columns}")
+
+    __repr__ = __str__
+
+    def read_frame(self, frame, columns, rows):
+        """Read (len(rows), len(columns)) array of per-atom data of a snapshot"""
+
+        snapshot = self.snapshots[frame]
+
+        names = tuple(self.columns[i] for i in columns)
+        parsed = snapshot.atoms(columns = names + (("id",) if self.sort else ()),
+                                float32 = self.dtype == np.float32)
+
+        if self.sort:
+            rows = np.argsort(parsed["id"], kind = "stable")[rows]
+
+        values = np.empty((len(rows), len(names)), dtype = self.dtype)
+
+        for i, name in enumerate(names):
+            values[:, i] = parsed[name][rows]
+
+        return values
+
+    def __getitem__(self, key):
+        """Parse the snapshots, atoms and columns selected by key into an ndarray"""
+
+        if not isinstance(key, tuple):
+            key = (key,)
+
+        if any(index is None for index in key):
+            raise IndexError("np.newaxis is not supported; apply it to the result instead")
+
+        n_ellipses = sum(index is Ellipsis for index in key)
+
+        if n_ellipses > 1:
+            raise IndexError("An index can only have a single ellipsis")
+
+        if n_ellipses == 1:
+            i = next(i for i, index in enumerate(key) if index is Ellipsis)
+            key = key[:i] + (slice(None),) * (self.ndim - len(key) + 1) + key[i + 1:]
+
+        if len(key) > self.ndim:
+            raise IndexError(f"Too many indices for array with {self.ndim} dimensions")
+
+        key = key + (slice(None),) * (self.ndim - len(key))
+
+        # Read only the positions selected on each axis, then apply the equivalent index to them
+        (frames, frame_index), (rows, row_index), (columns, column_index) = (
+            reduce_index(index, size) for index, size in zip(key, self.shape))
+
+        values = np.empty((len(frames), len(rows), len(columns)), dtype = self.dtype)
+
+        for i, frame in enumerate(frames):
+            values[i] = self.read_frame(frame, columns, rows)
+
+        return values[frame_index, row_index, column_index]
+
+    def __array__(self, dtype = None, copy = None):
+        """Read whole array"""
+
+        values = self[:]
+
+        return values if dtype is None else values.astype(dtype, copy = False)
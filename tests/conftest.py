@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Shared fixtures of the dump_reader tests, which write small LAMMPS dump files
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+def dump_text(timesteps, n_atoms = 10, custom = None, seed = 0):
+    """
+    Text of a LAMMPS dump with one snapshot per timestep
+
+    Args:
+        timesteps (iterable of int): Timestep of each snapshot
+        n_atoms (int): Number of atoms of each snapshot (default 10)
+        custom (dict): Custom items, keyed by name, of a list of the value (str) of each snapshot
+        seed (int): Seed of the random per-atom data (default 0)
+
+    Returns: list of str, the text of each snapshot
+    """
+
+    rng = np.random.default_rng(seed)
+    custom = custom or {}
+
+    snapshots = []
+
+    for i, timestep in enumerate(timesteps):
+        lines = [f"ITEM: TIMESTEP\n{timestep}\n", f"ITEM: NUMBER OF ATOMS\n{n_atoms}\n"]
+        lines += [f"ITEM: {name}\n{values[i]}\n" for name, values in custom.items()]
+        lines.append("ITEM: BOX BOUNDS xy xz yz pp pp pp\n-10 10 0.1\n-20 20 0\n-5 5 0\n")
+        lines.append("ITEM: ATOMS id type x y z\n")
+        lines += [f"{j + 1} {j % 3 + 1} {x:.6f} {y:.6f} {z:.6f}\n"
+                  for j, (x, y, z) in enumerate(rng.random((n_atoms, 3)) * 10)]
+
+        snapshots.append("".join(lines))
+
+    return snapshots
+
+def pad_atoms(text, width):
+    """Pad each per-atom line of the text of one snapshot (see dump_text) with width spaces"""
+
+    header, atoms = text.split("ITEM: ATOMS id type x y z\n")
+    atoms = "".join(line + " " * width + "\n" for line in atoms.splitlines())
+
+    return header + "ITEM: ATOMS id type x y z\n" + atoms
+
+def write_shuffled_dump(path, n_atoms, seed = 0):
+    """
+    Write a dump with one snapshot per entry of n_atoms, whose atoms are in random order and whose
+    ids and image flags need up to 8 bytes. Returns the per-atom data of each snapshot sorted by id
+    """
+
+    rng = np.random.default_rng(seed)
+    ids = rng.choice(1 << 40, max(n_atoms), replace = False)
+
+    texts = []
+    expected = []
+
+    for timestep, n in enumerate(n_atoms):
+        order = rng.permutation(n)
+        atoms = {"id": ids[:n][order], "type": rng.integers(1, 4, n),
+                 "ix": rng.integers(-(1 << 40), 1 << 40, n) * (timestep % 3 - 1),
+                 "x": np.round(rng.random(n) * 200 - 100, 6)}
+
+        lines = [f"{i} {t} {ix} {x:.6f}\n" for i, t, ix, x in zip(*atoms.values())]
+        texts.append(f"ITEM: TIMESTEP\n{timestep}\nITEM: NUMBER OF ATOMS\n{n}\n"
+                     "ITEM: BOX BOUNDS pp pp pp\n-100 100\n-100 100\n-100 100\n"
+                     f"ITEM: ATOMS id type ix x\n{''.join(lines)}")
+
+        by_id = np.argsort(atoms["id"])
+        expected.append({name: values[by_id] for name, values in atoms.items()})
+
+    path.write_text("".join(texts))
+
+    return expected
+
+def assert_snapshots_equal(snapshots, expected, custom = True):
+    """
+    Assert that two sequences of snapshot objects hold the same global and per-atom data
+
+    Args:
+        snapshots (iterable of Snapshot): Snapshot objects to check
+        expected (iterable of Snapshot): Snapshot objects with the expected data
+        custom (bool): Whether to compare custom data (default True)
+    """
+
+    snapshots, expected = list(snapshots), list(expected)
+
+    assert len(snapshots) == len(expected)
+
+    for snapshot, other in zip(snapshots, expected):
+        assert snapshot.timestep == other.timestep
+        assert snapshot.n_atoms == other.n_atoms
+        assert np.array_equal(snapshot.box.bounds, other.box.bounds)
+        assert np.array_equal(snapshot.box.tri, other.box.tri)
+        assert np.array_equal(snapshot.box.BC, other.box.BC)
+
+        if custom:
+            assert snapshot.custom.keys() == other.custom.keys()
+            assert all(np.array_equal(snapshot.custom[name], other.custom[name]) for name in other.custom)
+
+        atoms, other_atoms = snapshot.atoms(), other.atoms()
+
+        assert atoms.keys() == other_atoms.keys()
+        assert all(np.array_equal(atoms[name], other_atoms[name]) for name in other_atoms)
+
+@pytest.fixture
+def write_dump(tmp_path):
+    """Factory writing a dump (see dump_text) to a file in tmp_path and returning its path"""
+
+    def write(timesteps, name = "test.dump", **kwargs):
+        path = tmp_path / name
+        path.write_text("".join(dump_text(timesteps, **kwargs)))
+
+        return path
+
+    return write
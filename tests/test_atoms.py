@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of parsing per-atom data into column arrays
+"""
+
+import gzip
+
+import numpy as np
+import pytest
+
+from lammps_utility.dump_reader import Snapshots
+from lammps_utility.dump_reader import atoms
+
+def block(lines, prefix = b"ITEM: ATOMS\n"):
+    """Bytes of per-atom lines after a prefix, and the offsets of the lines"""
+
+    data = prefix + "".join(line + "\n" for line in lines).encode()
+
+    return data, len(prefix), len(data)
+
+def test_numeric():
+    rng = np.random.default_rng(0)
+    values = rng.random((500, 3)) * 100 - 50
+    lines = [f"{i + 1} {i % 4 + 1} {x:.17g} {y:.3e} {z:.6f} -{i}" for i, (x, y, z) in enumerate(values)]
+    data, start, end = block(lines)
+
+    parsed = atoms.parse_atoms(data, start, end, 500, ("id", "type", "x", "y", "z", "ix"))
+
+    assert list(parsed) == ["id", "type", "x", "y", "z", "ix"]
+    assert parsed["id"].dtype == parsed["ix"].dtype == np.int64
+    assert parsed["x"].dtype == np.float64
+    assert np.array_equal(parsed["id"], np.arange(1, 501))
+    assert np.array_equal(parsed["ix"], -np.arange(500))
+    assert np.array_equal(parsed["x"], values[:, 0])
+    assert np.allclose(parsed["y"], values[:, 1], rtol = 1e-3)
+    assert all(parsed[name].flags.c_contiguous for name in parsed)
+
+    single = atoms.parse_atoms(data, start, end, 500, ("id", "type", "x", "y", "z", "ix"), float32 = True)
+
+    assert single["x"].dtype == np.float32 and single["id"].dtype == np.int64
+    assert np.array_equal(single["x"], values[:, 0].astype(np.float32))
+
+    # The final line need not end in a newline
+    assert np.array_equal(atoms.parse_atoms(data, start, end - 1, 500, ("id", "type", "x", "y", "z", "ix"))["z"],
+                          parsed["z"])
+
+def test_mixed_columns():
+    lines = [f"{i + 1} {element} {i * 0.5} {i % 2}" for i, element in enumerate(["Cu", "Zr", "Al", "Cu"])]
+    data, start, end = block(lines)
+    atom_data = ("id", "element", "x", "i_flag")
+
+    parsed = atoms.parse_atoms(data, start, end, 4, atom_data)
+
+    assert parsed["element"].tolist() == ["Cu", "Zr", "Al", "Cu"]
+    assert parsed["id"].dtype == parsed["i_flag"].dtype == np.int64
+    assert np.array_equal(parsed["x"], [0, 0.5, 1, 1.5])
+
+    # Numeric columns are parsed without the string column
+    numeric = atoms.parse_atoms(data, start, end, 4, atom_data, columns = ["x", "id"])
+
+    assert list(numeric) == ["x", "id"]
+    assert np.array_equal(numeric["id"], [1, 2, 3, 4])
+
+def test_no_atoms():
+    parsed = atoms.parse_atoms(b"", 0, 0, 0, ("id", "element", "x"), float32 = True)
+
+    assert {name: (values.shape, values.dtype) for name, values in parsed.items()} == \
+        {"id": ((0,), np.int64), "element": ((0,), np.float32), "x": ((0,), np.float32)}
+
+@pytest.mark.parametrize("lines, n_atoms", [
+    (["1 1 0.5", "2 1"], 2), # Rows of different lengths
+    (["1 1 0.5", "2 1 x"], 2), # A value which is not a number
+    (["1 1 0.5 4"], 1), # Too many columns
+    (["1 1 0.5", "2 1 0.5"], 3), # Fewer rows than atoms
+    (["1 Cu 0.5", "2 Zr"], 2), # Too few values of a block with a string column
+])
+def test_malformed(lines, n_atoms):
+    data, start, end = block(lines)
+
+    with pytest.raises(RuntimeError):
+        atoms.parse_atoms(data, start, end, n_atoms, ("id", "type", "x"))
+
+@pytest.fixture(params = ["dump", "gz"])
+def mixed_dump(request, tmp_path):
+    """Path of a dump with string, integer and float columns, of plain text or gzip-compressed"""
+
+    rng = np.random.default_rng(1)
+    lines = []
+
+    for timestep, n_atoms in [(0, 30), (10, 0), (20, 45)]:
+        lines += [f"ITEM: TIMESTEP\n{timestep}\nITEM: NUMBER OF ATOMS\n{n_atoms}\n",
+                  "ITEM: BOX BOUNDS pp pp pp\n0 10\n0 10\n0 10\n",
+                  "ITEM: ATOMS id element type x y z ix c_pe\n"]
+        lines += [f"{i + 1} {'CuZrAl'[2 * (i % 3):2 * (i % 3) + 2]} {i % 3 + 1} {x:.6f} {y:.6f} {z:.6f} "
+                  f"{i % 5 - 2} {pe:.10e}\n" for i, (x, y, z, pe) in enumerate(rng.random((n_atoms, 4)))]
+
+    text = "".join(lines).encode()
+    path = tmp_path / ("mixed.dump" + (".gz" if request.param == "gz" else ""))
+    path.write_bytes(gzip.compress(text) if request.param == "gz" else text)
+
+    return path
+
+@pytest.mark.parametrize("cache_bytes", [0, atoms.DEFAULT_CACHE_BYTES])
+def test_projection(mixed_dump, cache_bytes):
+    snapshots = Snapshots.from_dump(mixed_dump, cache_bytes = cache_bytes)
+    selections = [["x"], ["z", "id"], ["element"], ["c_pe", "element", "ix"], ["y", "y"]]
+
+    for snapshot in snapshots:
+        for float32 in (False, True):
+            full = snapshot.atoms(float32 = float32)
+
+            for columns in selections:
+                projected = snapshot.atoms(columns, float32 = float32)
+
+                assert list(projected) == list(dict.fromkeys(columns))
+
+                for name in columns:
+                    assert projected[name].dtype == full[name].dtype
+                    assert np.array_equal(projected[name], full[name])
+
+            # Projections read before the full data, on a fresh source
+            fresh = Snapshots.from_dump(mixed_dump, cache_bytes = cache_bytes)[snapshots.index(snapshot)]
+
+            for columns in selections:
+                assert all(np.array_equal(fresh.atoms(columns, float32 = float32)[name], full[name])
+                           for name in columns)
+
+def test_projection_unknown_column(mixed_dump):
+    snapshot = Snapshots.from_dump(mixed_dump)[0]
+
+    for columns in (["vx"], ["x", "vx"]):
+        with pytest.raises(AssertionError):
+            snapshot.atoms(columns)
+
+    # Also once all columns are cached
+    snapshot.atoms()
+
+    with pytest.raises(AssertionError):
+        snapshot.atoms(["id", "X"])
+
+class Parser:
+    """Parse function of an AtomsCache, which records the columns of each call"""
+
+    def __init__(self, n_atoms = 100):
+        self.n_atoms = n_atoms
+        self.calls = []
+
+    def __call__(self, key):
+        def parse(columns):
+            self.calls.append((key, columns))
+            return {name: np.full(self.n_atoms, hash((key, name)) % 1000, np.float64) for name in columns}
+
+        return parse
+
+def test_cache_merges_columns():
+    cache, parser = atoms.AtomsCache(), Parser()
+
+    first = cache.get(0, ("x", "y"), parser(0))
+    merged = cache.get(0, ("z", "x", "id"), parser(0))
+    subset = cache.get(0, ("id", "y"), parser(0))
+
+    # Only the columns which are not cached are parsed, and cached arrays are shared
+    assert parser.calls == [(0, ("x", "y")), (0, ("z", "id"))]
+    assert list(merged) == ["z", "x", "id"] and list(subset) == ["id", "y"]
+    assert merged["x"] is first["x"] and subset["y"] is first["y"] and subset["id"] is merged["id"]
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 2, 0)
+    assert len(cache) == 1 and cache.nbytes == 4 * 800
+
+    for array in [*first.values(), *merged.values()]:
+        assert not array.flags.writeable
+
+        with pytest.raises(ValueError):
+            array[0] = 1
+
+def test_cache_budget():
+    # Room for three snapshots of two columns
+    cache, parser = atoms.AtomsCache(max_bytes = 3 * 1600 + 100), Parser()
+
+    for key in range(3):
+        cache.get(key, ("x", "y"), parser(key))
+
+    # 0 becomes the most recently used, so 1 is evicted first
+    cache.get(0, ("x",), parser(0))
+    cache.get(3, ("x", "y"), parser(3))
+
+    assert len(cache) == 3 and cache.nbytes == 3 * 1600 and cache.evictions == 1
+
+    parser.calls.clear()
+    for key in (0, 2, 3):
+        cache.get(key, ("y",), parser(key))
+
+    assert parser.calls == []
+
+    # 1 was evicted, and reading it again evicts 0
+    cache.get(1, ("y",), parser(1))
+
+    assert parser.calls == [(1, ("y",))] and cache.evictions == 2
+
+    # Extending an entry counts its new columns against the budget, evicting 2
+    cache.get(3, ("z", "id"), parser(3))
+
+    assert len(cache) == 2 and cache.nbytes == 800 + 3200 and cache.evictions == 3
+
+    parser.calls.clear()
+    cache.get(1, ("y",), parser(1))
+
+    assert parser.calls == []
+
+    # 3 is now the least recently used
+    cache.resize(1000)
+
+    assert len(cache) == 1 and cache.nbytes == 800 and cache.evictions == 4
+
+    cache.clear()
+
+    assert len(cache) == 0 and cache.nbytes == 0 and cache.evictions == 4
+
+def test_cache_too_small():
+    for max_bytes in (0, 1000):
+        cache, parser = atoms.AtomsCache(max_bytes = max_bytes), Parser()
+
+        # Snapshots larger than the budget are returned, but not kept
+        for _ in range(2):
+            values = cache.get(0, ("x", "y"), parser(0))
+
+            assert list(values) == ["x", "y"] and not values["x"].flags.writeable
+
+        assert len(parser.calls) == 2 and len(cache) == 0 and cache.nbytes == 0
+        assert (cache.hits, cache.misses) == (0, 2)
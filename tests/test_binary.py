@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of LAMMPS binary dumps, which are built here byte by byte as LAMMPS writes them
+"""
+
+import struct
+
+import numpy as np
+import pytest
+
+from lammps_utility.dump_reader import Snapshots
+from lammps_utility.dump_reader import binary
+
+COLUMNS = ("id", "type", "x", "y", "z")
+
+def binary_snapshot(timestep, values, order = "<", revision = 2, units = None, time = None,
+                    triclinic = False, n_chunks = 1, magic = True):
+    """
+    Bytes of one snapshot of a binary dump (see binary), as written by dump custom
+
+    Args:
+        timestep (int): Timestep of snapshot
+        values ((n_atoms, len(COLUMNS)) float ndarray): Per-atom data
+        order (str): struct byte order character (default "<")
+        revision (int): Format revision (default 2)
+        units (str): Unit style, which LAMMPS writes in the first snapshot only (default None)
+        time (float): Simulation time (default None)
+        triclinic (bool): Whether the box has tilt factors (default False)
+        n_chunks (int): Number of processors the per-atom data is split over (default 1)
+        magic (bool): Whether to write the magic string, as LAMMPS has since 2021 (default True)
+    """
+
+    def pack(fmt, *args):
+        return struct.pack(order + fmt, *args)
+
+    data = pack("q", -len(b"DUMPCUSTOM")) + b"DUMPCUSTOM" + pack("ii", 1, revision) if magic else b""
+
+    data += pack("qqi", timestep, len(values), triclinic)
+    data += pack("6i", 0, 0, 1, 1, 2, 3)
+    data += pack("9d" if triclinic else "6d", *([-10, 10, -20, 20, -5, 5] + ([0.5, 0, -0.25] if triclinic else [])))
+    data += pack("i", len(COLUMNS))
+
+    if magic and revision > 1:
+        units = (units or "").encode()
+        data += pack("i", len(units)) + units
+        data += pack("b", time is not None) + (pack("d", time) if time is not None else b"")
+
+        columns = " ".join(COLUMNS).encode()
+        data += pack("i", len(columns)) + columns
+
+    chunks = np.array_split(values, n_chunks)
+    data += pack("i", n_chunks)
+
+    for chunk in chunks:
+        data += pack("i", chunk.size) + chunk.astype(order + "f8").tobytes()
+
+    return data
+
+def atom_values(n_atoms, seed):
+    rng = np.random.default_rng(seed)
+
+    return np.column_stack([np.arange(1, n_atoms + 1), rng.integers(1, 4, n_atoms),
+                            rng.random((n_atoms, 3)) * 10])
+
+@pytest.mark.parametrize("order", ["<", ">"])
+def test_units_and_time(tmp_path, order):
+    values = [atom_values(n_atoms, seed) for seed, n_atoms in enumerate([8, 8, 5, 0, 11])]
+    times = [0.0, 0.5, 1.0, 1.5, 2.25]
+
+    # Only the first snapshot has a unit style, as written by LAMMPS
+    path = tmp_path / "units.bin"
+    path.write_bytes(b"".join(binary_snapshot(10 * i, v, order, units = "metal" if i == 0 else None,
+                                              time = times[i], triclinic = True, n_chunks = 1 + i % 3)
+                              for i, v in enumerate(values)))
+
+    with open(path, "rb") as f:
+        assert binary.is_binary(f)
+
+    snapshots = Snapshots.from_dump(path)
+
+    assert snapshots.timesteps.tolist() == [0, 10, 20, 30, 40]
+    assert snapshots.n_atoms.tolist() == [8, 8, 5, 0, 11]
+    assert snapshots.custom["UNITS"].tolist() == ["metal"] * 5
+    assert snapshots.custom["TIME"].tolist() == times
+
+    for snapshot, expected in zip(snapshots, values):
+        assert snapshot.atom_data == COLUMNS
+        assert np.array_equal(snapshot.box.bounds, [[-10, 10], [-20, 20], [-5, 5]])
+        assert np.array_equal(snapshot.box.tri, [0.5, 0, -0.25])
+        assert np.array_equal(snapshot.box.BC, [["p", "p"], ["f", "f"], ["s", "m"]])
+
+        atoms = snapshot.atoms()
+
+        assert atoms["id"].dtype == np.int64 and atoms["x"].dtype == np.float64
+        assert all(np.array_equal(atoms[name], expected[:, i]) for i, name in enumerate(COLUMNS))
+
+    # Dumps of the snapshots read back as the same snapshots
+    text_path = tmp_path / "units.dump"
+    text_path.write_text("".join(snapshot.read_dump() for snapshot in snapshots))
+    text = Snapshots.from_dump(text_path)
+
+    assert text.custom["UNITS"].tolist() == ["metal"] * 5
+    assert text.custom["TIME"].tolist() == times
+    assert all(np.array_equal(text[i].atoms()["z"], values[i][:, 4]) for i in range(5))
+
+def test_without_column_names(tmp_path):
+    values = [atom_values(6, seed) for seed in range(3)]
+
+    # Revision 1 and dumps written before magic strings do not name their columns
+    for magic in (True, False):
+        path = tmp_path / f"old_{magic}.bin"
+        path.write_bytes(b"".join(binary_snapshot(i, v, revision = 1, magic = magic, n_chunks = 2)
+                                  for i, v in enumerate(values)))
+
+        with pytest.raises(RuntimeError):
+            Snapshots.from_binary_dump(path)
+
+        snapshots = Snapshots.from_binary_dump(path, atom_data = COLUMNS)
+
+        assert snapshots.timesteps.tolist() == [0, 1, 2]
+        assert all(len(snapshot.custom) == 0 for snapshot in snapshots)
+        assert all(np.array_equal(snapshot.atoms()["y"], v[:, 3]) for snapshot, v in zip(snapshots, values))
+
+def test_truncated(tmp_path):
+    data = binary_snapshot(0, atom_values(6, 0), units = "lj") + binary_snapshot(1, atom_values(6, 1))
+
+    path = tmp_path / "truncated.bin"
+    path.write_bytes(data[:-8])
+
+    with pytest.raises(RuntimeError):
+        Snapshots.from_dump(path)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of compressed stores written by write_compressed, whose float columns are quantized and whose
+other columns must read back exactly
+"""
+
+import numpy as np
+import pytest
+
+from lammps_utility.dump_reader import Snapshots
+from lammps_utility.dump_reader import compressed
+from conftest import write_shuffled_dump
+
+@pytest.fixture
+def written(tmp_path):
+    # The number of atoms changes at snapshot 13, which forces a keyframe between regular ones
+    expected = write_shuffled_dump(tmp_path / "shuffled.dump", [30] * 13 + [20] * 12)
+    Snapshots.from_dump(tmp_path / "shuffled.dump").write_compressed(tmp_path / "compressed",
+                                                                     keyframe_interval = 4)
+
+    return tmp_path / "compressed", expected
+
+def assert_atoms(atoms, expected, precision):
+    assert atoms.keys() == expected.keys()
+
+    for name in ("id", "type", "ix"):
+        assert atoms[name].dtype == np.int64
+        assert np.array_equal(atoms[name], expected[name])
+
+    assert np.all(np.abs(atoms["x"] - expected["x"]) <= precision / 2 * (1 + 1e-9))
+
+def test_random_access(written):
+    path, expected = written
+
+    # Without a cache, each read decodes from the keyframe or from the previous read
+    stored = Snapshots.from_compressed(path, cache_bytes = 0)
+    source = stored[0].source
+
+    assert source.key_frames.tolist() == [0, 0, 0, 0, 4, 4, 4, 4, 8, 8, 8, 8, 12, 13, 13, 13, 16,
+                                          16, 16, 16, 20, 20, 20, 20, 24]
+
+    for identifier in [24, 3, 13, 12, 14, 0, 7, 7, 6, 19, 5, 17, 16, 23, 2]:
+        assert stored[identifier].timestep == identifier
+        assert_atoms(stored[identifier].atoms(), expected[identifier], 1e-3)
+
+def test_precision(tmp_path, written):
+    path, expected = written
+    snapshots = Snapshots.from_dump(tmp_path / "shuffled.dump")
+
+    snapshots.write_compressed(tmp_path / "coarse", precision = 0.25, codec = "lzma")
+    snapshots.write_compressed(tmp_path / "exact", precision = None, codec = "bz2")
+
+    coarse = Snapshots.from_compressed(tmp_path / "coarse")
+    exact = Snapshots.from_compressed(tmp_path / "exact")
+
+    for i in reversed(range(len(expected))):
+        assert_atoms(coarse[i].atoms(), expected[i], 0.25)
+        assert_atoms(exact[i].atoms(), expected[i], 0)
+
+def test_ints_round_trip():
+    values = np.array([0, 1, -1, 127, -128, 1 << 31, -(1 << 31) - 1, (1 << 62), -(1 << 63), (1 << 63) - 1])
+
+    for n in (0, 1, len(values)):
+        data = compressed.encode_ints(values[:n])
+
+        assert np.array_equal(compressed.decode_ints(data, n), values[:n])
+
+    assert compressed.encode_ints(np.array([0, -1, 1, -64, 63]))[0] == 1
+    assert compressed.encode_ints(np.array([0, 128]))[0] == 2
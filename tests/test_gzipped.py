@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of gzip-compressed dumps, whose snapshots must read back as those of the uncompressed dump
+from any checkpoint
+"""
+
+import gzip
+import zlib
+
+import pytest
+
+from lammps_utility.dump_reader import Snapshots
+from lammps_utility.dump_reader import gzipped
+from lammps_utility.dump_reader.gzipped import GzipDumpSource
+from conftest import dump_text, assert_snapshots_equal
+
+TEXTS = dump_text(range(0, 400, 10), n_atoms = 25, custom = {"c_temp": [str(i) for i in range(40)]})
+
+def compress_synced(texts):
+    """Compress texts as one gzip member with a sync flush after each, as written by LAMMPS"""
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, gzipped.GZIP_WBITS)
+    data = b"".join(compressor.compress(text.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                    for text in texts)
+
+    return data + compressor.flush()
+
+COMPRESS = {
+    "member": lambda texts: gzip.compress("".join(texts).encode()),
+    "synced": compress_synced,
+    "members": lambda texts: b"".join(gzip.compress("".join(texts[i:i + 7]).encode())
+                                      for i in range(0, len(texts), 7))
+}
+
+# Kind of the checkpoints within the dump of each way of compressing it
+KINDS = {"member": "state", "synced": "sync", "members": "member"}
+
+@pytest.fixture(params = list(COMPRESS))
+def paths(request, tmp_path, monkeypatch):
+    # Data is decompressed in small pieces, so that checkpoints are recorded within the dump
+    monkeypatch.setattr(gzipped, "READ_BYTES", 1 << 9)
+
+    path = tmp_path / "test.dump"
+    path.write_text("".join(TEXTS))
+
+    gz_path = tmp_path / "test.dump.gz"
+    gz_path.write_bytes(COMPRESS[request.param](TEXTS))
+
+    return gz_path, path, KINDS[request.param]
+
+def check_source(source, kind):
+    # Snapshots are read out of order, so decompression starts from different checkpoints
+    for identifier in [39, 0, 17, 16, 38, 5, 5, 22, 1, 30]:
+        assert source.read_snapshot_dump(identifier) == TEXTS[identifier]
+
+    assert sum(checkpoint.kind == kind for checkpoint in source.checkpoints) >= 2
+
+def test_gzip(paths):
+    gz_path, path, kind = paths
+
+    check_source(GzipDumpSource(open(gz_path, "rb"), checkpoint_spacing = 1 << 12), kind)
+    assert_snapshots_equal(Snapshots.from_dump(gz_path), Snapshots.from_dump(path))
+
+def test_gzip_index_cache(paths, tmp_path):
+    gz_path, path, kind = paths
+    index_path = tmp_path / "test.dump.gz.index"
+
+    indexed = GzipDumpSource(open(gz_path, "rb"), index_path = index_path, checkpoint_spacing = 1 << 12)
+    loaded = GzipDumpSource(open(gz_path, "rb"), index_path = index_path, checkpoint_spacing = 1 << 12)
+
+    assert loaded.snapshots.to_lists() == indexed.snapshots.to_lists()
+    assert loaded.snapshot_seek_info.values == indexed.snapshot_seek_info.values
+
+    # State checkpoints are not saved, but are recreated by reads
+    assert ([checkpoint.to_list() for checkpoint in loaded.checkpoints] ==
+            [checkpoint.to_list() for checkpoint in indexed.checkpoints if checkpoint.persistent])
+
+    check_source(loaded, kind)
+
+    # Indexed, then loaded from the cached index
+    for _ in range(2):
+        assert_snapshots_equal(Snapshots.from_dump(gz_path, cache_index = True, cache_dir = tmp_path),
+                               Snapshots.from_dump(path))
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the dump indexer, in particular skipping over per-atom blocks, which must never change the
+snapshots found
+"""
+
+import numpy as np
+import pytest
+
+from lammps_utility.dump_reader import Snapshots
+from lammps_utility.dump_reader import indexing
+from lammps_utility.dump_reader.sources import DumpFileSource
+from conftest import dump_text, pad_atoms
+
+def dump_bytes(widths, n_atoms, seed = 0):
+    """Bytes of a dump with one snapshot per pad width (see pad_atoms) and timesteps 0, 1, ..."""
+
+    if np.ndim(n_atoms) == 0:
+        n_atoms = [n_atoms] * len(widths)
+
+    texts = [pad_atoms(dump_text([i], n_atoms = n, seed = seed + i)[0], width)
+             for i, (width, n) in enumerate(zip(widths, n_atoms))]
+
+    return "".join(texts).encode()
+
+def offsets(headers):
+    return [(header.timestep, header.seek_info) for header in headers]
+
+def test_skip_varying_line_widths(tmp_path):
+    # The first block is twice as large as the others, so a skip based on it lands past the next one
+    path = tmp_path / "padded.dump"
+    path.write_bytes(dump_bytes([36] + [0] * 7, 40000))
+
+    snapshots = Snapshots.from_dump(path)
+    verified = Snapshots.from_dump(path, verify = True)
+
+    assert snapshots.timesteps.tolist() == verified.timesteps.tolist() == list(range(8))
+
+    for snapshot, expected in zip(snapshots, verified):
+        atoms = snapshot.atoms()
+
+        assert len(atoms["id"]) == 40000
+        assert all(np.array_equal(atoms[name], expected.atoms()[name]) for name in atoms)
+
+@pytest.mark.parametrize("widths, n_atoms", [
+    ([0] * 6, 2000),
+    ([40, 0, 0, 40, 0, 0], 2000),
+    ([0, 40, 0, 40, 0, 40], 2000),
+    ([0, 0, 30, 30, 0, 0], [2000, 2000, 1000, 3000, 1000, 2000]),
+    ([0] * 6, [2000, 500, 2000, 4000, 100, 2000]),
+])
+def test_skip_matches_verify(monkeypatch, widths, n_atoms):
+    # Blocks are a few tens of KiB, so every one of them is skipped over
+    monkeypatch.setattr(indexing, "SKIP_MIN_BYTES", 1 << 10)
+    buffer = dump_bytes(widths, n_atoms)
+
+    assert offsets(indexing.scan_dump(buffer)) == offsets(indexing.scan_dump(buffer, verify = True))
+
+def test_skip_min_bytes(monkeypatch):
+    buffer = dump_bytes([0, 0, 0], 2000)
+    first, second, _ = indexing.scan_dump(buffer, verify = True)
+    estimate = (first.end - first.atoms_offset) * second.n_atoms / first.n_atoms
+
+    def skip():
+        return indexing.skip_atoms(buffer, second.atoms_offset, len(buffer), second.n_atoms,
+                                   second.atom_data, first)
+
+    monkeypatch.setattr(indexing, "SKIP_MIN_BYTES", int(estimate) + 1)
+    assert skip() is None
+
+    monkeypatch.setattr(indexing, "SKIP_MIN_BYTES", int(estimate))
+    assert skip() == second.end
+
+    # Without a previous snapshot of the same per-atom columns, there is no estimate
+    assert indexing.skip_atoms(buffer, second.atoms_offset, len(buffer), second.n_atoms,
+                               ("id", "type", "x"), first) is None
+
+def test_skip_landing_past_stop(monkeypatch):
+    # The last block is a third of the size of the first, so the skip lands past the end of the data
+    monkeypatch.setattr(indexing, "SKIP_MIN_BYTES", 1 << 10)
+    buffer = dump_bytes([80, 0], 2000)
+    first, last = indexing.scan_dump(buffer, verify = True)
+
+    estimate = first.end - first.atoms_offset
+
+    assert last.atoms_offset + int(estimate * (1 - indexing.SKIP_MARGIN)) >= len(buffer)
+    assert indexing.skip_atoms(buffer, last.atoms_offset, len(buffer), last.n_atoms, last.atom_data, first) is None
+    assert offsets(indexing.scan_dump(buffer)) == offsets([first, last])
+
+def test_parallel_ranges(tmp_path):
+    path = tmp_path / "ranges.dump"
+    path.write_text("".join(dump_text(range(0, 200, 10), n_atoms = 50, custom = {"c_temp": [str(i) for i in range(20)]})))
+    buffer = path.read_bytes()
+    serial = indexing.scan_dump(buffer)
+
+    atoms_line = len(b"ITEM: ATOMS id type x y z\n")
+    bounds = [0,
+              serial[2].atoms_offset + 100, # Inside a per-atom block
+              serial[5].offset + 20, # Inside a header
+              serial[8].offset, # On ITEM: TIMESTEP
+              buffer.index(b"ITEM: NUMBER OF ATOMS", serial[11].offset), # On an item inside a header
+              serial[14].atoms_offset - atoms_line, # On ITEM: ATOMS
+              serial[17].end - 1, # On the last newline of a per-atom block
+              len(buffer)]
+
+    headers = []
+    for i in range(len(bounds) - 1):
+        headers += indexing.scan_file_range(path, bounds[i], bounds[i + 1], len(buffer), i == 0)
+
+    assert offsets(headers) == offsets(serial)
+    assert [header.custom for header in headers] == [header.custom for header in serial]
+
+@pytest.mark.parametrize("processes", [2, 3, 7])
+def test_parallel_source(monkeypatch, tmp_path, processes):
+    # Ranges are a few KiB, so they begin at arbitrary bytes of the dump
+    monkeypatch.setattr(indexing, "MIN_RANGE_BYTES", 1 << 10)
+    path = tmp_path / "parallel.dump"
+    path.write_text("".join(dump_text(range(0, 300, 10), n_atoms = 20)))
+
+    parallel = DumpFileSource(open(path, "rb"), processes = processes)
+    serial = DumpFileSource(open(path, "rb"))
+
+    assert parallel.snapshots.to_lists() == serial.snapshots.to_lists()
+    assert parallel.snapshot_seek_info.values == serial.snapshot_seek_info.values
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of lazily indexed and followed Snapshots objects, which must match those indexed eagerly
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from lammps_utility.dump_reader import Snapshots
+from conftest import dump_text
+
+def test_lazy_index_from_threads(write_dump):
+    path = write_dump(range(0, 2000 * 10, 10), n_atoms = 2)
+    expected = Snapshots.from_dump(path).timesteps.tolist()
+
+    for _ in range(3):
+        snapshots = Snapshots.from_dump(path, lazy = True)
+
+        with ThreadPoolExecutor(16) as executor:
+            timesteps = list(executor.map(lambda i: snapshots[i].timestep, range(len(expected))))
+
+        assert timesteps == expected
+        assert snapshots.timesteps.tolist() == expected
+
+@pytest.mark.parametrize("values", [["300", "abc", "400"], ["300", "1.5", "400"], ["1.5", "2", "3"],
+                                    ["1", "2", "3"], ["a", "b", "ccc"], ["1", "1e3", "x"], ["1", "1e3", "2"],
+                                    ["1 2", "3 4", "5 6.5"]])
+def test_lazy_custom_cast(write_dump, values):
+    # Each value is the custom item of a third of the snapshots, which are indexed in several batches
+    custom = [values[i * len(values) // 40] for i in range(40)]
+    path = write_dump(range(40), n_atoms = 1, custom = {"c_temp": custom})
+    expected = Snapshots.from_dump(path).custom["c_temp"]
+
+    snapshots = Snapshots.from_dump(path, lazy = True)
+    for i in range(40):
+        snapshots[i]
+
+    assert snapshots.custom["c_temp"].dtype == expected.dtype
+    assert np.array_equal(snapshots.custom["c_temp"], expected)
+    assert [type(snapshot.custom["c_temp"]) for snapshot in snapshots] == [type(temp) for temp in expected]
+
+def test_follow_refresh(tmp_path):
+    texts = dump_text(range(0, 300, 10), n_atoms = 2, custom = {"c_temp": [str(i) for i in range(30)]})
+    path = tmp_path / "follow.dump"
+    path.write_text("".join(texts[:5]))
+
+    snapshots = Snapshots.from_dump(path, follow = True)
+    sliced = snapshots.new[:]
+
+    with open(path, "a") as file:
+        for i in range(5, 30, 5):
+            file.write("".join(texts[i:i + 5]))
+            file.flush()
+
+            assert [snapshot.timestep for snapshot in snapshots.refresh()] == list(range(10 * i, 10 * i + 50, 10))
+
+            if i == 10:
+                # Taken once the arrays grow in place
+                late = snapshots.new[:10]
+
+    late[0].timestep = 5
+    snapshots[1].timestep = 7
+    snapshots[0].box.bounds[0, 0] = 99
+
+    expected = Snapshots.from_dump(path)
+
+    assert snapshots.timesteps.tolist() == [0, 7] + expected.timesteps.tolist()[2:]
+    assert snapshots.custom["c_temp"].dtype == expected.custom["c_temp"].dtype
+    assert np.array_equal(snapshots.custom["c_temp"], expected.custom["c_temp"])
+    assert np.array_equal(snapshots.boxes.bounds[1:], expected.boxes.bounds[1:])
+    assert snapshots.boxes.bounds[0, 0, 0] == 99
+    assert [snapshot.identifier for snapshot in snapshots] == list(range(30))
+
+    assert sliced.timesteps.tolist() == list(range(0, 50, 10))
+    assert late.timesteps.tolist() == [5] + list(range(10, 100, 10))
+    assert late.boxes.bounds[0, 0, 0] == -10
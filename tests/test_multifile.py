@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of trajectories of many dump files, one per snapshot or one per processor, which must read
+back as the equivalent single dump file
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from lammps_utility.dump_reader import Snapshots
+from lammps_utility.dump_reader.multifile import DumpFilesSource
+from lammps_utility.dump_reader.sources import DumpFileSource
+from conftest import dump_text, assert_snapshots_equal
+
+TIMESTEPS = [0, 5, 10, 50, 100, 200, 1000, 1500, 2000, 10000, 20000, 100000]
+
+@pytest.fixture
+def files(tmp_path):
+    """Write one file per snapshot and the same snapshots as one dump, and return their paths"""
+
+    texts = dump_text(TIMESTEPS, n_atoms = 15, custom = {"c_temp": [str(t / 7) for t in TIMESTEPS]})
+
+    # File names sort differently by text and by number
+    paths = []
+    for timestep, text in zip(TIMESTEPS, texts):
+        paths.append(tmp_path / f"dump.{timestep}.lammpstrj")
+        paths[-1].write_text(text)
+
+    single = tmp_path / "single.dump"
+    single.write_text("".join(texts))
+
+    return paths, single
+
+def test_files_in_timestep_order(files, tmp_path):
+    paths, single = files
+    expected = Snapshots.from_dump(single)
+
+    from_glob = Snapshots.from_dump(str(tmp_path / "dump.*.lammpstrj"))
+    from_list = Snapshots.from_dump(paths[::-1])
+
+    assert from_glob.timesteps.tolist() == from_list.timesteps.tolist() == TIMESTEPS
+    assert_snapshots_equal(from_glob, expected)
+    assert_snapshots_equal(from_list, expected)
+
+def test_pooled_reads(files):
+    paths, single = files
+
+    # Fewer files are kept open than there are files, so reads reopen evicted files
+    source = DumpFilesSource(paths[::-1], max_open = 3, cache_bytes = 0)
+    expected = DumpFileSource(open(single, "rb"))
+
+    identifiers = [11, 0, 5, 6, 11, 3, 1, 10, 2, 9, 0, 8, 4, 7] * 2
+
+    for identifier in identifiers:
+        assert source.read_snapshot_dump(identifier) == expected.read_snapshot_dump(identifier)
+        assert len(source.files) <= 3
+
+    def read(identifier):
+        atoms, expected_atoms = source.read_snapshot_atoms(identifier), expected.read_snapshot_atoms(identifier)
+
+        return all(np.array_equal(atoms[name], expected_atoms[name]) for name in expected_atoms)
+
+    with ThreadPoolExecutor(6) as executor:
+        assert all(executor.map(read, identifiers * 4))
+
+    assert len(source.files) <= 3
+    assert [source.dump_file_path(i) for i in range(len(paths))] == [str(path) for path in paths]
+
+def test_missing_files(tmp_path):
+    with pytest.raises(RuntimeError):
+        Snapshots.from_dump(str(tmp_path / "missing.*"))
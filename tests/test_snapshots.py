@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of Snapshots objects, in particular that editing one never affects another
+"""
+
+import numpy as np
+
+from lammps_utility.dump_reader import Snapshots
+
+def test_slice_in_place_edits(write_dump):
+    snapshots = Snapshots.from_dump(write_dump([0, 100, 200, 300]))
+    sliced = snapshots.new[1:3]
+
+    snapshots[1].box.bounds[0, 0] = 7
+    sliced[0].box.bounds[0, 0] = 5
+
+    assert snapshots.boxes.bounds[1, 0, 0] == 7
+    assert sliced.boxes.bounds[0, 0, 0] == 5
+
+def test_slice_isolated_from_held_arrays(write_dump):
+    snapshots = Snapshots.from_dump(write_dump([0, 100, 200, 300]))
+
+    bounds = snapshots[0].box.bounds
+    timesteps = snapshots.timesteps
+    sliced = snapshots.new[0:2]
+
+    bounds[0, 0] = 99
+    timesteps[1] = -1
+
+    assert snapshots.boxes.bounds[0, 0, 0] == 99
+    assert sliced.boxes.bounds[0, 0, 0] == -10
+    assert snapshots.timesteps[1] == -1
+    assert sliced.timesteps[1] == 100
+
+def test_slice_edits_not_shared(write_dump):
+    snapshots = Snapshots.from_dump(write_dump([0, 100, 200, 300], custom = {"c_temp": [1, 2, 3, 4]}))
+    sliced = snapshots.new[1:]
+    nested = sliced.new[::2]
+
+    sliced[0].timestep = 11
+    snapshots[2].timestep = 22
+    nested.custom["c_temp"][1] = 9
+
+    assert snapshots.timesteps.tolist() == [0, 100, 22, 300]
+    assert sliced.timesteps.tolist() == [11, 200, 300]
+    assert nested.timesteps.tolist() == [100, 300]
+    assert sliced.custom["c_temp"].tolist() == [2, 3, 4]
+    assert nested[1].custom["c_temp"] == 9
+
+def test_index_arrays_and_masks(write_dump):
+    snapshots = Snapshots.from_dump(write_dump([0, 100, 200, 300, 400]))
+
+    assert snapshots.new[[0, -1, 2]].timesteps.tolist() == [0, 400, 200]
+    assert snapshots.new[snapshots.timesteps > 150].timesteps.tolist() == [200, 300, 400]
+    assert len(snapshots.new[np.zeros(5, dtype = bool)]) == 0
+
+def test_select_duplicate_timesteps(write_dump):
+    snapshots = Snapshots.from_dump(write_dump([0, 100, 200, 100, 200]))
+
+    assert snapshots.select(100, 200).timesteps.tolist() == [100, 200, 100, 200]
+    assert snapshots.index(snapshots.at_timestep(200)) == 2
+    assert snapshots.at_timestep(140, nearest = True).timestep == 100
+
+    snapshots[0].timestep = 1000
+
+    assert snapshots.index(snapshots.at_timestep(1000)) == 0
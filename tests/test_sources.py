@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of DumpFileSource, in particular reads from threads while a followed dump file grows
+"""
+
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from lammps_utility.dump_reader.sources import DumpFileSource
+from conftest import dump_text
+
+def test_reads_while_refreshing(tmp_path):
+    path = tmp_path / "growing.dump"
+    text = "".join(dump_text(range(0, 600 * 10, 10), n_atoms = 40))
+
+    # The writer appends the text in chunks which split snapshots anywhere
+    rng = random.Random(0)
+    cuts = sorted(rng.sample(range(1, len(text)), 300))
+    chunks = [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+
+    path.write_text(chunks[0])
+    source = DumpFileSource(open(path, "rb"), lazy = True, follow = True)
+
+    writing = threading.Event()
+    writing.set()
+    errors = []
+
+    def write():
+        with open(path, "a") as file:
+            for chunk in chunks[1:]:
+                file.write(chunk)
+                file.flush()
+                time.sleep(0.001)
+
+        writing.clear()
+
+    def refresh():
+        try:
+            while writing.is_set():
+                source.refresh()
+                source.index(len(source.snapshots) + 5)
+        except Exception as error:
+            errors.append(error)
+
+    def read(seed):
+        reads = []
+        rng = random.Random(seed)
+
+        while writing.is_set() or len(reads) < 50:
+            n_snapshots = len(source.snapshots)
+
+            if n_snapshots == 0:
+                continue
+
+            # Half of the reads are of the newest snapshot, which is the one being indexed
+            identifier = n_snapshots - 1 if rng.random() < 0.5 else rng.randrange(n_snapshots)
+            reads.append((identifier, source.read_snapshot_dump(identifier),
+                          source.read_snapshot_atoms(identifier)))
+
+        return reads
+
+    threads = [threading.Thread(target = write)] + [threading.Thread(target = refresh) for _ in range(2)]
+
+    # Threads are switched often, so that reads interleave with every step of indexing
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+
+    try:
+        for thread in threads:
+            thread.start()
+
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(read, range(8)))
+
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    assert not errors
+    source.refresh()
+
+    serial = DumpFileSource(open(path, "rb"), follow = True)
+
+    assert len(source.snapshots) == len(serial.snapshots) == 600
+    assert [snapshot.timestep for snapshot in source.snapshots] == [snapshot.timestep for snapshot in serial.snapshots]
+
+    for identifier, dump, atoms in (read for reads in results for read in reads):
+        assert dump == serial.read_snapshot_dump(identifier)
+
+        expected = serial.read_snapshot_atoms(identifier)
+
+        assert atoms.keys() == expected.keys()
+        assert all(np.array_equal(atoms[name], expected[name]) for name in expected)
+
+def test_index_cache(tmp_path):
+    custom = {"c_temp": [str(300 + i) for i in range(30)], "c_vec": [f"{i} 2.5 x" for i in range(30)]}
+    texts = dump_text(range(0, 300, 10), n_atoms = 4, custom = custom)
+    path = tmp_path / "cached.dump"
+    index_path = tmp_path / "cached.dump.index"
+    path.write_text("".join(texts[:20]))
+
+    indexed = DumpFileSource(open(path, "rb"), index_path = index_path)
+    loaded = DumpFileSource(open(path, "rb"), index_path = index_path, lazy = True)
+
+    # Loaded without indexing
+    assert len(loaded.snapshots) == 20
+    assert loaded.snapshots.to_lists() == indexed.snapshots.to_lists()
+    assert loaded.snapshot_seek_info.values == indexed.snapshot_seek_info.values
+    assert np.array_equal(loaded.snapshots[3].custom["c_vec"], indexed.snapshots[3].custom["c_vec"])
+    assert loaded.read_snapshot_dump(19) == indexed.read_snapshot_dump(19)
+
+    with open(path, "a") as file:
+        file.write("".join(texts[20:]))
+
+    # The last cached snapshot may have been incomplete, so indexing resumes from it
+    grown = DumpFileSource(open(path, "rb"), index_path = index_path, lazy = True)
+
+    assert len(grown.snapshots) == 19
+
+    grown.index()
+    serial = DumpFileSource(open(path, "rb"))
+
+    assert grown.snapshots.to_lists() == serial.snapshots.to_lists()
+    assert grown.snapshot_seek_info.values == serial.snapshot_seek_info.values
+    assert len(DumpFileSource(open(path, "rb"), index_path = index_path, lazy = True).snapshots) == 30
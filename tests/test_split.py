@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of dumps split over processors, whose parts must merge into the snapshots of the unsplit dump
+"""
+
+import numpy as np
+import pytest
+
+from lammps_utility.dump_reader import Snapshots
+from conftest import dump_text, assert_snapshots_equal
+
+TIMESTEPS = list(range(0, 100, 10))
+
+def split_text(text, parts):
+    """
+    Split the text of one snapshot (see dump_text) into the texts written by several processors
+
+    Args:
+        text (str): Text of snapshot
+        parts (list of ndarray): Indices of the atoms of each processor
+
+    Returns: list of str
+    """
+
+    header, atoms = text.split("ITEM: ATOMS id type x y z\n")
+    lines = atoms.splitlines(keepends = True)
+    n_atoms = header.split("ITEM: NUMBER OF ATOMS\n")[1].split("\n")[0]
+
+    return [header.replace(f"ITEM: NUMBER OF ATOMS\n{n_atoms}\n", f"ITEM: NUMBER OF ATOMS\n{len(part)}\n") +
+            "ITEM: ATOMS id type x y z\n" + "".join(lines[i] for i in part)
+            for part in parts]
+
+@pytest.fixture
+def split(tmp_path):
+    """Write a dump of 30 atoms split unevenly over 3 processors, and the unsplit dump"""
+
+    texts = dump_text(TIMESTEPS, n_atoms = 30, custom = {"c_temp": [str(t) for t in TIMESTEPS]})
+    rng = np.random.default_rng(0)
+
+    proc_texts = [[], [], []]
+
+    for i, text in enumerate(texts):
+        # Atoms move between processors, and one processor may have none
+        order = rng.permutation(30)
+        cuts = sorted(rng.choice(31, 2)) if i % 4 else [0, 12]
+
+        for proc, part_text in enumerate(split_text(text, np.split(order, cuts))):
+            proc_texts[proc].append(part_text)
+
+    for proc, part_texts in enumerate(proc_texts):
+        (tmp_path / f"dump.{proc}").write_text("".join(part_texts))
+
+    single = tmp_path / "single.dump"
+    single.write_text("".join(texts))
+
+    return tmp_path, single
+
+def test_split_sorted(split):
+    path, single = split
+
+    merged = Snapshots.from_split_dump(str(path / "dump.[0-9]"), sort = True)
+    expected = Snapshots.from_dump(single)
+
+    assert merged.timesteps.tolist() == TIMESTEPS
+    assert merged.n_atoms.tolist() == [30] * len(TIMESTEPS)
+    assert_snapshots_equal(merged, expected)
+
+    # Dumps of merged snapshots read back as the same snapshots
+    dump_path = path / "merged.dump"
+    dump_path.write_text("".join(snapshot.read_dump() for snapshot in merged))
+
+    assert_snapshots_equal(Snapshots.from_dump(dump_path), expected)
+
+def atom_lines(text, timestep):
+    """Per-atom lines of the snapshot at timestep in text of a dump"""
+
+    snapshot = text.split(f"ITEM: TIMESTEP\n{timestep}\n")[1].split("ITEM: TIMESTEP")[0]
+
+    return snapshot.split("ITEM: ATOMS id type x y z\n")[1].splitlines()
+
+def test_split_in_file_order(split):
+    path, single = split
+    paths = [path / "dump.2", path / "dump.0", path / "dump.1"]
+
+    merged = Snapshots.from_split_dump(paths)
+
+    for snapshot, expected in zip(merged, Snapshots.from_dump(single)):
+        atoms, expected_atoms = snapshot.atoms(), expected.atoms()
+        order = np.argsort(atoms["id"])
+
+        assert snapshot.n_atoms == len(atoms["id"]) == 30
+        assert all(np.array_equal(atoms[name][order], expected_atoms[name]) for name in expected_atoms)
+
+        # Atoms are in the order of the files
+        assert atom_lines(snapshot.read_dump(), snapshot.timestep) == \
+            [line for part in paths for line in atom_lines(part.read_text(), snapshot.timestep)]
+
+def test_split_per_timestep_files(split):
+    path, single = split
+
+    # Files of dump.%.*, one per processor and timestep
+    for proc in range(3):
+        text = (path / f"dump.{proc}").read_text()
+
+        for timestep in TIMESTEPS:
+            start = text.index(f"ITEM: TIMESTEP\n{timestep}\n")
+            end = text.find("ITEM: TIMESTEP", start + 1)
+            (path / f"dump.{proc}.{timestep}").write_text(text[start:end if end != -1 else None])
+
+    merged = Snapshots.from_split_dump(str(path / "dump.*.*"), sort = True)
+
+    assert_snapshots_equal(merged, Snapshots.from_dump(single))
+
+def test_split_timesteps_disagree(split):
+    path, _ = split
+
+    # One processor's file lacks the last timestep
+    text = (path / "dump.1").read_text()
+    (path / "dump.1").write_text(text[:text.index(f"ITEM: TIMESTEP\n{TIMESTEPS[-1]}\n")])
+
+    with pytest.raises(RuntimeError, match = "disagree"):
+        Snapshots.from_split_dump(str(path / "dump.[0-9]"))
+
+    # A file of another run, whose timesteps are shifted
+    (path / "dump.1").write_text("".join(dump_text([t + 5 for t in TIMESTEPS], n_atoms = 10)))
+
+    with pytest.raises(RuntimeError, match = "disagree"):
+        Snapshots.from_split_dump(str(path / "dump.[0-9]"))
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of stores written by write_store, which must read back as the snapshots they were written from
+"""
+
+import numpy as np
+import pytest
+
+from lammps_utility.dump_reader import Snapshots
+from conftest import dump_text, assert_snapshots_equal
+
+CUSTOM = {"c_temp": ["300", "310.5", "320", "330"], "c_vec": ["1 2 x", "3 4 y", "5 6 z", "7 8 w"]}
+
+@pytest.fixture
+def snapshots(tmp_path):
+    # The number of atoms changes between snapshots
+    texts = dump_text([0, 10], n_atoms = 7, custom = {name: values[:2] for name, values in CUSTOM.items()})
+    texts += dump_text([20, 30], n_atoms = 12, custom = {name: values[2:] for name, values in CUSTOM.items()},
+                       seed = 1)
+
+    path = tmp_path / "store.dump"
+    path.write_text("".join(texts))
+
+    return Snapshots.from_dump(path)
+
+def test_round_trip(tmp_path, snapshots):
+    snapshots.write_store(tmp_path / "store")
+    stored = Snapshots.from_store(tmp_path / "store")
+
+    assert stored.n_atoms.tolist() == [7, 7, 12, 12]
+    assert_snapshots_equal(stored, snapshots)
+
+    atoms = stored[2].atoms()
+    assert all(not values.flags.writeable for values in atoms.values())
+
+    # Dumps of stored snapshots read back as the same snapshots
+    path = tmp_path / "stored.dump"
+    path.write_text("".join(snapshot.read_dump() for snapshot in stored))
+
+    assert_snapshots_equal(Snapshots.from_dump(path), snapshots)
+
+def test_round_trip_options(tmp_path, snapshots):
+    snapshots.write_store(tmp_path / "store", float32 = True, ignore_custom = True)
+    stored = Snapshots.from_store(tmp_path / "store")
+
+    assert all(len(snapshot.custom) == 0 for snapshot in stored)
+
+    for snapshot, expected in zip(stored, snapshots):
+        atoms, expected_atoms = snapshot.atoms(float32 = True), expected.atoms(float32 = True)
+
+        assert atoms["x"].dtype == np.float32
+        assert all(np.array_equal(atoms[name], expected_atoms[name]) for name in expected_atoms)
+
+    with pytest.raises(FileExistsError):
+        snapshots.write_store(tmp_path / "store")
+
+    snapshots.write_store(tmp_path / "store", allow_overwrite = True)
+    assert_snapshots_equal(Snapshots.from_store(tmp_path / "store"), snapshots)
+
+def test_empty_store(tmp_path, snapshots):
+    snapshots.new[0:0].write_store(tmp_path / "empty")
+    stored = Snapshots.from_store(tmp_path / "empty")
+
+    assert len(stored) == 0
+    assert list(stored) == []
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of iter_dump, whose frames must equal the snapshots of from_dump however the dump is read
+"""
+
+import gzip
+
+import numpy as np
+import pytest
+
+from lammps_utility.dump_reader import Snapshots
+from lammps_utility.dump_reader import indexing
+from lammps_utility.dump_reader.streaming import iter_dump
+from conftest import dump_text, pad_atoms
+
+def assert_frames_equal(frames, snapshots, columns = None, float32 = False):
+    frames = list(frames)
+
+    assert len(frames) == len(snapshots)
+
+    for frame, snapshot in zip(frames, snapshots):
+        assert frame.timestep == snapshot.timestep
+        assert frame.n_atoms == snapshot.n_atoms
+        assert np.array_equal(frame.box_bounds, snapshot.box.bounds)
+        assert np.array_equal(frame.box_tri, snapshot.box.tri)
+        assert np.array_equal(frame.box_BC, snapshot.box.BC)
+        assert frame.custom.keys() == snapshot.custom.keys()
+        assert all(np.array_equal(frame.custom[name], snapshot.custom[name]) for name in frame.custom)
+
+        atoms = snapshot.atoms(columns = columns, float32 = float32)
+
+        assert frame.atoms.keys() == atoms.keys()
+        assert all(np.array_equal(frame.atoms[name], atoms[name]) for name in atoms)
+        assert all(frame.atoms[name].dtype == atoms[name].dtype for name in atoms)
+
+@pytest.fixture
+def path(tmp_path, monkeypatch):
+    # Blocks are skipped over, and their line widths and numbers of atoms vary between snapshots
+    monkeypatch.setattr(indexing, "SKIP_MIN_BYTES", 1 << 9)
+
+    n_atoms = [400, 400, 400, 100, 600, 600, 0, 300, 300, 300, 300, 450]
+    widths = [30, 0, 0, 0, 5, 0, 0, 40, 0, 0, 0, 0]
+    custom = {"c_temp": [str(300 + i) for i in range(12)], "c_vec": [f"{i} 2.5" for i in range(12)]}
+
+    texts = [pad_atoms(dump_text([10 * i], n_atoms = n, custom = {name: values[i:] for name, values in custom.items()},
+                                 seed = i)[0], width)
+             for i, (n, width) in enumerate(zip(n_atoms, widths))]
+
+    path = tmp_path / "stream.dump"
+    path.write_text("".join(texts))
+
+    return path
+
+@pytest.mark.parametrize("read_bytes", [1, 37, 512, 1500, 4096, 1 << 22])
+def test_chunk_sizes(path, read_bytes):
+    # Chunks end anywhere: inside headers, inside per-atom blocks and on item lines
+    assert_frames_equal(iter_dump(path, read_bytes = read_bytes), Snapshots.from_dump(path, verify = True))
+
+def test_options(path, tmp_path):
+    expected = Snapshots.from_dump(path)
+
+    assert_frames_equal(Snapshots.iter_dump(path, columns = ["z", "id"], float32 = True), expected,
+                        columns = ["z", "id"], float32 = True)
+
+    gz_path = tmp_path / "stream.dump.gz"
+    gz_path.write_bytes(gzip.compress(path.read_bytes()))
+
+    assert_frames_equal(iter_dump(gz_path, read_bytes = 700), expected)
+
+def test_truncated(path, tmp_path):
+    # The per-atom data of the final snapshot is cut short, which fails to parse as in from_dump
+    text = path.read_text()
+    truncated = tmp_path / "truncated.dump"
+    truncated.write_text(text[:text.rindex("ITEM: TIMESTEP") + 400])
+
+    expected = Snapshots.from_dump(truncated)
+    frames = []
+
+    with pytest.raises(RuntimeError):
+        for frame in iter_dump(truncated, read_bytes = 100):
+            frames.append(frame)
+
+    with pytest.raises(RuntimeError):
+        expected[-1].atoms()
+
+    assert_frames_equal(frames, expected[:-1])
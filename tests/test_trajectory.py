@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of reading per-atom data of many snapshots as one array, with Snapshots.stack and
+Snapshots.trajectory
+"""
+
+import gzip
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from lammps_utility.dump_reader import Snapshots
+from conftest import write_shuffled_dump
+
+COLUMNS = ["x", "ix", "id"]
+
+@pytest.fixture
+def shuffled(tmp_path):
+    """Snapshots of a dump whose atoms are in a different order in each snapshot"""
+
+    expected = write_shuffled_dump(tmp_path / "shuffled.dump", [40] * 9)
+
+    return Snapshots.from_dump(tmp_path / "shuffled.dump"), expected
+
+def expected_stack(expected, columns, frames = None):
+    frames = range(len(expected)) if frames is None else frames
+
+    return np.array([np.column_stack([expected[i][name] for name in columns]) for i in frames],
+                    dtype = np.float64)
+
+@pytest.mark.parametrize("processes", [1, 2, None])
+def test_stack(shuffled, processes):
+    snapshots, expected = shuffled
+
+    stacked = snapshots.stack(COLUMNS, sort = True, processes = processes)
+
+    assert stacked.shape == (9, 40, 3) and stacked.dtype == np.float64
+    assert np.array_equal(stacked, expected_stack(expected, COLUMNS))
+    assert all(np.all(np.diff(frame[:, 2]) > 0) for frame in stacked)
+
+    # Unsorted rows are in the order of the dump
+    unsorted = snapshots.stack(["id", "x"], processes = processes)
+
+    assert all(np.array_equal(frame[:, 0], snapshot.atoms()["id"]) for frame, snapshot in zip(unsorted, snapshots))
+    assert np.array_equal(np.sort(unsorted, axis = 1)[..., 0], stacked[..., 2])
+
+    single = snapshots.stack(["x"], sort = True, float32 = True, processes = processes)
+
+    assert single.dtype == np.float32
+    assert np.array_equal(single[..., 0], stacked[..., 0].astype(np.float32))
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_stack_index_and_out(shuffled, tmp_path, processes):
+    snapshots, expected = shuffled
+
+    for index, frames in [(4, [4]), (slice(7, 1, -2), [7, 5, 3]), ([8, 0, 8], [8, 0, 8])]:
+        assert np.array_equal(snapshots.stack(COLUMNS, index = index, sort = True, processes = processes),
+                              expected_stack(expected, COLUMNS, frames))
+
+    stacked = snapshots.stack(COLUMNS, sort = True, processes = processes, out = tmp_path / "stack.npy")
+
+    assert isinstance(stacked, np.memmap)
+    assert np.array_equal(np.load(tmp_path / "stack.npy"), expected_stack(expected, COLUMNS))
+
+    shm = shared_memory.SharedMemory(create = True, size = 9 * 40 * 3 * 8)
+
+    try:
+        stacked = snapshots.stack(COLUMNS, sort = True, processes = processes, out = shm)
+
+        assert np.array_equal(stacked, expected_stack(expected, COLUMNS))
+
+        del stacked
+    finally:
+        shm.close()
+        shm.unlink()
+
+def test_stack_local_sources(shuffled, tmp_path):
+    snapshots, expected = shuffled
+
+    # Snapshots of gzip-compressed dumps are read by the calling process, alongside workers
+    gz_path = tmp_path / "shuffled.dump.gz"
+    gz_path.write_bytes(gzip.compress((tmp_path / "shuffled.dump").read_bytes()))
+    both = list(snapshots) + list(Snapshots.from_dump(gz_path))
+
+    stacked = Snapshots(both).stack(COLUMNS, sort = True, processes = 2)
+
+    assert np.array_equal(stacked, np.concatenate([expected_stack(expected, COLUMNS)] * 2))
+
+def test_stack_different_n_atoms(tmp_path):
+    write_shuffled_dump(tmp_path / "varying.dump", [10, 10, 12])
+    snapshots = Snapshots.from_dump(tmp_path / "varying.dump")
+
+    for processes in (1, 2):
+        with pytest.raises(RuntimeError):
+            snapshots.stack(["x"], processes = processes)
+
+        with pytest.raises(RuntimeError):
+            snapshots.trajectory(["x"])
+
+    assert snapshots.stack(["x"], index = [0, 1]).shape == (2, 10, 1)
+
+    with pytest.raises(AssertionError):
+        snapshots.stack(["vx"], index = [0, 1])
+
+KEYS = [
+    0, -1, 8, slice(None), slice(2, 7), slice(None, None, -1), slice(7, 1, -2), slice(5, 5),
+    (3, 10), (-2, -40, 0), (slice(None), 5), (slice(None, None, -3), slice(30, 5, -4), 1),
+    [4, 0, 4], ([1, 3, 1], [0, 39, 0]), ([1, 3], slice(None), [2, 0]), (0, slice(None), [0, 2]),
+    (slice(None), [[1, 2], [3, 4]], -1), np.arange(9) % 2 == 0, (slice(None), np.arange(40) < 12),
+    ..., (..., 0), (2, ...), (..., [2, 1], slice(None, 2)), (1, ..., -1), (np.int64(3), np.int64(-1)),
+    (np.array([6, 2]), ..., np.array([0, 1])),
+]
+
+@pytest.mark.parametrize("sort", [False, True])
+def test_trajectory_indexing(shuffled, sort):
+    snapshots, _ = shuffled
+
+    trajectory = snapshots.trajectory(COLUMNS, sort = sort)
+    full = snapshots.stack(COLUMNS, sort = sort, processes = 1)
+
+    assert trajectory.shape == full.shape and len(trajectory) == 9
+    assert np.array_equal(np.asarray(trajectory), full)
+
+    for key in KEYS:
+        indexed = trajectory[key]
+
+        assert indexed.dtype == full.dtype
+        assert indexed.shape == full[key].shape, key
+        assert np.array_equal(indexed, full[key]), key
+
+def test_trajectory_bad_indices(shuffled):
+    trajectory = shuffled[0].trajectory(COLUMNS)
+
+    for key in [9, -10, (0, 40), (0, 0, 3), (0, 0, 0, 0), (..., ...), [0, 9], (None, 0)]:
+        with pytest.raises(IndexError):
+            trajectory[key]